@@ -0,0 +1,222 @@
+"""
+Arrays numéricos para los programas Pyra (builtin ``array(...)``).
+
+Un Array guarda sus números en un arreglo de NumPy de una dimensión, así
+que ``a * 2``, ``a + b``, ``a > 0``, ``sum(a)`` o ``a[10:20]`` se hacen de
+una vez, en lugar de recorrer los elementos sentencia por sentencia en el
+intérprete. Las operaciones son elemento a elemento (un número se aplica a
+todos los elementos); los índices y las reducciones devuelven números de
+Python.
+
+NumPy es opcional: sin él, AVAILABLE es False y el intérprete responde a
+``array(...)`` con un error claro (ver interpreter._array).
+"""
+
+try:
+    import numpy
+except ImportError:  # sin NumPy: array(...) no está disponible
+    numpy = None
+
+AVAILABLE = numpy is not None
+
+# Elementos como máximo por array (unos 80 MB con números de 64 bits)
+MAX_SIZE = 10_000_000
+
+# Tipos de NumPy aceptados: bool, enteros con y sin signo, decimales
+NUMERIC_KINDS = "biuf"
+INTEGER_KINDS = "iu"
+
+# Los enteros de NumPy dan la vuelta al pasar de 64 bits: un resultado que
+# se aleja más que esto del mismo cálculo en decimales se desbordó
+OVERFLOW_GAP = 2.0 ** 32
+
+
+def _operand(value):
+    """Valor de NumPy de ``value`` para una operación, o NotImplemented"""
+    if type(value) is Array:
+        return value._data
+    if isinstance(value, (bool, int, float)):
+        return value
+    return NotImplemented
+
+def _overflowed(operation, left, right, result):
+    """¿El resultado entero de ``operation`` dio la vuelta?"""
+    if result.dtype.kind not in INTEGER_KINDS:
+        return False
+    with numpy.errstate(all="ignore"):
+        expected = operation(numpy.asarray(left, dtype=float), numpy.asarray(right, dtype=float))
+        return bool((numpy.abs(expected - result) > OVERFLOW_GAP).any())
+
+def _binary(operation, reverse=False, division=False, overflows=False):
+    # overflows: la operación puede pasarse de 64 bits con enteros (+, -, *, **)
+    def method(self, other):
+        other = _operand(other)
+        if other is NotImplemented:
+            return NotImplemented
+        left, right = (other, self._data) if reverse else (self._data, other)
+        try:
+            with numpy.errstate(all="raise"):
+                result = operation(left, right)
+        except FloatingPointError as e:
+            if division:
+                raise ZeroDivisionError(str(e)) from None
+            raise ValueError(f"operación fuera de rango en un array ({e})") from None
+        except OverflowError:
+            raise ValueError("los arrays solo admiten enteros de 64 bits") from None
+        if overflows and _overflowed(operation, left, right, result):
+            raise ValueError("operación fuera de rango en un array (el resultado no cabe en un entero de 64 bits)")
+        return Array._wrap(result)
+    return method
+
+def _comparison(operation):
+    def method(self, other):
+        other = _operand(other)
+        if other is NotImplemented:
+            return NotImplemented
+        return Array._wrap(operation(self._data, other))
+    return method
+
+
+class Array:
+    """Lista de números con operaciones vectorizadas (NumPy)"""
+    __slots__ = ("_data",)
+
+    def __init__(self, values=()):
+        if type(values) is Array:
+            self._data = values._data
+            return
+        if type(values) is range:
+            if len(values) > MAX_SIZE:
+                raise ValueError(f"array(...) admite como mucho {MAX_SIZE:,} elementos")
+            self._data = numpy.arange(values.start, values.stop, values.step)
+            return
+        if not hasattr(values, "__len__"):
+            values = list(values)
+        if len(values) > MAX_SIZE:
+            raise ValueError(f"array(...) admite como mucho {MAX_SIZE:,} elementos")
+        try:
+            data = numpy.asarray(values)
+        except OverflowError:
+            raise ValueError("array(...) solo admite enteros de 64 bits") from None
+        except ValueError:
+            data = None
+        if data is None or data.ndim != 1:
+            raise ValueError("array(...) solo admite una lista de números (una dimensión)")
+        if data.dtype.kind not in NUMERIC_KINDS:
+            raise TypeError("array(...) solo admite números")
+        self._data = data
+
+    @classmethod
+    def _wrap(cls, data):
+        array = cls.__new__(cls)
+        array._data = data
+        return array
+
+    # --- Elemento a elemento ---
+    if AVAILABLE:
+        __add__ = _binary(numpy.add, overflows=True)
+        __radd__ = _binary(numpy.add, reverse=True, overflows=True)
+        __sub__ = _binary(numpy.subtract, overflows=True)
+        __rsub__ = _binary(numpy.subtract, reverse=True, overflows=True)
+        __mul__ = _binary(numpy.multiply, overflows=True)
+        __rmul__ = _binary(numpy.multiply, reverse=True, overflows=True)
+        __truediv__ = _binary(numpy.true_divide, division=True)
+        __rtruediv__ = _binary(numpy.true_divide, reverse=True, division=True)
+        __floordiv__ = _binary(numpy.floor_divide, division=True)
+        __rfloordiv__ = _binary(numpy.floor_divide, reverse=True, division=True)
+        __mod__ = _binary(numpy.remainder, division=True)
+        __rmod__ = _binary(numpy.remainder, reverse=True, division=True)
+        __pow__ = _binary(numpy.power, overflows=True)
+        __rpow__ = _binary(numpy.power, reverse=True, overflows=True)
+
+        __eq__ = _comparison(numpy.equal)
+        __ne__ = _comparison(numpy.not_equal)
+        __lt__ = _comparison(numpy.less)
+        __le__ = _comparison(numpy.less_equal)
+        __gt__ = _comparison(numpy.greater)
+        __ge__ = _comparison(numpy.greater_equal)
+
+    __hash__ = None
+
+    def __neg__(self):
+        return Array._wrap(-self._data)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return Array._wrap(numpy.abs(self._data))
+
+    def __bool__(self):
+        raise TypeError("un array no es verdadero ni falso; usa .any() o .all()")
+
+    # --- Índices y recorrido ---
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(self._data.tolist())
+
+    def __getitem__(self, key):
+        if type(key) is Array:
+            # a[a > 0]: los elementos donde la máscara es verdadera
+            if key._data.dtype.kind != "b":
+                raise TypeError("el índice de un array debe ser un número, un rango a:b o un array de comparaciones")
+            return Array._wrap(self._data[key._data])
+        if type(key) is slice:
+            return Array._wrap(self._data[key])
+        if isinstance(key, int):
+            return self._data[key].item()
+        raise TypeError("el índice de un array debe ser un número, un rango a:b o un array de comparaciones")
+
+    # --- Reducciones ---
+    def sum(self):
+        data = self._data
+        if data.dtype.kind in INTEGER_KINDS and len(data):
+            largest = max(-int(data.min()), int(data.max()))
+            if largest * len(data) >= 2 ** 63:
+                # La suma en 64 bits podría dar la vuelta: enteros de Python
+                return sum(data.tolist())
+        return data.sum().item()
+
+    def min(self):
+        if not len(self._data):
+            raise ValueError("min() de un array vacío")
+        return self._data.min().item()
+
+    def max(self):
+        if not len(self._data):
+            raise ValueError("max() de un array vacío")
+        return self._data.max().item()
+
+    def mean(self):
+        if not len(self._data):
+            raise ValueError("mean() de un array vacío")
+        return self._data.mean().item()
+
+    def any(self):
+        return bool(self._data.any())
+
+    def all(self):
+        return bool(self._data.all())
+
+    def tolist(self):
+        return self._data.tolist()
+
+    def __repr__(self):
+        return f"array({self._data.tolist()!r})"
+
+    __str__ = __repr__
+
+
+def reduction(builtin):
+    """``builtin`` (sum, min o max) que, con un Array como único argumento, usa NumPy"""
+    method = builtin.__name__
+
+    def reduce(*args, **kwargs):
+        if len(args) == 1 and not kwargs and type(args[0]) is Array:
+            return getattr(args[0], method)()
+        return builtin(*args, **kwargs)
+
+    reduce.__name__ = method
+    return reduce
@@ -0,0 +1,90 @@
+"""
+Ejecución de muchos programas a la vez (p. ej. para corregir entregas).
+
+run_batch reparte los programas entre los procesos de un WorkerPool (uno
+por núcleo) y devuelve, para cada uno, su salida, su estado, el tiempo de
+ejecución y, si se indicó la salida esperada, si coincide.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from interpreter import Budget
+from worker_pool import WorkerPool, run_job
+
+
+def _status(job):
+    if job["limit_exceeded"]:
+        return "limit_exceeded"
+    if job["error"]:
+        return "error"
+    return "ok"
+
+def _run_one(index, program, mode, budget, pool, on_job):
+    code = program["code"]
+    started = time.perf_counter()
+    if pool is not None:
+        job = pool.run(code, mode, budget)
+    else:
+        job = run_job(code, mode, budget.as_dict())
+    if on_job is not None:
+        on_job(job)
+    seconds = job.get("seconds")
+    if seconds is None:
+        seconds = time.perf_counter() - started
+
+    result = {
+        "id": program.get("id", index),
+        "status": _status(job),
+        "output": job["output"],
+        "error": job["error"],
+        "limit_exceeded": job["limit_exceeded"],
+        "statements": job["statements"],
+        "seconds": round(seconds, 4),
+    }
+    expected = program.get("expected")
+    if expected is not None:
+        # Igual que test.py: se ignoran los espacios y saltos de línea de los extremos
+        result["passed"] = job["output"].strip() == expected.strip()
+    return result
+
+
+def run_batch(programs, mode="tree", budget=None, pool=None, on_job=None):
+    """Ejecuta ``programs`` en paralelo y devuelve (resultados, resumen).
+
+    Cada programa es un texto o un diccionario con "code" y, opcionalmente,
+    "expected" (salida esperada) e "id". Sin ``pool`` se crea uno temporal
+    con un proceso por núcleo; con ``pool=False`` se ejecuta todo en este
+    proceso, uno tras otro. ``on_job(job)`` se llama con el resultado de
+    run_job de cada programa (p. ej. para anotarlo en las métricas).
+    """
+    programs = [{"code": p} if isinstance(p, str) else p for p in programs]
+    budget = budget or Budget()
+    started = time.perf_counter()
+
+    own_pool = pool is None and len(programs) > 1
+    if own_pool:
+        pool = WorkerPool(size=min(WorkerPool.default_size(), len(programs)))
+    try:
+        if not pool:
+            results = [_run_one(i, p, mode, budget, None, on_job) for i, p in enumerate(programs)]
+        else:
+            with ThreadPoolExecutor(max_workers=pool.size) as executor:
+                futures = [executor.submit(_run_one, i, p, mode, budget, pool, on_job) for i, p in enumerate(programs)]
+                results = [future.result() for future in futures]
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+    graded = [r for r in results if "passed" in r]
+    summary = {
+        "total": len(results),
+        "ok": sum(1 for r in results if r["status"] == "ok"),
+        "errors": sum(1 for r in results if r["status"] == "error"),
+        "limit_exceeded": sum(1 for r in results if r["status"] == "limit_exceeded"),
+        "seconds": round(time.perf_counter() - started, 4),
+    }
+    if graded:
+        summary["passed"] = sum(1 for r in graded if r["passed"])
+        summary["failed"] = len(graded) - summary["passed"]
+    return results, summary
@@ -0,0 +1,251 @@
+"""
+Pruebas de rendimiento del intérprete y del checker.
+
+    python bench.py                        # ejecuta y muestra los resultados
+    python bench.py --save base.json       # además guarda una línea base
+    python bench.py --compare base.json    # falla si algo es más lento que la base
+
+Cada prueba se repite varias veces y se queda con el mejor tiempo. Con
+--compare el programa termina con código 1 si alguna prueba tarda más que
+en la línea base por encima del umbral (--threshold; 0.25 = un 25 % más).
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+from caching import CHECKER_VERSION, INTERPRETER_VERSION
+from checker import Checker, LintSession
+from interpreter import Interpreter
+
+# --- Programas ---
+# nombre -> (código, llamadas a funciones Pyra por ejecución o None)
+PROGRAMS = {
+    "loop": ("""
+var total = 0
+for i in range(200000):
+    if i % 3 == 0:
+        continue
+    total = total + i
+print(total)
+""", None),
+    "while": ("""
+var i = 0
+var total = 0
+while i < 90000:
+    total = total + i * 2
+    i = i + 1
+print(total)
+""", None),
+    "fibonacci": ("""
+func fibonacci(n):
+    if n <= 1:
+        return n
+    return fibonacci(n - 1) + fibonacci(n - 2)
+print(fibonacci(20))
+""", 21891),
+    "factorial": ("""
+func factorial(n):
+    if n <= 1:
+        return 1
+    return n * factorial(n - 1)
+var total = 0
+for i in range(200):
+    total = total + factorial(100)
+print(len(str(total)))
+""", 200 * 100),
+    "fibonacci_memo": ("""
+@memo
+func fibonacci(n):
+    if n <= 1:
+        return n
+    return fibonacci(n - 1) + fibonacci(n - 2)
+var total = 0
+for i in range(2000):
+    total = total + fibonacci(i % 300)
+print(total % 1000)
+""", 2000 + 299 * 2),
+    "strings": ("""
+var texto = ""
+for i in range(20000):
+    texto = texto + str(i % 10)
+    if len(texto) > 1000:
+        texto = ""
+print(len(texto))
+""", None),
+    "lists": ("""
+var lista = []
+for i in range(20000):
+    lista.append((i * 7) % 101)
+var ordenada = sorted(lista)
+var total = 0
+for i in range(200):
+    total = total + sum(lista) + max(lista) + min(ordenada) + len(lista)
+print(total)
+""", None),
+}
+
+# Programa de ejemplo que se repite hasta llenar el texto de las pruebas de lint
+LINT_BLOCK = """func factorial{n}(n):
+    # Factorial recursivo
+    if n <= 1:
+        return 1
+    else:
+        return n * factorial{n}(n - 1)
+
+var resultado{n} = factorial{n}(5)
+print("Resultado: " + str(resultado{n}))
+"""
+LINT_SIZE = 100 * 1024
+
+
+def lint_source(size=LINT_SIZE):
+    """Código válido de ``size`` caracteres"""
+    parts = []
+    total = n = 0
+    while total < size:
+        block = LINT_BLOCK.format(n=n)
+        parts.append(block)
+        total += len(block)
+        n += 1
+    return "".join(parts)[:size].rsplit("\n", 1)[0] + "\n"
+
+
+# --- Mediciones ---
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = function()
+        seconds = time.perf_counter() - started
+        if best is None or seconds < best:
+            best = seconds
+    return best, value
+
+def bench_program(code, mode, calls, repeat):
+    def run():
+        interp = Interpreter(mode=mode)
+        interp.run(code)
+        if interp.error:
+            raise RuntimeError(interp.error)
+        return interp.statements
+
+    seconds, statements = best_time(run, repeat)
+    result = {"seconds": seconds, "statements_per_second": statements / seconds}
+    if calls:
+        result["us_per_call"] = seconds / calls * 1e6
+    return result
+
+def bench_lint(repeat):
+    source = lint_source()
+    lines = source.count("\n")
+    seconds, _ = best_time(lambda: Checker().check(source), repeat)
+    return {"seconds": seconds, "lines_per_second": lines / seconds}
+
+def bench_lint_edit(repeat):
+    # Un carácter escrito en medio de un documento de 100 KB ya analizado
+    session = LintSession(lint_source())
+    session.errors()
+    middle = len(session.lines) // 2
+
+    def edit():
+        session.apply_edit(middle, 5, middle, 5, "x")
+        session.errors()
+        session.apply_edit(middle, 5, middle, 6, "")
+        return session.errors()
+
+    seconds, _ = best_time(edit, repeat)
+    return {"seconds": seconds / 2, "ms_per_edit": seconds / 2 * 1000}
+
+def run_benchmarks(repeat=5, only=None):
+    """Diccionario nombre -> medidas de cada prueba (``only``: subcadena del nombre)"""
+    benchmarks = []
+    for name, (code, calls) in PROGRAMS.items():
+        for mode in Interpreter.MODES:
+            benchmarks.append((f"{name}[{mode}]", lambda code=code, mode=mode, calls=calls: bench_program(code, mode, calls, repeat)))
+    benchmarks.append(("lint_100kb", lambda: bench_lint(repeat)))
+    benchmarks.append(("lint_edit_100kb", lambda: bench_lint_edit(repeat)))
+
+    results = {}
+    for name, function in benchmarks:
+        if only and only not in name:
+            continue
+        results[name] = function()
+        print(format_result(name, results[name]), flush=True)
+    return results
+
+
+# --- Informe y líneas base ---
+UNITS = {
+    "statements_per_second": "sentencias/s",
+    "us_per_call": "µs/llamada",
+    "lines_per_second": "líneas/s",
+    "ms_per_edit": "ms/edición",
+}
+
+def format_result(name, result):
+    details = ", ".join(
+        f"{result[key]:,.1f} {unit}" for key, unit in UNITS.items() if key in result
+    )
+    return f"{name:28} {result['seconds'] * 1000:9.2f} ms   {details}"
+
+def baseline(results, repeat):
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "interpreter_version": INTERPRETER_VERSION,
+        "checker_version": CHECKER_VERSION,
+        "repeat": repeat,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+def compare(results, base, threshold):
+    """Nombres de las pruebas que tardan más que en ``base`` por encima de ``threshold``"""
+    regressions = []
+    print(f"\nComparación con la línea base ({base.get('created', '?')}, umbral {threshold:.0%}):")
+    for name, result in results.items():
+        previous = base["results"].get(name)
+        if previous is None:
+            print(f"{name:28}     (nueva)")
+            continue
+        change = result["seconds"] / previous["seconds"] - 1
+        regressed = change > threshold
+        print(f"{name:28} {change:+8.1%}{'   ❌ más lenta' if regressed else ''}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pruebas de rendimiento de Pyra")
+    parser.add_argument("--repeat", type=int, default=5, help="repeticiones por prueba (se toma la mejor)")
+    parser.add_argument("--only", help="solo las pruebas cuyo nombre contiene este texto")
+    parser.add_argument("--save", metavar="JSON", help="guardar los resultados como línea base")
+    parser.add_argument("--compare", metavar="JSON", help="comparar con una línea base guardada")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="máximo aumento de tiempo permitido con --compare (0.25 = 25 %%)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.repeat, args.only)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(baseline(results, args.repeat), f, indent=2, ensure_ascii=False)
+        print(f"\nLínea base guardada en {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+        regressions = compare(results, base, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} prueba(s) más lentas que la línea base: {', '.join(regressions)}")
+            return 1
+        print("\n✔ Sin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+"""
+Cachés del servidor.
+
+LRUCache es una caché LRU segura entre hilos, acotada por número de
+entradas y por bytes, con caducidad opcional; SQLiteCache ofrece lo mismo
+en un archivo SQLite compartido por varios procesos del servidor. Las
+claves se calculan con content_key (SHA-256 del contenido), así que no
+dependen de ``hash()`` ni cambian entre procesos.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import arrays
+import checker
+import interpreter
+import lexer
+import pyra_compiler
+import pyra_parser
+
+
+def content_key(*parts):
+    """SHA-256 (hex) de ``parts``, que deben poder convertirse a JSON"""
+    data = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _fingerprint(*modules):
+    """Huella del código de ``modules``: cambia en cuanto cambia cualquiera de ellos"""
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+# Versiones que forman parte de las claves de resultados y de lint
+INTERPRETER_VERSION = _fingerprint(interpreter, arrays, lexer, pyra_parser, pyra_compiler)
+CHECKER_VERSION = _fingerprint(checker, lexer, interpreter)  # el checker usa los nombres predefinidos del intérprete
+
+
+class LRUCache:
+    """Caché LRU con límite de entradas (``max_entries``) y de bytes (``max_bytes``).
+
+    Con ``ttl`` (segundos) cada entrada caduca ese tiempo después de
+    guardarse. El tamaño de cada valor lo indica quien lo guarda.
+    """
+    def __init__(self, max_entries=1000, max_bytes=None, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # clave -> (valor, bytes, caducidad)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Valor guardado para ``key``, o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires = entry
+            if expires is not None and expires < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, size):
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # no cabe ni vaciando la caché
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        # Llamar con _lock tomado
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Los aciertos de SQLiteCache no escriben en el archivo: la hora de uso se
+# guarda en lote cada TOUCH_BATCH aciertos o TOUCH_INTERVAL segundos, y
+# siempre antes de desalojar entradas
+TOUCH_BATCH = 100
+TOUCH_INTERVAL = 5.0
+
+
+class SQLiteCache:
+    """La misma interfaz que LRUCache, guardada en un archivo SQLite.
+
+    Varios procesos del servidor pueden compartir el archivo. Los valores
+    se guardan como JSON; los contadores (hits, misses...) son de este
+    proceso. Leer no toma el bloqueo de escritura del archivo (ver
+    TOUCH_BATCH).
+    """
+    def __init__(self, path, max_entries=1000, max_bytes=None, ttl=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._touched = {}  # clave -> hora del último acierto, aún sin guardar
+        self._touched_at = time.time()
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires REAL, used REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS cache_used ON cache (used)")
+            db.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)")
+
+    def _connect(self):
+        # Una conexión por hilo (las conexiones de sqlite3 no se comparten entre hilos)
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            value, expires = row
+            if expires is not None and expires < now:
+                db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._count("expirations")
+                self._count("misses")
+                return None
+        self._count("hits")
+        self._touch(key, now)
+        return json.loads(value)
+
+    def _touch(self, key, now):
+        with self._lock:
+            self._touched[key] = now
+            if len(self._touched) < TOUCH_BATCH and now - self._touched_at < TOUCH_INTERVAL:
+                return
+        with self._connect() as db:
+            self._save_touched(db)
+
+    def _save_touched(self, db):
+        """Guarda en ``db`` la hora de uso de los aciertos pendientes"""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._touched_at = time.time()
+        if touched:
+            db.executemany(
+                "UPDATE cache SET used = ? WHERE key = ? AND used < ?",
+                [(used, key, used) for key, used in touched.items()],
+            )
+
+    def put(self, key, value, size):
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        now = time.time()
+        expires = now + self.ttl if self.ttl is not None else None
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires, used) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), size, expires, now),
+            )
+            db.execute("DELETE FROM cache WHERE expires IS NOT NULL AND expires < ?", (now,))
+            count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+            # Solo si se pasó de algún límite: se borran de una vez las menos usadas,
+            # las primeras ``excess`` y las que haga falta para liberar ``extra`` bytes
+            excess = count - self.max_entries
+            extra = total - self.max_bytes if self.max_bytes is not None else 0
+            evicted = 0
+            if excess > 0 or extra > 0:
+                self._save_touched(db)
+                evicted = db.execute(
+                    "DELETE FROM cache WHERE key IN ("
+                    "SELECT key FROM ("
+                    "SELECT key, ROW_NUMBER() OVER oldest AS position, SUM(size) OVER oldest - size AS before "
+                    "FROM cache WINDOW oldest AS (ORDER BY used, key ROWS UNBOUNDED PRECEDING)"
+                    ") WHERE position <= ? OR before < ?)",
+                    (excess, extra),
+                ).rowcount
+        if evicted:
+            self._count("evictions", evicted)
+
+    def clear(self):
+        with self._connect() as db:
+            db.execute("DELETE FROM cache")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self):
+        count, total = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "entries": count,
+            "bytes": total,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# --- Resultados de /run ---
+# Límites cuyo resultado depende del reloj o de la máquina: no se guardan
+UNCACHEABLE_LIMITS = ("max_seconds", "max_memory_mb")
+
+class ResultCache(LRUCache):
+    """Resultados de ejecución indexados por código, modo, límites y versión del intérprete.
+
+    Los programas Pyra no leen entrada ni usan azar, así que el mismo
+    programa con los mismos límites siempre produce el mismo resultado.
+    """
+    def key(self, code, mode, limits, stream=False):
+        # /run/stream guarda otra forma de resultado (ver server.stream_program)
+        if stream:
+            return content_key(INTERPRETER_VERSION, "stream", mode, limits, code)
+        return content_key(INTERPRETER_VERSION, mode, limits, code)
+
+    def store(self, key, response):
+        """Guarda ``response`` salvo que dependa del reloj o de un fallo del proceso"""
+        if not response.get("success") or response.get("limit_exceeded") in UNCACHEABLE_LIMITS:
+            return False
+        if response.get("statements") is None:
+            return False  # el proceso de ejecución no terminó normalmente
+        size = len(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+        self.put(key, response, size)
+        return True
+
+    @classmethod
+    def from_environment(cls):
+        """Tamaño según PYRA_RESULT_CACHE_ENTRIES y PYRA_RESULT_CACHE_MB (0 la desactiva)"""
+        entries = int(os.environ.get("PYRA_RESULT_CACHE_ENTRIES", 2000))
+        megabytes = float(os.environ.get("PYRA_RESULT_CACHE_MB", 64))
+        if entries <= 0 or megabytes <= 0:
+            return None
+        return cls(max_entries=entries, max_bytes=int(megabytes * 1024 * 1024))
+
+
+# --- Resultados de /lint ---
+def lint_cache_from_environment():
+    """Caché de /lint según el entorno.
+
+    PYRA_LINT_CACHE_ENTRIES (1000), PYRA_LINT_CACHE_MB (16) y
+    PYRA_LINT_CACHE_TTL (600 segundos) fijan los límites; con
+    PYRA_LINT_CACHE_DB (ruta de un archivo SQLite) la caché se comparte
+    entre procesos.
+    """
+    entries = int(os.environ.get("PYRA_LINT_CACHE_ENTRIES", 1000))
+    max_bytes = int(float(os.environ.get("PYRA_LINT_CACHE_MB", 16)) * 1024 * 1024)
+    ttl = float(os.environ.get("PYRA_LINT_CACHE_TTL", 600))
+    path = os.environ.get("PYRA_LINT_CACHE_DB")
+    if path:
+        return SQLiteCache(path, max_entries=entries, max_bytes=max_bytes, ttl=ttl)
+    return LRUCache(max_entries=entries, max_bytes=max_bytes, ttl=ttl)
+
+def lint_key(code):
+    return content_key("lint", CHECKER_VERSION, code)
@@ -3,9 +3,163 @@ Checker sintáctico mejorado para el lenguaje Pyra.
 Detecta errores de sintaxis, indentación y buenas prácticas.
 """
 
+import keyword
 import re
+import threading
+
+from interpreter import BUILTIN_NAMES
+from lexer import lex, lex_line
+
+# Los nombres con el prefijo _pyra son de los auxiliares del modo compilado
+VAR_NAME = re.compile(r"^(?!_pyra)[a-zA-Z_][a-zA-Z0-9_]*$")
+FOR_VAR = re.compile(r"for\s+(\w+)\s+in\b")
+FOR_VARS = re.compile(r"\bfor\s+(\w+)\s+in\b")
+ASSIGNMENT = re.compile(r"(\w+)\s*=(?!=)")
+MUTATION = re.compile(r"\b(\w+)\.(append|extend|insert|pop|remove|clear|sort|reverse|update)\(")
+# Identificadores que no son atributos ('lista.append') ni decoradores ('@memo')
+IDENTIFIER = re.compile(r"(?<![\w.@])[A-Za-z_]\w*")
+# Nombre de un argumento ('reverse' en 'sorted(l, reverse=True)'), tras el identificador
+KEYWORD_ARGUMENT = re.compile(r"\s*=(?!=)")
+# Parametros de una lambda ('lambda a, b: ...')
+LAMBDA = re.compile(r"\blambda\b([^:]*):")
+# Palabras de las expresiones que tambien se sugieren
+EXPRESSION_WORDS = frozenset({'True', 'False', 'None', 'and', 'or', 'not', 'is'})
+# Nombres desconocidos distintos que se buscan como mucho por documento
+# (el resto se queda sin sugerencia)
+MAX_SUGGESTION_LOOKUPS = 2000
+
+
+def edit_distance(a, b, transpositions=False, max_distance=None):
+    """Distancia de Levenshtein entre ``a`` y ``b``.
+
+    Con ``transpositions`` intercambiar dos letras vecinas cuenta como un
+    solo cambio ('pirnt' queda a 1 de 'print'); esa variante no cumple la
+    desigualdad triangular, asi que NameIndex usa la distancia normal.
+
+    Con ``max_distance`` solo se calcula la franja de la tabla a esa
+    distancia de la diagonal, y el calculo se corta en cuanto una fila
+    entera la supera: cualquier distancia mayor se devuelve como
+    max_distance + 1.
+    """
+    if max_distance is None:
+        max_distance = max(len(a), len(b))
+    far = max_distance + 1
+    if abs(len(a) - len(b)) > max_distance:
+        return far
+    # La fila i guarda las columnas j = i - max_distance + t, con t en range(width)
+    width = 2 * max_distance + 1
+    before = None
+    previous = [j if 0 <= j <= len(b) else far for j in range(-max_distance, max_distance + 1)]
+    for i, ca in enumerate(a, start=1):
+        current = []
+        for t in range(width):
+            j = i - max_distance + t
+            if j < 0 or j > len(b):
+                cost = far
+            elif j == 0:
+                cost = i
+            else:
+                cb = b[j - 1]
+                cost = previous[t] + (ca != cb)
+                if t + 1 < width:
+                    cost = min(cost, previous[t + 1] + 1)
+                if t > 0:
+                    cost = min(cost, current[t - 1] + 1)
+                if transpositions and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                    cost = min(cost, before[t] + 1)
+            current.append(cost)
+        if min(current) > max_distance:
+            return far
+        before, previous = previous, current
+    return min(previous[len(b) - len(a) + max_distance], far)
+
+
+def _bigrams(word):
+    """Pares de letras vecinas de ``word``, con '^' y '$' marcando los extremos"""
+    padded = f"^{word}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def suggestion_limit(word):
+    """Distancia maxima de las sugerencias para ``word``"""
+    return 1 if len(word) <= 4 else 2
+
+
+class NameIndex:
+    """Indice de palabras para encontrar las parecidas a una dada.
+
+    Las palabras se agrupan por longitud y por sus pares de letras (ver
+    _bigrams). Cada cambio de una letra rompe como mucho dos pares, asi que
+    una palabra a distancia d o menos comparte con la buscada todos sus
+    pares salvo, como mucho, 2*d: search solo calcula la distancia de
+    edicion de las palabras de longitud parecida que pasan ese filtro.
+    """
+    def __init__(self, words=()):
+        self.words = set()
+        self._lengths = {}  # longitud -> palabras
+        self._grams = {}    # (longitud, par de letras) -> palabras
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        if word in self.words:
+            return
+        self.words.add(word)
+        length = len(word)
+        self._lengths.setdefault(length, []).append(word)
+        for gram in _bigrams(word):
+            self._grams.setdefault((length, gram), []).append(word)
+
+    def search(self, word, max_distance):
+        """Lista de (distancia, palabra) con las palabras a ``max_distance`` o menos"""
+        grams = _bigrams(word)
+        needed = len(grams) - 2 * max_distance
+        lengths = range(max(len(word) - max_distance, 0), len(word) + max_distance + 1)
+        if needed > 0:
+            shared = {}
+            for length in lengths:
+                for gram in grams:
+                    for candidate in self._grams.get((length, gram), ()):
+                        shared[candidate] = shared.get(candidate, 0) + 1
+            candidates = [candidate for candidate, count in shared.items() if count >= needed]
+        else:
+            # Palabra muy corta para el filtro: todas las de longitud parecida
+            candidates = [candidate for length in lengths for candidate in self._lengths.get(length, ())]
+        found = []
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance=max_distance)
+            if distance <= max_distance:
+                found.append((distance, candidate))
+        return found
+
 
 class Checker:
+    # Reglas en el orden en que check las aplica (scan devuelve una lista de errores por regla)
+    RULES = (
+        'indentation',
+        'block_syntax',
+        'var_declarations',
+        'balanced_delimiters',
+        'return_placement',
+        'break_continue_placement',
+        'typos',
+        'empty_blocks',
+        'string_literals',
+        'memo_functions',
+        'suggestions',
+    )
+    # Reglas que solo miran una linea (el resto depende de las lineas vecinas)
+    LINE_RULES = frozenset({
+        'indentation',
+        'block_syntax',
+        'var_declarations',
+        'balanced_delimiters',
+        'typos',
+        'string_literals',
+    })
+    # Reglas que dependen de los nombres declarados en todo el documento
+    DOCUMENT_RULES = frozenset({'suggestions'})
+
     def __init__(self):
         self.keywords = {'var', 'func', 'if', 'elif', 'else', 'return', 'print', 'while', 'for', 'in', 'break', 'continue'}
         self.typos = {
@@ -27,333 +181,465 @@ class Checker:
             'contiue': 'continue',
             'contineu': 'continue'
         }
+        # Una sola expresion para todas las erratas (cada una como palabra completa)
+        self.typo_pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, self.typos)) + r")\b")
+        # Nombres que nunca se sugieren corregir (las erratas conocidas ya tienen su aviso)
+        self.known_names = self.keywords | BUILTIN_NAMES | set(keyword.kwlist) | set(self.typos)
+        # Palabras reservadas y funciones predefinidas, para sugerir la mas parecida
+        self.keyword_index = NameIndex(sorted(self.keywords | BUILTIN_NAMES | EXPRESSION_WORDS))
+        self._names_index = None
 
     def check(self, source):
         if not source:
             return []
 
-        errors = []
-        lines = source.splitlines()
-        
-        errors.extend(self.check_indentation(lines))
-        errors.extend(self.check_block_syntax(lines))
-        errors.extend(self.check_var_declarations(lines))
-        errors.extend(self.check_balanced_delimiters(lines))
-        errors.extend(self.check_return_placement(lines))
-        errors.extend(self.check_break_continue_placement(lines))
-        errors.extend(self.check_typos(lines))
-        errors.extend(self.check_empty_blocks(lines))
-        errors.extend(self.check_string_literals(lines))
-        
-        return self.remove_duplicates(errors)
+        return self.check_lines(lex(source))
 
-    def check_indentation(self, lines):
-        errors = []
-        prev_indent = 0
-        
-        for i, raw in enumerate(lines, start=1):
-            stripped = raw.strip()
-            if not stripped or stripped.startswith("#"):
-                continue
-            
-            if "\t" in raw:
-                errors.append({
-                    "line": i,
-                    "column": raw.find("\t") + 1,
-                    "message": "Usa 4 espacios en lugar de tabulaciones",
-                    "severity": "error"
-                })
-                continue
-            
-            leading = len(raw) - len(raw.lstrip(" "))
-            
-            if leading % 4 != 0:
-                errors.append({
-                    "line": i,
-                    "column": 1,
-                    "message": "Indentacion debe ser multiplo de 4 espacios",
-                    "severity": "error"
-                })
-        
-        return errors
+    def check_lines(self, lines):
+        """Como check, para el resultado de lexer.lex"""
+        found = self.scan(lines)
+        return self.remove_duplicates([error for errors in found for error in errors])
 
-    def check_block_syntax(self, lines):
-        errors = []
-        
-        for i, raw in enumerate(lines, start=1):
-            stripped = raw.strip()
-            if not stripped or stripped.startswith("#"):
-                continue
-            
-            if stripped.startswith("func "):
-                if not stripped.endswith(":"):
-                    errors.append({
-                        "line": i,
-                        "column": len(stripped) + 1,
-                        "message": "Falta ':' al final de la definicion de funcion",
-                        "severity": "error"
-                    })
-                
-                if "(" not in stripped or ")" not in stripped:
-                    errors.append({
-                        "line": i,
-                        "column": 5,
-                        "message": "Sintaxis de funcion invalida",
-                        "severity": "error"
-                    })
-            
-            if stripped.startswith("if ") or stripped.startswith("elif "):
-                if not stripped.endswith(":"):
-                    errors.append({
-                        "line": i,
-                        "column": len(stripped) + 1,
-                        "message": "Falta ':' al final de la condicion",
-                        "severity": "error"
-                    })
-            
-            if stripped.startswith("while "):
-                if not stripped.endswith(":"):
-                    errors.append({
-                        "line": i,
-                        "column": len(stripped) + 1,
-                        "message": "Falta ':' al final del while",
-                        "severity": "error"
-                    })
-            
-            if stripped.startswith("for "):
-                if not stripped.endswith(":"):
-                    errors.append({
-                        "line": i,
-                        "column": len(stripped) + 1,
-                        "message": "Falta ':' al final del for",
-                        "severity": "error"
-                    })
-                
-                if " in " not in stripped:
-                    errors.append({
+    def scan(self, lines, line_rules=True, context_rules=True, document_rules=True, global_names=None):
+        """Aplica las reglas en una sola pasada sobre ``lines`` (lineas de lexer.lex).
+
+        Devuelve una lista de errores por regla, en el orden de RULES. Con
+        ``line_rules``, ``context_rules`` o ``document_rules`` en False se
+        omiten las reglas de una linea, las que dependen de las lineas
+        vecinas o las que dependen de todo el documento. ``global_names``
+        son las variables globales del documento (por defecto, las
+        declaradas sin indentar en ``lines``).
+        """
+        indentation, block_syntax, var_declarations, delimiters, typos, strings = [], [], [], [], [], []
+        returns, loops, empty_blocks = [], [], []
+        memo = []           # por cada '@memo': la funcion que decora (o nada, si no la hay)
+        memo_open = []      # funciones memo cuyo cuerpo sigue abierto, de la externa a la interna
+        pending_memo = None  # '@memo' que todavia espera su funcion
+        declared = set()    # variables globales
+        names = set()       # nombres declarados (variables, funciones, parametros)
+        used = []           # (linea, identificador, columna) de nombres que no son palabras reservadas
+        in_func = in_loop = False
+        func_indent = loop_indent = 0
+        open_block = None   # (linea, indentacion, columna) del ultimo ':' que espera cuerpo
+
+        for i, line in enumerate(lines, start=1):
+            # stripped: la linea sin comentario; masked: con los textos tapados
+            raw, stripped, masked = line.raw, line.text, line.code
+            code = bool(stripped)
+
+            # --- Reglas de una linea ---
+            if line_rules:
+                if code:
+                    if "\t" in masked:
+                        indentation.append({
+                            "line": i,
+                            "column": masked.find("\t") + 1,
+                            "message": "Usa 4 espacios en lugar de tabulaciones",
+                            "severity": "error"
+                        })
+                    elif line.indent % 4 != 0:
+                        indentation.append({
+                            "line": i,
+                            "column": 1,
+                            "message": "Indentacion debe ser multiplo de 4 espacios",
+                            "severity": "error"
+                        })
+                    self._block_syntax(i, stripped, block_syntax)
+
+                    open_paren = masked.count("(")
+                    close_paren = masked.count(")")
+                    if open_paren != close_paren:
+                        col = masked.find("(") + 1 if open_paren > close_paren else masked.find(")") + 1
+                        delimiters.append({
+                            "line": i,
+                            "column": col if col > 0 else 1,
+                            "message": "Parentesis desbalanceados",
+                            "severity": "error"
+                        })
+
+                if stripped.startswith("var "):
+                    self._var_declaration(i, raw, stripped, var_declarations)
+
+                if self.typo_pattern.search(masked):
+                    found = {}
+                    for match in self.typo_pattern.finditer(masked):
+                        found.setdefault(match.group(), match.start() + 1)
+                    for typo, correct in self.typos.items():
+                        if typo in found:
+                            typos.append({
+                                "line": i,
+                                "column": found[typo],
+                                "message": f"Posible error: ¿quisiste escribir '{correct}'?",
+                                "severity": "warning"
+                            })
+
+                if line.unclosed is not None:
+                    strings.append({
                         "line": i,
-                        "column": 5,
-                        "message": "Falta 'in' en el bucle for",
+                        "column": line.unclosed,
+                        "message": "Comillas simples desbalanceadas" if raw[line.unclosed - 1] == "'" else "Comillas dobles desbalanceadas",
                         "severity": "error"
                     })
-            
-            if stripped.startswith("else"):
-                if stripped != "else:":
-                    errors.append({
+
+            if code and document_rules:
+                line_declared, line_used = self.line_names(line)
+                names.update(line_declared)
+                used.extend((i, word, column) for word, column in line_used)
+
+            if not code or not context_rules:
+                continue
+
+            # --- Reglas que dependen de las lineas anteriores ---
+            indent = line.indent
+            if indent == 0 and stripped.startswith("var "):
+                declared.add(stripped[4:].split("=", 1)[0].strip())
+
+            # return fuera de funcion
+            if stripped.startswith("func ") and stripped.endswith(":"):
+                in_func = True
+                func_indent = indent
+            else:
+                if in_func and indent <= func_indent:
+                    in_func = False
+                if stripped.startswith("return") and not in_func:
+                    returns.append({
                         "line": i,
                         "column": 1,
-                        "message": "Sintaxis incorrecta: debe ser 'else:'",
+                        "message": "'return' solo puede usarse dentro de una funcion",
                         "severity": "error"
                     })
-        
-        return errors
 
-    def check_var_declarations(self, lines):
-        errors = []
-        
-        for i, raw in enumerate(lines, start=1):
-            stripped = raw.strip()
-            
-            if stripped.startswith("var "):
-                if "=" not in stripped:
-                    errors.append({
+            # break/continue fuera de bucle
+            if (stripped.startswith("while ") or stripped.startswith("for ")) and stripped.endswith(":"):
+                in_loop = True
+                loop_indent = indent
+            else:
+                if in_loop and indent <= loop_indent:
+                    in_loop = False
+                if (stripped == "break" or stripped == "continue") and not in_loop:
+                    loops.append({
                         "line": i,
                         "column": 1,
-                        "message": "Declaracion invalida: debe ser 'var nombre = valor'",
-                        "severity": "error"
-                    })
-                    continue
-                
-                parts = stripped[4:].split("=", 1)
-                var_name = parts[0].strip()
-                
-                if not var_name:
-                    errors.append({
-                        "line": i,
-                        "column": 5,
-                        "message": "Falta nombre de variable",
-                        "severity": "error"
-                    })
-                    continue
-                
-                pattern = r"^[a-zA-Z_][a-zA-Z0-9_]*$"
-                if not re.match(pattern, var_name):
-                    errors.append({
-                        "line": i,
-                        "column": 5,
-                        "message": "Nombre de variable invalido",
+                        "message": f"'{stripped}' solo puede usarse dentro de un bucle",
                         "severity": "error"
                     })
-                
-                if len(parts) < 2 or not parts[1].strip():
-                    errors.append({
-                        "line": i,
-                        "column": raw.find("=") + 2,
-                        "message": "Falta valor en la declaracion",
-                        "severity": "error"
-                    })
-        
-        return errors
 
-    def check_balanced_delimiters(self, lines):
+            # El bloque anterior tiene cuerpo si esta linea esta mas indentada
+            if open_block is not None and indent <= open_block[1]:
+                empty_blocks.append(self._empty_block(open_block))
+            if stripped.endswith(":"):
+                open_block = (i, indent, len(raw) - len(raw.lstrip()) + len(stripped) + 1)
+            else:
+                open_block = None
+
+            # Funciones memo: esta linea cierra las que tengan igual o mayor indentacion
+            # y es parte del cuerpo de las que sigan abiertas
+            while memo_open and memo_open[-1]["indent"] >= indent:
+                memo_open.pop()
+            if memo_open:
+                self._memo_body_line(i, stripped, masked.strip(), indent, memo_open)
+            if pending_memo is not None:
+                if stripped.startswith("func "):
+                    params = stripped.partition("(")[2].partition(")")[0]
+                    pending_memo.update(
+                        name=stripped[5:].split("(", 1)[0].strip(),
+                        indent=indent,
+                        local_names={p.strip() for p in params.split(",") if p.strip()},
+                        body=[],
+                    )
+                    memo_open.append(pending_memo)
+                pending_memo = None
+            if stripped == "@memo":
+                pending_memo = {"line": i}
+                memo.append(pending_memo)
+
+        if open_block is not None:
+            empty_blocks.append(self._empty_block(open_block))
+
+        memo_errors = []
+        if context_rules:
+            if global_names is None:
+                global_names = declared
+            for entry in memo:
+                self._memo_errors(entry, global_names, memo_errors)
+
+        suggestions = self.suggestions(used, names) if document_rules else []
+
+        return [
+            indentation, block_syntax, var_declarations, delimiters, returns,
+            loops, typos, empty_blocks, strings, memo_errors, suggestions,
+        ]
+
+    def line_names(self, line):
+        """(nombres que declara la linea, [(identificador, columna)] de los demas que usa)"""
+        code = line.code
+        stripped = code.strip()
+
+        declared = FOR_VARS.findall(code)
+        if stripped.startswith("var "):
+            declared.append(stripped[4:].split("=", 1)[0].strip())
+        elif stripped.startswith("func "):
+            declared.append(stripped[5:].split("(", 1)[0].strip())
+            params = stripped.partition("(")[2].partition(")")[0]
+            declared.extend(p.strip() for p in params.split(",") if p.strip())
+        else:
+            match = ASSIGNMENT.match(stripped)
+            if match:
+                declared.append(match.group(1))
+
+        # Los parametros de una lambda estan declarados desde ella hasta el final de la linea
+        lambdas = [
+            (match.start(), {p.split("=", 1)[0].strip() for p in match.group(1).split(",")})
+            for match in LAMBDA.finditer(code)
+        ]
+        known = self.known_names
+        used = []
+        # 'nombre=' dentro de parentesis es un argumento; sin '=' en la linea no hay ninguno
+        keywords = "=" in code
+        for match in IDENTIFIER.finditer(code):
+            word = match.group()
+            if word in known:
+                continue
+            start = match.start()
+            if (keywords and KEYWORD_ARGUMENT.match(code, match.end())
+                    and code.count("(", 0, start) > code.count(")", 0, start)):
+                continue
+            if lambdas and any(lambda_start < start and word in params for lambda_start, params in lambdas):
+                continue
+            used.append((word, start + 1))
+        return declared, used
+
+    def suggestions(self, used, names, cache=None):
+        """Avisos para los identificadores de ``used`` que no estan en ``names`` pero se parecen a
+        una palabra reservada, a una funcion predefinida o a un nombre de ``names``.
+
+        ``cache`` (palabra -> sugerencia o None) guarda las busquedas hechas
+        con estos mismos ``names``; LintSession lo conserva entre ediciones.
+        """
         errors = []
-        
-        for i, raw in enumerate(lines, start=1):
-            stripped = raw.strip()
-            if not stripped or stripped.startswith("#"):
+        names_index = None
+        if cache is None:
+            cache = {}
+        looked_up = set()
+        for line, word, column in used:
+            if word in names or len(word) < 3:
                 continue
-            
-            open_paren = stripped.count("(")
-            close_paren = stripped.count(")")
-            
-            if open_paren != close_paren:
-                col = stripped.find("(") + 1 if open_paren > close_paren else stripped.find(")") + 1
+            if word not in looked_up:
+                # Solo los primeros nombres distintos del documento, con o sin cache
+                if len(looked_up) >= MAX_SUGGESTION_LOOKUPS:
+                    continue
+                looked_up.add(word)
+            if word not in cache:
+                if names_index is None:
+                    names_index = self._index_names(names)
+                cache[word] = self._suggestion(word, names, names_index)
+            if cache[word] is not None:
+                errors.append({
+                    "line": line,
+                    "column": column,
+                    "message": f"Posible error: ¿quisiste escribir '{cache[word]}'?",
+                    "severity": "warning"
+                })
+        return errors
+
+    def _suggestion(self, word, names, names_index):
+        # Palabras cortas: solo una letra de diferencia
+        limit = suggestion_limit(word)
+        found = self.keyword_index.search(word, limit) + [
+            (distance, name) for distance, name in names_index.search(word, limit) if name in names
+        ]
+        if not found:
+            return None
+        # Entre las candidatas, la mas cercana contando intercambios de letras
+        return min((edit_distance(word, candidate, transpositions=True, max_distance=distance), distance, candidate)
+                   for distance, candidate in found)[2]
+
+    def _block_syntax(self, i, stripped, errors):
+        if stripped.startswith("func "):
+            if not stripped.endswith(":"):
                 errors.append({
                     "line": i,
-                    "column": col if col > 0 else 1,
-                    "message": "Parentesis desbalanceados",
+                    "column": len(stripped) + 1,
+                    "message": "Falta ':' al final de la definicion de funcion",
                     "severity": "error"
                 })
-        
-        return errors
 
-    def check_return_placement(self, lines):
-        errors = []
-        in_func = False
-        func_indent = 0
-        
-        for i, raw in enumerate(lines, start=1):
-            stripped = raw.strip()
-            if not stripped or stripped.startswith("#"):
-                continue
-            
-            indent = len(raw) - len(raw.lstrip(" "))
-            
-            if stripped.startswith("func ") and stripped.endswith(":"):
-                in_func = True
-                func_indent = indent
-                continue
-            
-            if in_func and indent <= func_indent:
-                in_func = False
-            
-            if stripped.startswith("return") and not in_func:
+            if "(" not in stripped or ")" not in stripped:
                 errors.append({
                     "line": i,
-                    "column": 1,
-                    "message": "'return' solo puede usarse dentro de una funcion",
+                    "column": 5,
+                    "message": "Sintaxis de funcion invalida",
                     "severity": "error"
                 })
-        
-        return errors
 
-    def check_break_continue_placement(self, lines):
-        errors = []
-        in_loop = False
-        loop_indent = 0
-        
-        for i, raw in enumerate(lines, start=1):
-            stripped = raw.strip()
-            if not stripped or stripped.startswith("#"):
-                continue
-            
-            indent = len(raw) - len(raw.lstrip(" "))
-            
-            if (stripped.startswith("while ") or stripped.startswith("for ")) and stripped.endswith(":"):
-                in_loop = True
-                loop_indent = indent
-                continue
-            
-            if in_loop and indent <= loop_indent:
-                in_loop = False
-            
-            if (stripped == "break" or stripped == "continue") and not in_loop:
+        if stripped.startswith("if ") or stripped.startswith("elif "):
+            if not stripped.endswith(":"):
                 errors.append({
                     "line": i,
-                    "column": 1,
-                    "message": f"'{stripped}' solo puede usarse dentro de un bucle",
+                    "column": len(stripped) + 1,
+                    "message": "Falta ':' al final de la condicion",
                     "severity": "error"
                 })
-        
-        return errors
 
-    def check_typos(self, lines):
-        errors = []
-        
-        for i, raw in enumerate(lines, start=1):
-            for typo, correct in self.typos.items():
-                pattern = r'\b' + re.escape(typo) + r'\b'
-                if re.search(pattern, raw):
-                    errors.append({
-                        "line": i,
-                        "column": raw.find(typo) + 1,
-                        "message": f"Posible error: ¿quisiste escribir '{correct}'?",
-                        "severity": "warning"
-                    })
-        
-        return errors
+        if stripped.startswith("while "):
+            if not stripped.endswith(":"):
+                errors.append({
+                    "line": i,
+                    "column": len(stripped) + 1,
+                    "message": "Falta ':' al final del while",
+                    "severity": "error"
+                })
 
-    def check_empty_blocks(self, lines):
-        errors = []
-        
-        for i in range(len(lines)):
-            stripped = lines[i].strip()
-            
-            if not stripped or stripped.startswith("#") or not stripped.endswith(":"):
-                continue
-            
-            current_indent = len(lines[i]) - len(lines[i].lstrip(" "))
-            has_body = False
-            
-            for j in range(i + 1, len(lines)):
-                next_line = lines[j]
-                next_stripped = next_line.strip()
-                
-                if not next_stripped or next_stripped.startswith("#"):
-                    continue
-                
-                next_indent = len(next_line) - len(next_line.lstrip(" "))
-                
-                if next_indent > current_indent:
-                    has_body = True
-                    break
-                else:
-                    break
-            
-            if not has_body:
+        if stripped.startswith("for "):
+            if not stripped.endswith(":"):
                 errors.append({
-                    "line": i + 1,
-                    "column": len(lines[i].rstrip()) + 1,
-                    "message": "Bloque vacio",
-                    "severity": "warning"
+                    "line": i,
+                    "column": len(stripped) + 1,
+                    "message": "Falta ':' al final del for",
+                    "severity": "error"
                 })
-        
-        return errors
 
-    def check_string_literals(self, lines):
-        errors = []
-        
-        for i, raw in enumerate(lines, start=1):
-            single_quotes = len(re.findall(r"(?<!\\)'", raw))
-            double_quotes = len(re.findall(r'(?<!\\)"', raw))
-            
-            if single_quotes % 2 != 0:
+            if " in " not in stripped:
                 errors.append({
                     "line": i,
-                    "column": raw.find("'") + 1,
-                    "message": "Comillas simples desbalanceadas",
+                    "column": 5,
+                    "message": "Falta 'in' en el bucle for",
                     "severity": "error"
                 })
-            
-            if double_quotes % 2 != 0:
+
+        if stripped.startswith("@") and stripped != "@memo":
+            errors.append({
+                "line": i,
+                "column": 1,
+                "message": f"Decorador desconocido: '{stripped}' (solo existe '@memo')",
+                "severity": "error"
+            })
+
+        if stripped.startswith("else"):
+            if stripped != "else:":
                 errors.append({
                     "line": i,
-                    "column": raw.find('"') + 1,
-                    "message": "Comillas dobles desbalanceadas",
+                    "column": 1,
+                    "message": "Sintaxis incorrecta: debe ser 'else:'",
                     "severity": "error"
                 })
-        
-        return errors
+
+    def _var_declaration(self, i, raw, stripped, errors):
+        if "=" not in stripped:
+            errors.append({
+                "line": i,
+                "column": 1,
+                "message": "Declaracion invalida: debe ser 'var nombre = valor'",
+                "severity": "error"
+            })
+            return
+
+        name, value = stripped[4:].split("=", 1)
+        name = name.strip()
+        if not name:
+            errors.append({
+                "line": i,
+                "column": 5,
+                "message": "Falta nombre de variable",
+                "severity": "error"
+            })
+            return
+
+        if not VAR_NAME.match(name):
+            errors.append({
+                "line": i,
+                "column": 5,
+                "message": "Nombre de variable invalido",
+                "severity": "error"
+            })
+
+        if not value.strip():
+            errors.append({
+                "line": i,
+                "column": raw.find("=") + 2,
+                "message": "Falta valor en la declaracion",
+                "severity": "error"
+            })
+
+    def _empty_block(self, block):
+        line, _, column = block
+        return {
+            "line": line,
+            "column": column,
+            "message": "Bloque vacio",
+            "severity": "warning"
+        }
+
+    def _memo_body_line(self, i, stripped, masked, indent, memo_open):
+        """Anota una linea del cuerpo de las funciones memo abiertas"""
+        local = None
+        if stripped.startswith("var "):
+            local = stripped[4:].split("=", 1)[0].strip()
+        else:
+            match = FOR_VAR.match(stripped)
+            if match:
+                local = match.group(1)
+
+        prints = stripped.startswith("print(")
+        match = ASSIGNMENT.match(stripped)
+        assigned = match.group(1) if match else None
+        calls = [(call.group(1), call.start()) for call in MUTATION.finditer(masked)]
+
+        for function in memo_open:
+            if local is not None:
+                function["local_names"].add(local)
+            if prints or assigned or calls:
+                function["body"].append((i, indent, prints, assigned, calls))
+
+    def _memo_errors(self, entry, global_names, errors):
+        """'@memo' debe preceder a una funcion, y esa funcion no deberia tener efectos"""
+        if "name" not in entry:
+            errors.append({
+                "line": entry["line"],
+                "column": 1,
+                "message": "'@memo' debe ir seguido de una definicion de funcion",
+                "severity": "error"
+            })
+            return
+
+        name = entry["name"]
+        local_names = entry["local_names"]
+        for j, body_indent, prints, assigned, calls in entry["body"]:
+            column = body_indent + 1
+            if prints:
+                errors.append({
+                    "line": j,
+                    "column": column,
+                    "message": f"La funcion memo '{name}' imprime: las llamadas guardadas en cache no volveran a imprimir",
+                    "severity": "warning"
+                })
+
+            if assigned in global_names and assigned not in local_names:
+                errors.append({
+                    "line": j,
+                    "column": column,
+                    "message": f"La funcion memo '{name}' modifica la variable global '{assigned}'",
+                    "severity": "warning"
+                })
+
+            for target, start in calls:
+                if target not in local_names:
+                    errors.append({
+                        "line": j,
+                        "column": body_indent + start + 1,
+                        "message": f"La funcion memo '{name}' modifica '{target}', que no es local",
+                        "severity": "warning"
+                    })
+
+    def _index_names(self, names):
+        # El indice se reutiliza entre llamadas y solo crece: los nombres que
+        # ya no existen se descartan al buscar, y se rehace si sobran muchos
+        index = self._names_index
+        if index is None or len(index.words) > 2 * len(names) + 100:
+            index = self._names_index = NameIndex()
+        for name in sorted(names - index.words):
+            index.add(name)
+        return index
 
     def remove_duplicates(self, errors):
         seen = set()
@@ -368,6 +654,142 @@ class Checker:
         return sorted(clean, key=lambda x: (x["line"], x.get("column", 0)))
 
 
+# --- Lint incremental ---
+def split_lines(text):
+    """Lineas de ``text`` tal como las numera el editor ('\n', '\r\n' o '\r')"""
+    return text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+class LintSession:
+    """Documento abierto en el editor que se analiza de forma incremental.
+
+    El documento se divide en bloques de nivel superior: cada linea de
+    codigo sin indentar abre uno, salvo que la anterior sea un decorador.
+    Ninguna regla mira fuera de su bloque, asi que los errores de las
+    reglas de una linea se guardan por linea y los del resto por bloque, y
+    una edicion solo vuelve a analizar las lineas y los bloques que cambian.
+    """
+    def __init__(self, source="", version=0, checker=None):
+        self.checker = checker or Checker()
+        self.lock = threading.Lock()
+        self._blocks = {}  # contenido del bloque -> errores, con lineas relativas al bloque
+        self.reset(source, version)
+
+    def reset(self, source, version):
+        """Reemplaza todo el documento"""
+        self.lines = split_lines(source)
+        self._info = [self._analyze_line(raw) for raw in self.lines]
+        self.size = len(source)
+        self.version = version
+        # Sugerencias por palabra (ver Checker.suggestions), validas para _suggested_names
+        self._suggested = {}
+        self._suggested_words = NameIndex()
+        self._suggested_names = frozenset()
+
+    def apply_edit(self, start_line, start_column, end_line, end_column, text):
+        """Reemplaza el texto entre dos posiciones (lineas y columnas desde 1, como en Monaco)"""
+        lines = self.lines
+        if not (1 <= start_line <= end_line <= len(lines)) or start_column < 1 or end_column < 1:
+            raise ValueError("Rango de edicion fuera del documento")
+        if start_line == end_line and end_column < start_column:
+            raise ValueError("Rango de edicion invertido")
+        
+        old = lines[start_line - 1:end_line]
+        new = split_lines(old[0][:start_column - 1] + text + old[-1][end_column - 1:])
+        lines[start_line - 1:end_line] = new
+        self._info[start_line - 1:end_line] = [self._analyze_line(raw) for raw in new]
+        self.size += sum(map(len, new)) - sum(map(len, old)) + len(new) - len(old)
+
+    def _analyze_line(self, raw):
+        # (errores de las reglas de una linea, linea de lexer, sin indentar, decorador, '@memo',
+        #  variable global, nombres declarados y usados)
+        line = lex_line(raw)
+        errors = self._ranked(self.checker.scan([line], context_rules=False, document_rules=False))
+        text = line.text
+        top = bool(text) and line.indent == 0
+        global_name = text[4:].split("=", 1)[0].strip() if top and text.startswith("var ") else None
+        names = self.checker.line_names(line) if text else ((), ())
+        return (errors, line, top, text.startswith("@"), text == "@memo", global_name, names)
+
+    def _suggestion_cache(self, names):
+        """Sugerencias de la ultima vez, sin las que pueden cambiar con los nombres
+        declarados que aparecieron o desaparecieron desde entonces"""
+        cache = self._suggested
+        old = self._suggested_names
+        if names == old:
+            return cache
+        added, removed = names - old, old - names
+        if len(added) + len(removed) > 100 or len(cache) > 4 * MAX_SUGGESTION_LOOKUPS:
+            cache.clear()
+            self._suggested_words = NameIndex()
+        else:
+            for word, suggestion in list(cache.items()):
+                if suggestion in removed:
+                    del cache[word]
+            # Un nombre nuevo puede ser mejor sugerencia para las palabras parecidas
+            for name in added:
+                for distance, word in self._suggested_words.search(name, 2):
+                    if distance <= suggestion_limit(word):
+                        cache.pop(word, None)
+        self._suggested_names = names
+        return cache
+
+    def _ranked(self, found):
+        # (posicion de la regla en Checker.RULES, error) para ordenar como Checker.check
+        return [(rank, error) for rank, errors in enumerate(found) for error in errors]
+
+    def errors(self):
+        """Los mismos errores que Checker.check sobre el documento completo"""
+        info = self._info
+        global_names = frozenset(entry[5] for entry in info if entry[5] is not None)
+        
+        starts = [0]
+        after_decorator = False
+        for i, (_, line, top, decorator, _, _, _) in enumerate(info):
+            if line.text:
+                if top and i and not after_decorator:
+                    starts.append(i)
+                after_decorator = decorator
+        starts.append(len(info))
+        
+        found = []
+        names = set()
+        used = []
+        for i, entry in enumerate(info):
+            for rank, error in entry[0]:
+                found.append((i + 1, error["column"], rank, dict(error, line=i + 1)))
+            line_declared, line_used = entry[6]
+            names.update(line_declared)
+            used.extend((i + 1, word, column) for word, column in line_used)
+        
+        # Reglas de todo el documento: solo dependen de los nombres de cada linea, ya calculados
+        rank = Checker.RULES.index('suggestions')
+        cache = self._suggestion_cache(frozenset(names))
+        for error in self.checker.suggestions(used, names, cache):
+            found.append((error["line"], error["column"], rank, error))
+        for word in cache.keys() - self._suggested_words.words:
+            self._suggested_words.add(word)
+        
+        blocks = {}
+        for start, end in zip(starts, starts[1:]):
+            block = tuple(self.lines[start:end])
+            has_memo = any(entry[4] for entry in info[start:end])
+            key = (block, global_names) if has_memo else block
+            block_errors = blocks.get(key)
+            if block_errors is None:
+                block_errors = self._blocks.get(key)
+            if block_errors is None:
+                block_lines = [entry[1] for entry in info[start:end]]
+                block_errors = self._ranked(self.checker.scan(block_lines, line_rules=False, document_rules=False, global_names=global_names))
+            blocks[key] = block_errors
+            for rank, error in block_errors:
+                line = start + error["line"]
+                found.append((line, error["column"], rank, dict(error, line=line)))
+        self._blocks = blocks
+        
+        found.sort(key=lambda item: item[:3])
+        return self.checker.remove_duplicates([error for *_, error in found])
+
+
 if __name__ == "__main__":
     print("="*60)
     print("PRUEBA: Codigo de ejemplo")
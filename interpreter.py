@@ -1,25 +1,42 @@
-import io
-import sys
 import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from pyra_parser import (
+    Parser, Func, If, While, For, Assign, Print, Expr, Return, Break, Continue, Invalid
+)
+from pyra_compiler import Compiler, plan_expression, FILENAME as COMPILED_FILENAME
+from lexer import lex, program_lines
+import arrays
+
+# Señales de control de flujo: los bloques las devuelven en lugar de lanzar
+# excepciones. El valor de 'return' queda en Interpreter.return_value.
+BREAK = 1
+CONTINUE = 2
+RETURN = 3
+
+# Peticiones de los marcos al ejecutor con pila explícita (Interpreter._drive)
+CALL = 1
+TAIL = 2
+RET = 3
 
-# Excepciones de control de flujo
 class ReturnValue(Exception):
+    """'return' fuera de una función en el modo compilado: termina el programa"""
     def __init__(self, value):
         self.value = value
 
-class BreakLoop(Exception):
-    """Excepción para manejar 'break'"""
-    pass
-
-class ContinueLoop(Exception):
-    """Excepción para manejar 'continue'"""
-    pass
-
 class InterpreterError(Exception):
-    """Error del intérprete con información de línea"""
-    def __init__(self, message, line_num=None):
+    """Error del intérprete con información de línea.
+
+    ``category`` agrupa los errores para las estadísticas del servidor:
+    "syntax", "name", "arity", "type", "index", "key", "value",
+    "zero_division", "limit", "cancelled" o "runtime".
+    """
+    def __init__(self, message, line_num=None, category="runtime"):
         self.message = message
         self.line_num = line_num
+        self.category = category
         super().__init__(self.format_message())
     
     def format_message(self):
@@ -27,454 +44,1155 @@ class InterpreterError(Exception):
             return f"❌ Error en línea {self.line_num}: {self.message}"
         return f"❌ Error: {self.message}"
 
-class Interpreter:
+class BudgetExceeded(InterpreterError):
+    """Se agotó un límite del presupuesto de ejecución; ``limit`` dice cuál (p. ej. "max_statements")"""
+    def __init__(self, limit, message, line_num=None):
+        self.limit = limit
+        super().__init__(message, line_num, "limit")
+
+ARITY_TOO_MANY = re.compile(r"(\w+)\(\) takes (\d+) positional arguments? but (\d+) (?:was|were) given")
+ARITY_MISSING = re.compile(r"(\w+)\(\) missing (\d+) required positional arguments?")
+
+def translate_error(e, line_num=None, function_names=None):
+    """Convierte una excepción de Python en un InterpreterError con mensaje Pyra.
+
+    ``function_names`` (nombre en Python -> (nombre Pyra, nº de parámetros))
+    permite reportar errores de aridad de funciones compiladas igual que en
+    el modo por árbol.
+    """
+    if isinstance(e, NameError):
+        var_name = str(e).split("'")[1] if "'" in str(e) else "desconocida"
+        return InterpreterError(f"Variable o función '{var_name}' no está definida", line_num, "name")
+    if isinstance(e, SyntaxError):
+        return InterpreterError(f"Sintaxis inválida en expresión", line_num, "syntax")
+    if isinstance(e, ZeroDivisionError):
+        return InterpreterError("División por cero", line_num, "zero_division")
+    if isinstance(e, RecursionError):
+        return BudgetExceeded("max_depth", "Límite de recursión excedido", line_num)
+    if isinstance(e, MemoryError):
+        return BudgetExceeded("max_memory_mb", "Límite de memoria excedido", line_num)
+    if isinstance(e, TypeError):
+        if function_names:
+            message = str(e)
+            match = ARITY_TOO_MANY.match(message)
+            if match and match.group(1) in function_names:
+                name, expected = function_names[match.group(1)]
+                return InterpreterError(f"Función '{name}' espera {expected} argumentos, pero recibió {match.group(3)} (demasiados)", line_num, "arity")
+            match = ARITY_MISSING.match(message)
+            if match and match.group(1) in function_names:
+                name, expected = function_names[match.group(1)]
+                received = expected - int(match.group(2))
+                return InterpreterError(f"Función '{name}' espera {expected} argumentos, pero recibió {received}", line_num, "arity")
+        return InterpreterError(f"Error de tipo: {e}", line_num, "type")
+    if isinstance(e, IndexError):
+        return InterpreterError(f"Índice fuera de rango: {e}", line_num, "index")
+    if isinstance(e, KeyError):
+        return InterpreterError(f"Clave no encontrada: {e}", line_num, "key")
+    if isinstance(e, ValueError):
+        return InterpreterError(f"Valor inválido: {e}", line_num, "value")
+    return InterpreterError(f"Error al evaluar expresión: {e}", line_num)
+
+
+def _array(values=()):
+    """Builtin array(...): lista de números con operaciones vectorizadas (ver arrays.py)"""
+    if not arrays.AVAILABLE:
+        raise InterpreterError("array(...) no está disponible: el servidor no tiene NumPy instalado")
+    return arrays.Array(values)
+
+
+# Funciones de Python disponibles en los programas Pyra
+SAFE_BUILTINS = {
+    "str": str,
+    "int": int,
+    "float": float,
+    "bool": bool,
+    "len": len,
+    "range": range,
+    "list": list,
+    "sum": arrays.reduction(sum),  # con un array se calculan en NumPy
+    "min": arrays.reduction(min),
+    "max": arrays.reduction(max),
+    "abs": abs,
+    "round": round,
+    "sorted": sorted,
+    "reversed": reversed,
+    "enumerate": enumerate,
+    "array": _array,
+}
+# Las llamadas a estos nombres no se extraen de las expresiones
+# ('print' lo añade cada intérprete, ligado a su OutputSink)
+BUILTIN_NAMES = frozenset(SAFE_BUILTINS) | {"print"}
+
+
+class OutputSink:
+    """Salida de un programa.
+
+    Cada intérprete tiene la suya, así que varios programas pueden
+    ejecutarse a la vez en distintos hilos sin tocar ``sys.stdout``. Los
+    fragmentos se acumulan en una lista y se unen una sola vez al final.
+
+    Con ``max_bytes``/``max_lines`` la salida queda acotada: se guardan la
+    primera y la última mitad del límite y lo del medio se descarta
+    (quedan contados en dropped_bytes/dropped_lines). Con ``abort=True``, al
+    llegar al límite el programa se detiene con BudgetExceeded.
+    """
+    def __init__(self, max_bytes=None, max_lines=None, abort=False):
+        self._parts = []
+        self.max_bytes = max_bytes
+        self.max_lines = max_lines
+        self.abort = abort
+        self.limited = max_bytes is not None or max_lines is not None
+        self.total_bytes = 0
+        self.total_lines = 0
+        self.dropped_bytes = 0
+        self.dropped_lines = 0
+        if self.limited:
+            # Sin abort, la cabeza se queda con la mitad del límite y la cola con la otra
+            share = 1 if abort else 2
+            self._head_max_bytes = max_bytes // share if max_bytes is not None else sys.maxsize
+            self._head_max_lines = max_lines // share if max_lines is not None else sys.maxsize
+            self._tail_max_bytes = self._head_max_bytes if not abort else 0
+            self._tail_max_lines = self._head_max_lines if not abort else 0
+            self._head_bytes = 0
+            self._head_lines = 0
+            self._head_full = False
+            self._tail = deque()   # (texto, bytes, líneas) de los últimos fragmentos
+            self._tail_bytes = 0
+            self._tail_lines = 0
+
+    def write(self, text):
+        if self.limited:
+            self._write_limited(text)
+        else:
+            self._emit(text)
+
+    def line(self, value):
+        """Sentencia 'print': el valor seguido de un salto de línea"""
+        if self.limited:
+            self._write_limited(f"{value}\n")
+        else:
+            parts = self._parts
+            parts.append(str(value))
+            parts.append("\n")
+
+    def print(self, *values, sep=" ", end="\n"):
+        """'print' de Python para los programas Pyra (p. ej. ``map(print, lista)``)"""
+        self.write(sep.join(map(str, values)) + end)
+
+    def final_line(self, value):
+        """Línea que se escribe aunque se haya llegado al límite (mensajes de error finales)"""
+        text = f"{value}\n"
+        if self.limited and self._head_full:
+            self._tail.append((text, 0, 0))
+        else:
+            self._emit(text)
+
+    def _emit(self, text):
+        self._parts.append(text)
+
+    def _write_limited(self, text):
+        size = len(text) if text.isascii() else len(text.encode("utf-8"))
+        lines = text.count("\n")
+        self.total_bytes += size
+        self.total_lines += lines
+
+        if not self._head_full:
+            if self._head_bytes + size <= self._head_max_bytes and self._head_lines + lines <= self._head_max_lines:
+                self._head_bytes += size
+                self._head_lines += lines
+                self._emit(text)
+                return
+            self._head_full = True
+            if self.abort:
+                self.dropped_bytes += size
+                self.dropped_lines += lines
+                if self.max_bytes is not None and self._head_bytes + size > self._head_max_bytes:
+                    raise BudgetExceeded("max_output_bytes", f"Límite de salida excedido (más de {self.max_bytes:,} bytes)")
+                raise BudgetExceeded("max_output_lines", f"Límite de salida excedido (más de {self.max_lines:,} líneas)")
+
+        # Cola: solo se conservan los últimos fragmentos que caben en el límite
+        tail = self._tail
+        tail.append((text, size, lines))
+        self._tail_bytes += size
+        self._tail_lines += lines
+        while tail and (self._tail_bytes > self._tail_max_bytes or self._tail_lines > self._tail_max_lines):
+            _, dropped_size, dropped_lines = tail.popleft()
+            self._tail_bytes -= dropped_size
+            self._tail_lines -= dropped_lines
+            self.dropped_bytes += dropped_size
+            self.dropped_lines += dropped_lines
+
+    def _tail_text(self):
+        if not self.limited or not self._tail and not self.dropped_bytes:
+            return ""
+        marker = ""
+        if self.dropped_bytes and not self.abort:
+            marker = f"... [{self.dropped_lines:,} líneas omitidas ({self.dropped_bytes:,} bytes)] ...\n"
+        return marker + "".join(text for text, _, _ in self._tail)
+
+    def stats(self):
+        return {
+            "bytes": self.total_bytes,
+            "lines": self.total_lines,
+            "dropped_bytes": self.dropped_bytes,
+            "dropped_lines": self.dropped_lines,
+            "truncated": bool(self.dropped_bytes or self.dropped_lines),
+        }
+
+    def getvalue(self):
+        return "".join(self._parts) + self._tail_text()
+
+
+class StreamingSink(OutputSink):
+    """Salida que otro hilo recoge por fragmentos (take) mientras el programa corre.
+
+    Si se acumulan ``max_pending`` caracteres sin recoger, el programa espera
+    a que el lector avance, así la memoria no crece con programas muy
+    habladores y lectores lentos. Con límite de salida, la cola se envía al
+    terminar.
+    """
+    def __init__(self, max_pending=1 << 20, **limits):
+        super().__init__(**limits)
+        self.max_pending = max_pending
+        self.finished = False
+        self.closed = False
+        self._pending = 0
+        self._cond = threading.Condition()
+
+    def _emit(self, text):
+        with self._cond:
+            while self._pending >= self.max_pending and not self.closed:
+                self._cond.wait()
+            if self.closed:
+                raise InterpreterError("Ejecución cancelada", category="cancelled")
+            self._parts.append(text)
+            if not self._pending:
+                self._cond.notify_all()
+            self._pending += len(text)
+
+    def line(self, value):
+        self.write(f"{value}\n")
+
+    def finish(self):
+        """El programa terminó: ya no habrá más salida"""
+        tail = self._tail_text()
+        with self._cond:
+            if tail:
+                self._parts.append(tail)
+                self._pending += len(tail)
+            self.finished = True
+            self._cond.notify_all()
+
+    def close(self):
+        """El lector se fue: el programa falla en su próxima escritura"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def take(self, timeout=None):
+        """Espera salida nueva (o el final) y devuelve (lo acumulado desde la
+        última vez, si el programa ya terminó), leídos juntos bajo el lock
+        para no perder lo que finish() agregue entre ambas lecturas"""
+        with self._cond:
+            if not self._pending and not self.finished:
+                self._cond.wait(timeout)
+            parts, self._parts = self._parts, []
+            self._pending = 0
+            finished = self.finished
+            self._cond.notify_all()
+        return "".join(parts), finished
+
+
+class ExpressionCache:
+    """Caché de expresiones compiladas (ExpressionPlan), indexada por su texto.
+
+    Con ``maxsize=None`` la caché no tiene límite (uso por programa); con un
+    entero se comporta como una LRU acotada y es segura entre hilos.
+    """
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, expr):
+        """Devuelve el plan compilado de ``expr`` (puede lanzar SyntaxError)"""
+        if self.maxsize is None:
+            # Caché por programa: un solo hilo, sin bloqueo ni orden LRU
+            plan = self._plans.get(expr)
+            if plan is None:
+                self.misses += 1
+                plan = self._plans[expr] = plan_expression(expr, BUILTIN_NAMES)
+            else:
+                self.hits += 1
+            return plan
+
+        with self._lock:
+            plan = self._plans.get(expr)
+            if plan is not None:
+                self.hits += 1
+                self._plans.move_to_end(expr)
+                return plan
+            self.misses += 1
+
+        plan = plan_expression(expr, BUILTIN_NAMES)
+
+        with self._lock:
+            self._plans[expr] = plan
+            if len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._plans),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+# --- Auxiliares del modo compilado ---
+def _checked_iter(value, text, line_num):
+    try:
+        return iter(value)
+    except TypeError:
+        raise InterpreterError(f"'{text}' no es iterable", line_num, "type")
+
+def _fail(message, line_num, limit=None):
+    """Sentencias inválidas del modo compilado (o un límite, con ``limit``)"""
+    if limit:
+        raise BudgetExceeded(limit, message, line_num)
+    raise InterpreterError(message, line_num, "syntax")
+
+def _compiled_line(tb, skip=0):
+    """Línea Pyra del último marco de código compilado en el traceback
+    (o del anterior a él, con ``skip=1``)"""
+    lines = []
+    while tb is not None:
+        if tb.tb_frame.f_code.co_filename == COMPILED_FILENAME:
+            lines.append(tb.tb_lineno)
+        tb = tb.tb_next
+    return lines[-1 - skip] if len(lines) > skip else None
+
+
+_MISSING = object()
+
+class MemoCache:
+    """Caché LRU de resultados de una función '@memo', indexada por sus argumentos"""
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.uncacheable = 0
+        self._results = OrderedDict()
+
+    def lookup(self, args):
+        """Resultado guardado para ``args``, o _MISSING"""
+        try:
+            result = self._results.get(args, _MISSING)
+        except TypeError:
+            # Argumentos no hashables (p. ej. listas): se llama sin caché
+            self.uncacheable += 1
+            return _MISSING
+
+        if result is _MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._results.move_to_end(args)
+        return result
+
+    def store(self, args, result):
+        try:
+            self._results[args] = result
+        except TypeError:
+            return
+        if len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def call(self, function, args):
+        """Llama a ``function(*args)`` reutilizando el resultado si ya se calculó"""
+        result = self.lookup(args)
+        if result is _MISSING:
+            result = function(*args)
+            self.store(args, result)
+        return result
+
+    def stats(self):
+        return {
+            "size": len(self._results),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncacheable": self.uncacheable,
+        }
+
+
+class Profiler:
+    """Veces y tiempo acumulado de cada línea y de cada función (Interpreter(profile=True)).
+
+    El tiempo de una línea incluye el de las líneas y llamadas que se
+    ejecutan dentro de ella (el cuerpo de un bucle, las funciones que
+    llama). En la recursión solo suma tiempo el marco más externo, para no
+    contar dos veces el mismo intervalo.
+    """
     def __init__(self):
-        self.global_env = {}
+        self.lines = {}       # línea -> [veces, segundos]
+        self.functions = {}   # nombre -> [llamadas, segundos]
+        self._open = {}       # (tabla, clave) -> marcos abiertos
+
+    def enter(self, table, key):
+        """Cuenta una ejecución de ``key`` y devuelve el instante en que empieza"""
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = [0, 0.0]
+        entry[0] += 1
+        open_key = (id(table), key)
+        self._open[open_key] = self._open.get(open_key, 0) + 1
+        return time.perf_counter()
+
+    def leave(self, table, key, started):
+        open_key = (id(table), key)
+        depth = self._open[open_key] - 1
+        self._open[open_key] = depth
+        if depth == 0:
+            table[key][1] += time.perf_counter() - started
+
+    def line(self, line_num):
+        """Modo compilado: ``with _pyra_line(n):`` alrededor de cada sentencia"""
+        return _ProfileSpan(self, self.lines, line_num)
+
+    def call(self, name):
+        """Modo compilado: ``with _pyra_call(nombre):`` alrededor del cuerpo de cada función"""
+        return _ProfileSpan(self, self.functions, name)
+
+    def stats(self):
+        return {
+            "lines": [
+                {"line": line, "hits": hits, "seconds": round(seconds, 6)}
+                for line, (hits, seconds) in sorted(self.lines.items())
+            ],
+            "functions": [
+                {"name": name, "calls": calls, "seconds": round(seconds, 6)}
+                for name, (calls, seconds) in sorted(self.functions.items(), key=lambda item: -item[1][1])
+            ],
+        }
+
+
+class _ProfileSpan:
+    __slots__ = ("profiler", "table", "key", "started")
+
+    def __init__(self, profiler, table, key):
+        self.profiler = profiler
+        self.table = table
+        self.key = key
+
+    def __enter__(self):
+        self.started = self.profiler.enter(self.table, self.key)
+
+    def __exit__(self, *exc_info):
+        self.profiler.leave(self.table, self.key, self.started)
+        return False
+
+
+class Budget:
+    """Límites de ejecución de un programa; ``None`` desactiva el límite.
+
+    - max_statements: sentencias ejecutadas en total
+    - max_seconds: segundos de reloj desde el inicio de la ejecución
+    - max_depth: llamadas a funciones anidadas (en el modo compilado, como
+      mucho COMPILED_MAX_DEPTH)
+    - max_loop_iterations: vueltas de un mismo bucle while
+    - max_output_bytes / max_output_lines: tamaño de la salida (ver OutputSink)
+    - abort_on_output_limit: detener el programa al llegar al límite de
+      salida en lugar de recortarla
+    - max_memory_mb: memoria del proceso; solo se aplica al ejecutar en un
+      proceso aparte (ver worker_pool)
+    """
+    LIMITS = (
+        "max_statements", "max_seconds", "max_depth", "max_loop_iterations",
+        "max_output_bytes", "max_output_lines", "abort_on_output_limit", "max_memory_mb",
+    )
+
+    def __init__(self, max_statements=None, max_seconds=None, max_depth=10000, max_loop_iterations=100000,
+                 max_output_bytes=None, max_output_lines=None, abort_on_output_limit=False, max_memory_mb=None):
+        self.max_statements = max_statements
+        self.max_seconds = max_seconds
+        self.max_depth = max_depth
+        self.max_loop_iterations = max_loop_iterations
+        self.max_output_bytes = max_output_bytes
+        self.max_output_lines = max_output_lines
+        self.abort_on_output_limit = abort_on_output_limit
+        self.max_memory_mb = max_memory_mb
+
+    def output_limits(self):
+        """Argumentos de OutputSink según este presupuesto"""
+        return {
+            "max_bytes": self.max_output_bytes,
+            "max_lines": self.max_output_lines,
+            "abort": self.abort_on_output_limit,
+        }
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.LIMITS}
+
+    def __repr__(self):
+        limits = ", ".join(f"{name}={value!r}" for name, value in self.as_dict().items())
+        return f"Budget({limits})"
+
+# El reloj y max_statements se revisan cada tantas sentencias
+BUDGET_CHECK_INTERVAL = 1000
+
+# El modo compilado ejecuta las llamadas Pyra en la pila de Python (hasta
+# tres marcos por llamada con @memo): max_depth se recorta a este valor y el
+# límite de recursión de Python se sube para que quepa (ver _fit_recursion_limit)
+COMPILED_MAX_DEPTH = 20_000
+COMPILED_FRAMES_PER_CALL = 3
+_recursion_limit_lock = threading.Lock()
+
+def _fit_recursion_limit(max_depth):
+    """Sube el límite de recursión de Python para ``max_depth`` llamadas
+    compiladas; nunca lo baja, porque es de todo el proceso"""
+    frame, depth = sys._getframe(), 0
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    needed = depth + max_depth * COMPILED_FRAMES_PER_CALL + 100
+    with _recursion_limit_lock:
+        if sys.getrecursionlimit() < needed:
+            sys.setrecursionlimit(needed)
+
+
+# Caché compartida por todo el proceso (opcional, ver Interpreter(shared_cache=True));
+# la usan los trabajos de worker_pool, así un proceso que ejecuta muchos
+# programas compila cada expresión una sola vez
+shared_expression_cache = ExpressionCache(maxsize=4096)
+
+
+class Interpreter:
+    # "tree" recorre el árbol de sentencias; "compiled" traduce el programa
+    # completo a un módulo de Python y lo ejecuta de una vez
+    MODES = ("tree", "compiled")
+
+    def __init__(self, shared_cache=False, mode="tree", memo_size=1024, budget=None, profile=False):
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de ejecución desconocido: {mode!r}")
+        self.mode = mode
+        self.memo_size = memo_size
+        self.budget = budget or Budget()
+        self.call_depth = 0
+        self.statements = 0
+        self.limit_exceeded = None
+        self.error = None
+        self.error_category = None
+        self.cancelled = False
+        self.memo_caches = {}
         self.functions = {}
-        self.output = io.StringIO()
+        self._looping_returns = set()
+        self.output = OutputSink(**self.budget.output_limits())
+        self._new_scope()
         self.current_line = 0
+        self.shared_cache = shared_cache
+        self.expr_cache = shared_expression_cache if shared_cache else ExpressionCache()
+        self.profile = profile
+        self.profiler = None
+        if profile:
+            # Solo al perfilar: las sentencias y los marcos de función pasan
+            # por versiones que miden; sin perfil el ejecutor no cambia
+            self._execute_block = self._profiled_block
+            self._function_frame = self._profiled_frame
+
+    def cache_stats(self):
+        """Estadísticas de la caché de expresiones compiladas"""
+        return self.expr_cache.stats()
 
-    def run(self, code):
-        sys_stdout = sys.stdout
-        sys.stdout = self.output
-        self.global_env = {}
+    def memo_stats(self):
+        """Estadísticas de las funciones '@memo' de la última ejecución"""
+        return {name: cache.stats() for name, cache in self.memo_caches.items()}
+
+    def profile_stats(self):
+        """Veces y tiempo por línea y por función de la última ejecución (None sin profile=True)"""
+        return self.profiler.stats() if self.profiler is not None else None
+
+    def run(self, code, lines=None):
+        """Ejecuta ``code`` y devuelve su salida.
+
+        ``lines`` es el resultado de lexer.lex(code), si ya se calculó. Si
+        el programa falla, ``error`` tiene el mensaje y ``error_category``
+        la categoría del InterpreterError ("internal" si fue un fallo del
+        propio intérprete).
+        """
         self.functions = {}
+        self.memo_caches = {}
+        self._new_scope()
         self.current_line = 0
+        self.call_depth = 0
+        self.return_value = None
+        self.limit_exceeded = None
+        self.error = None
+        self.error_category = None
+        if self.profile:
+            self.profiler = Profiler()
+            self._function_names = {}
+        if not self.shared_cache:
+            self.expr_cache.clear()
 
         try:
-            lines = self._tokenize(code)
-            self._execute_block(lines, self.global_env) 
+            self._start_budget()
+            program = Parser(self._tokenize(code) if lines is None else program_lines(lines)).parse()
+            if self.mode == "compiled":
+                self._run_compiled(program)
+            else:
+                self._looping_returns = Compiler().looping_returns(program)
+                self._drive(self._program_frame(program))
         except ReturnValue:
             pass
+        except BudgetExceeded as e:
+            self.limit_exceeded = e.limit
+            self.error = e.format_message()
+            self.error_category = e.category
         except InterpreterError as e:
-            print(e.format_message())
+            self.error = e.format_message()
+            self.error_category = e.category
         except Exception as e:
-            print(f"❌ Error inesperado: {e}")
-        finally:
-            sys.stdout = sys_stdout
+            self.error = f"❌ Error inesperado: {e}"
+            self.error_category = "internal"
 
+        if self.error:
+            try:
+                self.output.final_line(self.error)
+            except InterpreterError:
+                pass  # salida cerrada (ejecución cancelada)
         return self.output.getvalue()
 
-    # --- Tokenización básica con indentación ---
-    def _tokenize(self, code):
-        result = []
-        for line_num, raw in enumerate(code.strip().splitlines(), start=1):
-            if not raw.strip() or raw.strip().startswith("#"):
-                continue
-            raw_processed = raw.replace('\t', '    ') 
-            indent = len(raw_processed) - len(raw_processed.lstrip())
-            result.append((indent, raw.strip(), line_num))
-        return result
+    def run_iter(self, code, poll_interval=0.1):
+        """Ejecuta ``code`` en un hilo aparte y va produciendo su salida.
 
-    # --- Ejecutar un bloque de líneas ---
-    def _execute_block(self, lines, env, start=0, base_indent=0):
-        i = start
-        while i < len(lines):
-            indent, line, line_num = lines[i]
-            self.current_line = line_num
-            
-            if indent < base_indent:
-                return i
+        Produce ("output", texto) a medida que el programa escribe y, al
+        final, ("done", estado) con las claves statements, limit_exceeded,
+        error, error_category y output (estadísticas de la salida). Si se
+        cierra el generador antes de terminar, el programa se cancela.
+        """
+        sink = self.output = StreamingSink(**self.budget.output_limits())
+        self.cancelled = False
+        worker = threading.Thread(target=self._run_streaming, args=(code, sink), daemon=True)
+        worker.start()
+        try:
+            while True:
+                chunk, finished = sink.take(poll_interval)
+                if chunk:
+                    yield ("output", chunk)
+                if finished:
+                    break
+            yield ("done", {
+                "statements": self.statements,
+                "limit_exceeded": self.limit_exceeded,
+                "error": self.error,
+                "error_category": self.error_category,
+                "output": sink.stats(),
+            })
+        finally:
+            if not sink.finished:
+                self.cancel()
+                sink.close()
 
-            try:
-                if line.startswith("func "):
-                    i = self._define_function(lines, i)
-                    continue
+    def _run_streaming(self, code, sink):
+        try:
+            self.run(code)
+        finally:
+            sink.finish()
 
-                elif line.startswith("if "):
-                    i = self._handle_if_elif_else(lines, i, env, base_indent)
-                    continue
-                
-                elif line.startswith("while "):
-                    i = self._handle_while(lines, i, env, base_indent)
-                    continue
-                
-                elif line.startswith("for "):
-                    i = self._handle_for(lines, i, env, base_indent)
-                    continue
-                
-                elif line == "break":
-                    raise BreakLoop()
-                
-                elif line == "continue":
-                    raise ContinueLoop()
-                
-                elif line.startswith("else:") or line.startswith("elif "):
-                    pass 
-
-                elif line.startswith("var "):
-                    self._handle_var_declaration(line, env, line_num)
-
-                elif line.startswith("print("):
-                    val = self._eval_expr(line[6:-1], env, line_num)
-                    print(val)
+    def cancel(self):
+        """Pide detener la ejecución en curso (desde otro hilo)"""
+        self.cancelled = True
+        # Fuerza la revisión del presupuesto en la próxima sentencia
+        self._next_check = -1
 
-                else:
-                    # Detectar reasignación de variable (sin var)
-                    if "=" in line and not line.startswith(("if ", "elif ", "while ", "for ", "func ", "return")):
-                        self._handle_assignment(line, env, line_num)
-                    else:
-                        self._eval_expr(line, env, line_num)
+    # --- Presupuesto de ejecución ---
+    def _start_budget(self):
+        budget = self.budget
+        self.statements = 0
+        self.max_depth = budget.max_depth if budget.max_depth is not None else sys.maxsize
+        if self.mode == "compiled":
+            self.max_depth = min(self.max_depth, COMPILED_MAX_DEPTH)
+        self.deadline = time.monotonic() + budget.max_seconds if budget.max_seconds is not None else None
+        self._next_check = 0
+        self._check_budget(None)
 
-            except (ReturnValue, BreakLoop, ContinueLoop):
-                raise
-            except InterpreterError:
-                raise
-            except Exception as e:
-                raise InterpreterError(str(e), line_num)
+    def _check_budget(self, line_num):
+        """Se llama cuando ``statements`` supera ``_next_check``: revisa los
+        límites de sentencias y de tiempo y fija el siguiente punto de control"""
+        if self.cancelled:
+            raise InterpreterError("Ejecución cancelada", line_num, "cancelled")
+        budget = self.budget
+        if budget.max_statements is not None and self.statements > budget.max_statements:
+            raise BudgetExceeded("max_statements", f"Límite de ejecución excedido (más de {budget.max_statements:,} sentencias)", line_num)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceeded("max_seconds", f"Límite de tiempo excedido ({budget.max_seconds:g} segundos)", line_num)
 
-            i += 1
-        return i
+        next_check = self.statements + BUDGET_CHECK_INTERVAL
+        if budget.max_statements is not None:
+            next_check = min(next_check, budget.max_statements)
+        self._next_check = next_check
 
-    # --- Definición de funciones ---
-    def _define_function(self, lines, index):
-        _, line, line_num = lines[index]
-        
-        try:
-            name = line[5:line.index("(")].strip()
-            args = line[line.index("(")+1:line.index(")")].strip()
-            arg_list = [a.strip() for a in args.split(",") if a.strip()]
-        except (ValueError, AttributeError):
-            raise InterpreterError("Sintaxis de función inválida", line_num)
-
-        body = []
-        index += 1
-        
-        if index < len(lines):
-            func_indent = lines[index][0]
-            while index < len(lines) and lines[index][0] >= func_indent:
-                body.append(lines[index])
-                index += 1
-        
-        if not body:
-            raise InterpreterError(f"Función '{name}' está vacía", line_num)
+    def _count_statements(self, count):
+        """Modo compilado: cada bloque suma sus sentencias al empezar"""
+        self.statements += count
+        if self.statements > self._next_check:
+            self._check_budget(None)
+
+    def _depth_exceeded(self, line_num=None):
+        return BudgetExceeded("max_depth", f"Límite de recursión excedido (máximo {self.max_depth} llamadas anidadas)", line_num)
+
+    def _enter_call(self):
+        """Modo compilado: prólogo de cada función"""
+        if self.call_depth >= self.max_depth:
+            raise self._depth_exceeded()
+        self.call_depth += 1
+
+    def _leave_call(self):
+        self.call_depth -= 1
+
+    # --- Ámbitos ---
+    def _new_scope(self):
+        """Crea las capas de nombres: builtins → funciones → globales → locales.
+
+        Builtins y funciones comparten el diccionario ``__builtins__`` del
+        ámbito global; las variables globales viven en ``global_env`` y las
+        locales en el marco de cada llamada. Así ``eval`` resuelve los
+        nombres sin copiar diccionarios en cada expresión ni en cada llamada.
+        """
+        self.scope_builtins = dict(SAFE_BUILTINS)
+        self.scope_builtins["print"] = self.output.print
+        self.global_env = {"__builtins__": self.scope_builtins}
 
-        self.functions[name] = (arg_list, body)
-        return index
+    def _new_memo_cache(self, name):
+        cache = self.memo_caches[name] = MemoCache(self.memo_size)
+        return cache
+
+    def _memoize(self, name, function):
+        """Envuelve una función compilada declarada con '@memo'"""
+        cache = self._new_memo_cache(name)
+        def memoized(*args):
+            return cache.call(function, args)
+        memoized.__name__ = function.__name__
+        return memoized
+
+    # --- Modo compilado ---
+    def _run_compiled(self, program):
+        budget = self.budget
+        compiler = Compiler(max_iterations=budget.max_loop_iterations, profile=self.profile)
+        code = compiler.compile(program)
+        _fit_recursion_limit(self.max_depth)
+        self.scope_builtins.update({
+            "_pyra_globals": self.global_env,
+            "_pyra_functions": self.scope_builtins,
+            "_pyra_print": self.output.line,
+            "_pyra_iter": _checked_iter,
+            "_pyra_fail": _fail,
+            "_pyra_Return": ReturnValue,
+            "_pyra_memo": self._memoize,
+            "_pyra_count": self._count_statements,
+            "_pyra_enter": self._enter_call,
+            "_pyra_leave": self._leave_call,
+        })
+        if self.profiler is not None:
+            self.scope_builtins["_pyra_line"] = self.profiler.line
+            self.scope_builtins["_pyra_call"] = self.profiler.call
 
-    # --- Manejo de declaración de variables ---
-    def _handle_var_declaration(self, line, env, line_num):
-        """Maneja declaraciones de variables (var nombre = valor)"""
         try:
-            if "=" not in line[4:]:
-                raise InterpreterError("Declaración inválida: falta '=' (debe ser 'var nombre = valor')", line_num)
-            
-            var_name, expr = line[4:].split("=", 1)
-            var_name = var_name.strip()
-            expr = expr.strip()
-            
-            if not var_name:
-                raise InterpreterError("Falta nombre de variable", line_num)
-            
-            if not expr:
-                raise InterpreterError("Falta valor en la declaración", line_num)
-            
-            value = self._eval_expr(expr, env, line_num)
-            env[var_name] = value
-        except InterpreterError:
+            exec(code, self.global_env)
+        except ReturnValue:
             raise
+        except InterpreterError as e:
+            if e.line_num is None:
+                # Límite de profundidad: se reporta en la línea de la llamada, no en la 'func'
+                skip = 1 if isinstance(e, BudgetExceeded) and e.limit == "max_depth" else 0
+                e.line_num = _compiled_line(e.__traceback__, skip)
+            raise
+        except RecursionError as e:
+            # No debería ocurrir con el límite ajustado; se informa como en el modo por árbol
+            raise self._depth_exceeded(_compiled_line(e.__traceback__, 1))
         except Exception as e:
-            raise InterpreterError(f"Error en declaración de variable: {e}", line_num)
+            raise translate_error(e, _compiled_line(e.__traceback__), compiler.function_names)
+
+    # --- Tokenización con indentación (ver lexer.py) ---
+    def _tokenize(self, code):
+        return program_lines(lex(code))
 
-    # --- Manejo de reasignación de variables ---
-    def _handle_assignment(self, line, env, line_num):
-        """Maneja reasignaciones de variables (nombre = valor, sin var)"""
+    # --- Ejecución con pila explícita ---
+    #
+    # Cada sentencia se ejecuta dentro de un generador. Cuando una expresión
+    # llama a una función Pyra, el generador no la llama: produce una
+    # petición (CALL, función, argumentos, línea) y _drive apila un marco
+    # nuevo. Al terminar, el marco produce (RET, valor) y _drive reanuda al
+    # llamador con ese valor. Así la profundidad de recursión de Pyra solo
+    # está limitada por Budget.max_depth y no por la pila de Python.
+
+    def _drive(self, root):
+        """Ejecuta ``root`` (un generador de marco) hasta que devuelva su valor"""
+        stack = [root]
+        memo_keys = [None]
+        base_depth = self.call_depth
+        value = None
         try:
-            if "=" not in line:
-                raise InterpreterError("Asignación inválida", line_num)
-            
-            var_name, expr = line.split("=", 1)
-            var_name = var_name.strip()
-            expr = expr.strip()
-            
-            if not var_name:
-                raise InterpreterError("Falta nombre de variable", line_num)
-            
-            if not expr:
-                raise InterpreterError("Falta valor en la asignación", line_num)
-            
-            # Verificar que la variable exista (opcional, puedes crear nuevas sin var)
-            # if var_name not in env:
-            #     raise InterpreterError(f"Variable '{var_name}' no está definida. Usa 'var {var_name} = ...' para declararla", line_num)
-            
-            value = self._eval_expr(expr, env, line_num)
-            env[var_name] = value
-        except InterpreterError:
-            raise
-        except Exception as e:
-            raise InterpreterError(f"Error en asignación: {e}", line_num)
+            while True:
+                request = stack[-1].send(value)
+                kind = request[0]
 
-    # --- Manejo de IF/ELIF/ELSE ---
-    def _handle_if_elif_else(self, lines, index, env, base_indent):
-        blocks = []  # Lista de (condición, cuerpo)
-        else_block = None
-        current_index = index
-        
-        while current_index < len(lines):
-            indent, line, line_num = lines[current_index]
-            
-            if indent < base_indent:
-                break
-            
-            if indent == base_indent:
-                # Detectar if o elif
-                if line.startswith("if ") or line.startswith("elif "):
-                    prefix = "if " if line.startswith("if ") else "elif "
-                    condition = line[len(prefix):].rstrip(":").strip()
-                    
-                    if not condition:
-                        raise InterpreterError(f"Falta condición después de '{prefix.strip()}'", line_num)
-                    
-                    current_index += 1
-                    body = []
-                    if current_index < len(lines):
-                        body_indent = lines[current_index][0]
-                        while current_index < len(lines) and lines[current_index][0] >= body_indent:
-                            if lines[current_index][0] > indent:
-                                body.append(lines[current_index])
-                                current_index += 1
-                            else:
-                                break
-                    
-                    blocks.append((condition, body, line_num))
-                
-                # Detectar else
-                elif line == "else:":
-                    current_index += 1
-                    else_block = []
-                    if current_index < len(lines):
-                        else_indent = lines[current_index][0]
-                        while current_index < len(lines) and lines[current_index][0] >= else_indent:
-                            if lines[current_index][0] > indent:
-                                else_block.append(lines[current_index])
-                                current_index += 1
-                            else:
-                                break
-                    break
-                else:
+                if kind == RET:
+                    value = request[1]
+                    stack.pop()
+                    memo_key = memo_keys.pop()
+                    if memo_key is not None:
+                        memo_key[0].store(memo_key[1], value)
+                    if not stack:
+                        return value
+                    self.call_depth -= 1
+                    continue
+
+                _, function, args, line_num = request
+                params, body, memo = self._lookup_function(function.name, args, line_num)
+                value = None
+
+                if memo is not None:
+                    value = memo.lookup(args)
+                    if value is not _MISSING:
+                        continue
+                    value = None
+
+                if kind == TAIL and memo_keys[-1] is None:
+                    # return f(...) dentro de f: el marco actual se reemplaza por el
+                    # nuevo (nunca es el del programa, que no cuenta en call_depth)
+                    stack.pop()
+                    memo_keys.pop()
+                    self.call_depth -= 1
+
+                if self.call_depth >= self.max_depth:
+                    raise self._depth_exceeded(line_num)
+                self.call_depth += 1
+                stack.append(self._function_frame(params, body, args))
+                memo_keys.append((memo, args) if memo is not None else None)
+        finally:
+            self.call_depth = base_depth
+
+    def _program_frame(self, program):
+        yield from self._execute_block(program, self.global_env)
+        yield (RET, None)
+
+    def _function_frame(self, params, body, args):
+        # Marco de la llamada: solo argumentos y locales. Las globales se
+        # resuelven a través de global_env (el ámbito padre de eval), así que
+        # el coste de la llamada no depende del número de globales.
+        frame = dict(zip(params, args))
+        signal = yield from self._execute_block(body, frame)
+        yield (RET, self.return_value if signal == RETURN else None)
+
+    # --- Perfil (solo con profile=True, ver __init__) ---
+    def _profiled_block(self, body, env):
+        """_execute_block sentencia por sentencia, midiendo cada una"""
+        execute_block = type(self)._execute_block
+        profiler = self.profiler
+        lines = profiler.lines
+        for node in body:
+            line_num = node.line_num
+            started = profiler.enter(lines, line_num)
+            try:
+                signal = yield from execute_block(self, (node,), env)
+            finally:
+                profiler.leave(lines, line_num, started)
+            if signal:
+                return signal
+        return None
+
+    def _profiled_frame(self, params, body, args):
+        """_function_frame midiendo la llamada hasta que el marco devuelve su valor"""
+        name = self._function_names.get(id(body))
+        if name is None:
+            name = next(name for name, entry in self.functions.items() if entry[1] is body)
+            self._function_names[id(body)] = name
+        profiler = self.profiler
+        functions = profiler.functions
+        frame = type(self)._function_frame(self, params, body, args)
+        started = profiler.enter(functions, name)
+        try:
+            value = None
+            while True:
+                request = frame.send(value)
+                if request[0] == RET:
                     break
-            else:
-                break
-        
-        # Ejecutar el primer bloque verdadero
-        executed = False
-        for condition, body, cond_line_num in blocks:
+                value = yield request
+        finally:
+            profiler.leave(functions, name, started)
+        yield request
+
+    # --- Ejecutar un bloque de sentencias ---
+    def _execute_block(self, body, env):
+        """Ejecuta las sentencias y devuelve la señal que lo interrumpió (o None)"""
+        handlers = self._handlers
+        plan_of = self._plan
+        global_env = self.global_env
+        emit = self.output.line
+        for node in body:
+            line_num = self.current_line = node.line_num
+            self.statements += 1
+            if self.statements > self._next_check:
+                self._check_budget(line_num)
+            kind = type(node)
             try:
-                cond_value = bool(self._eval_expr(condition, env, cond_line_num))
+                # Las sentencias simples sin llamadas a funciones Pyra se
+                # ejecutan aquí mismo, sin crear un generador por sentencia
+                if kind is Assign:
+                    plan = plan_of(node.expr, line_num)
+                    if plan.steps:
+                        env[node.name] = yield from self._eval_calls(plan, env, line_num)
+                    else:
+                        env[node.name] = eval(plan.code, global_env, env)
+                    continue
+                if kind is Expr:
+                    plan = plan_of(node.expr, line_num)
+                    if plan.steps:
+                        yield from self._eval_calls(plan, env, line_num)
+                    else:
+                        eval(plan.code, global_env, env)
+                    continue
+                if kind is Print:
+                    plan = plan_of(node.expr, line_num)
+                    if plan.steps:
+                        emit((yield from self._eval_calls(plan, env, line_num)))
+                    else:
+                        emit(eval(plan.code, global_env, env))
+                    continue
+                if kind is Continue:
+                    return CONTINUE
+                if kind is Break:
+                    return BREAK
+                if kind is If:
+                    # Cadena if/elif/else: cada condición reporta errores en su propia línea
+                    chosen = node.else_body
+                    for condition, body, line_num in node.branches:
+                        plan = plan_of(condition, line_num)
+                        if plan.steps:
+                            value = yield from self._eval_calls(plan, env, line_num)
+                        else:
+                            value = eval(plan.code, global_env, env)
+                        if value:
+                            chosen = body
+                            break
+                    if not chosen:
+                        continue
+                    signal = yield from self._execute_block(chosen, env)
+                else:
+                    signal = yield from handlers[kind](self, node, env)
+            except InterpreterError as e:
+                # Errores de llamadas a funciones sin línea: se reportan en la línea de la llamada
+                if e.line_num is None:
+                    e.line_num = line_num
+                raise
             except Exception as e:
-                raise InterpreterError(f"Error en condición: {e}", cond_line_num)
-            
-            if cond_value:
-                if body:
-                    self._execute_block(body, env, 0, body[0][0])
-                executed = True
-                break
-        
-        # Ejecutar else si ninguna condición fue verdadera
-        if not executed and else_block:
-            self._execute_block(else_block, env, 0, else_block[0][0])
-        
-        return current_index
+                raise translate_error(e, line_num)
+            if signal:
+                return signal
+        return None
+
+    # --- Definición de funciones ---
+    def _define_function(self, node, env):
+        if node.name not in self.functions:
+            self.scope_builtins[node.name] = PyraFunction(self, node.name)
+        memo = self._new_memo_cache(node.name) if node.memo else None
+        self.functions[node.name] = (node.params, node.body, memo)
+        return None
+        yield
 
     # --- Manejo de bucles WHILE ---
-    def _handle_while(self, lines, index, env, base_indent):
-        indent, line, line_num = lines[index]
-        condition = line[6:].rstrip(":").strip()
-        
-        if not condition:
-            raise InterpreterError("Falta condición en bucle while", line_num)
-        
-        # Capturar cuerpo del while
-        body = []
-        current_index = index + 1
-        if current_index < len(lines):
-            body_indent = lines[current_index][0]
-            while current_index < len(lines) and lines[current_index][0] >= body_indent:
-                if lines[current_index][0] > indent:
-                    body.append(lines[current_index])
-                    current_index += 1
-                else:
-                    break
-        
-        if not body:
-            raise InterpreterError("Bucle while vacío", line_num)
-        
+    def _handle_while(self, node, env):
+        condition = node.cond
+        body = node.body
+        line_num = node.line_num
+
         # Ejecutar bucle con límite de iteraciones
         iterations = 0
-        max_iterations = 100000
+        max_iterations = self.budget.max_loop_iterations
+        if max_iterations is None:
+            max_iterations = sys.maxsize
         
+        plan = self._plan(condition, line_num)
         while iterations < max_iterations:
-            try:
-                cond_value = bool(self._eval_expr(condition, env, line_num))
-            except Exception as e:
-                raise InterpreterError(f"Error en condición del while: {e}", line_num)
-            
-            if not cond_value:
-                break
+            if plan.steps:
+                value = yield from self._eval_calls(plan, env, line_num)
+            else:
+                value = self._eval_code(plan.code, env, line_num)
+            if not value:
+                return None
             
-            try:
-                self._execute_block(body, env, 0, body[0][0])
-                iterations += 1
-            except BreakLoop:
-                break
-            except ContinueLoop:
-                iterations += 1
-                continue
+            signal = yield from self._execute_block(body, env)
+            if signal == BREAK:
+                return None
+            if signal == RETURN:
+                return RETURN
+            iterations += 1
         
-        if iterations >= max_iterations:
-            raise InterpreterError("Bucle while excedió el límite de 100,000 iteraciones (posible bucle infinito)", line_num)
-        
-        return current_index
+        raise BudgetExceeded("max_loop_iterations", f"Bucle while excedió el límite de {max_iterations:,} iteraciones (posible bucle infinito)", line_num)
 
     # --- Manejo de bucles FOR ---
-    def _handle_for(self, lines, index, env, base_indent):
-        indent, line, line_num = lines[index]
-        
-        # Extraer variable e iterable: for var in iterable:
-        match = re.match(r'for\s+(\w+)\s+in\s+(.+):', line)
-        if not match:
-            raise InterpreterError("Sintaxis de bucle for inválida (debe ser: for variable in iterable:)", line_num)
-        
-        var_name = match.group(1)
-        iterable_expr = match.group(2).strip()
-        
-        # Capturar cuerpo del for
-        body = []
-        current_index = index + 1
-        if current_index < len(lines):
-            body_indent = lines[current_index][0]
-            while current_index < len(lines) and lines[current_index][0] >= body_indent:
-                if lines[current_index][0] > indent:
-                    body.append(lines[current_index])
-                    current_index += 1
-                else:
-                    break
-        
-        if not body:
-            raise InterpreterError("Bucle for vacío", line_num)
-        
-        # Evaluar iterable
-        try:
-            iterable = self._eval_expr(iterable_expr, env, line_num)
-        except Exception as e:
-            raise InterpreterError(f"Error al evaluar iterable: {e}", line_num)
+    def _handle_for(self, node, env):
+        plan = self._plan(node.iterable, node.line_num)
+        if plan.steps:
+            iterable = yield from self._eval_calls(plan, env, node.line_num)
+        else:
+            iterable = self._eval_code(plan.code, env, node.line_num)
         
         # Verificar que sea iterable
         try:
             iter(iterable)
         except TypeError:
-            raise InterpreterError(f"'{iterable_expr}' no es iterable", line_num)
+            raise InterpreterError(f"'{node.iterable}' no es iterable", node.line_num, "type")
         
-        # Ejecutar bucle
+        var_name = node.var
+        body = node.body
         for value in iterable:
             env[var_name] = value
-            try:
-                self._execute_block(body, env, 0, body[0][0])
-            except BreakLoop:
+            signal = yield from self._execute_block(body, env)
+            if signal == BREAK:
                 break
-            except ContinueLoop:
-                continue
-        
-        return current_index
+            if signal == RETURN:
+                return RETURN
+        return None
+
+    # --- Return (Assign, Expr, Print, If, Break y Continue se ejecutan en _execute_block) ---
+    def _handle_return(self, node, env):
+        if not node.expr:
+            self.return_value = None
+            return RETURN
+        plan = self._plan(node.expr, node.line_num)
+        if plan.steps:
+            # Como en el modo compilado, solo 'return f(...)' dentro de f (fuera
+            # de los bucles) reemplaza el marco sin contar otra llamada
+            tail = node in self._looping_returns
+            self.return_value = yield from self._eval_calls(plan, env, node.line_num, tail=tail)
+        else:
+            self.return_value = self._eval_code(plan.code, env, node.line_num)
+        return RETURN
+
+    def _handle_invalid(self, node, env):
+        raise InterpreterError(node.message, node.line_num, "syntax")
+        yield
+
+    _handlers = {
+        Func: _define_function,
+        While: _handle_while,
+        For: _handle_for,
+        Return: _handle_return,
+        Invalid: _handle_invalid,
+    }
 
     # --- Evaluación de expresiones ---
-    def _eval_expr(self, expr, env, line_num=None):
-        safe_builtins = {
-            "str": str, 
-            "int": int, 
-            "float": float,
-            "bool": bool,
-            "print": print, 
-            "len": len, 
-            "range": range,
-            "list": list,
-            "sum": sum,
-            "min": min,
-            "max": max,
-            "abs": abs,
-            "round": round,
-            "sorted": sorted,
-            "reversed": reversed,
-            "enumerate": enumerate,
-        }
+    def _plan(self, expr, line_num):
+        try:
+            return self.expr_cache.get(expr)
+        except SyntaxError as e:
+            raise translate_error(e, line_num)
 
-        expr = expr.strip()
-        
-        if expr.startswith("return "):
-            return_value_expr = expr[len("return "):].strip()
-            value = self._eval_expr(return_value_expr, env, line_num) if return_value_expr else None
-            raise ReturnValue(value)
-        
-        if expr == "return":
-            raise ReturnValue(None)
-        
-        # Crear entorno con variables Y funciones
-        func_env = env.copy()
-        
-        # Agregar builtins
-        func_env.update(safe_builtins)
-        
-        # Usar una función factory para evitar el problema de closure
-        def make_function_caller(fname):
-            def caller(*args):
-                return self._call_function(fname, list(args))
-            return caller
-        
-        for fname in self.functions:
-            func_env[fname] = make_function_caller(fname)
+    def _eval_calls(self, plan, env, line_num, tail=False):
+        """Evalúa un plan con llamadas; las llamadas a funciones Pyra se piden a _drive"""
+        last = len(plan.steps) - 1
+        for i, (is_call, code, temp) in enumerate(plan.steps):
+            value = self._eval_code(code, env, line_num)
+            if is_call:
+                function, args = value
+                if type(function) is PyraFunction and function.interpreter is self:
+                    kind = TAIL if tail and plan.tail and i == last else CALL
+                    value = yield (kind, function, args, line_num)
+                else:
+                    value = self._call_python(function, args, line_num)
+            env[temp] = value
+
+        return self._eval_code(plan.code, env, line_num)
 
+    def _eval_code(self, code, env, line_num):
         try:
-            return eval(expr, {"__builtins__": {}}, func_env)
-        except ReturnValue:
+            return eval(code, self.global_env, env)
+        except InterpreterError as e:
+            # Errores de llamadas a funciones sin línea: se reportan en la línea de la llamada
+            if e.line_num is None:
+                e.line_num = line_num
+            raise
+        except Exception as e:
+            raise translate_error(e, line_num)
+
+    def _call_python(self, function, args, line_num):
+        try:
+            return function(*args)
+        except InterpreterError as e:
+            if e.line_num is None:
+                e.line_num = line_num
             raise
-        except NameError as e:
-            var_name = str(e).split("'")[1] if "'" in str(e) else "desconocida"
-            raise InterpreterError(f"Variable o función '{var_name}' no está definida", line_num)
-        except SyntaxError as e:
-            raise InterpreterError(f"Sintaxis inválida en expresión", line_num)
-        except ZeroDivisionError:
-            raise InterpreterError("División por cero", line_num)
-        except TypeError as e:
-            raise InterpreterError(f"Error de tipo: {e}", line_num)
-        except IndexError as e:
-            raise InterpreterError(f"Índice fuera de rango: {e}", line_num)
-        except KeyError as e:
-            raise InterpreterError(f"Clave no encontrada: {e}", line_num)
-        except ValueError as e:
-            raise InterpreterError(f"Valor inválido: {e}", line_num)
         except Exception as e:
-            raise InterpreterError(f"Error al evaluar expresión: {e}", line_num)
+            raise translate_error(e, line_num)
 
     # --- Llamadas a funciones ---
-    def _call_function(self, name, arg_values):
+    def _lookup_function(self, name, arg_values, line_num=None):
         if name not in self.functions:
-            raise InterpreterError(f"Función '{name}' no está definida")
+            raise InterpreterError(f"Función '{name}' no está definida", line_num, "name")
         
-        args, body = self.functions[name]
+        entry = self.functions[name]
+        args = entry[0]
         
         # Verificar número de argumentos
         if len(arg_values) < len(args):
-            raise InterpreterError(f"Función '{name}' espera {len(args)} argumentos, pero recibió {len(arg_values)}")
+            raise InterpreterError(f"Función '{name}' espera {len(args)} argumentos, pero recibió {len(arg_values)}", line_num, "arity")
         
         if len(arg_values) > len(args):
-            raise InterpreterError(f"Función '{name}' espera {len(args)} argumentos, pero recibió {len(arg_values)} (demasiados)")
-        
-        # Crear entorno local con copia del global
-        local_env = self.global_env.copy() 
+            raise InterpreterError(f"Función '{name}' espera {len(args)} argumentos, pero recibió {len(arg_values)} (demasiados)", line_num, "arity")
         
-        for i, arg_name in enumerate(args):
-            local_env[arg_name] = arg_values[i]
-        
-        return_value = None
+        return entry
+
+    def _call_function(self, name, arg_values):
+        """Llamada síncrona, desde código Python (p. ej. key= de sorted)"""
+        args, body, memo = self._lookup_function(name, arg_values)
         
+        if memo is not None:
+            return memo.call(lambda *values: self._run_function(args, body, values), arg_values)
+        return self._run_function(args, body, arg_values)
+
+    def _run_function(self, args, body, arg_values):
+        if self.call_depth >= self.max_depth:
+            raise self._depth_exceeded()
+        self.call_depth += 1
         try:
-            if body:
-                base_indent = body[0][0]
-                self._execute_block(body, local_env, 0, base_indent)
-        except ReturnValue as e:
-            return_value = e.value
-        
-        return return_value
+            return self._drive(self._function_frame(args, body, arg_values))
+        finally:
+            self.call_depth -= 1
+
+
+class PyraFunction:
+    """Función Pyra tal como la ven las expresiones.
+
+    Las llamadas extraídas por el plan de la expresión se ejecutan en la
+    pila explícita; si la llama código de Python (p. ej. ``sorted(l, key=f)``),
+    se ejecuta de forma síncrona.
+    """
+    __slots__ = ("interpreter", "name")
+
+    def __init__(self, interpreter, name):
+        self.interpreter = interpreter
+        self.name = name
+
+    def __call__(self, *args):
+        return self.interpreter._call_function(self.name, args)
+
+    def __repr__(self):
+        return f"<función {self.name}>"
 
 
 # Pruebas completas
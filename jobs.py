@@ -0,0 +1,132 @@
+"""
+Cola de trabajos para ejecuciones asíncronas (/run/submit).
+
+Los trabajos se encolan en una cola acotada y un número fijo de hilos los
+ejecutan; el cliente consulta el estado o espera el resultado con el id
+que recibió. Los resultados terminados se guardan un tiempo limitado.
+"""
+
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+
+
+class QueueFull(Exception):
+    """La cola alcanzó su capacidad máxima"""
+
+
+class Job:
+    def __init__(self, args):
+        self.id = uuid.uuid4().hex
+        self.args = args
+        self.state = QUEUED
+        self.result = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Espera a que termine; devuelve True si ya terminó"""
+        return self._done.wait(timeout)
+
+    def status(self):
+        status = {"id": self.id, "state": self.state, "created": self.created}
+        if self.started is not None:
+            status["queued_seconds"] = round(self.started - self.created, 4)
+        if self.finished is not None:
+            status["run_seconds"] = round(self.finished - self.started, 4)
+        return status
+
+
+class JobQueue:
+    """Ejecuta ``runner(*args)`` para cada trabajo en ``concurrency`` hilos.
+
+    Como mucho ``max_queued`` trabajos esperan a la vez (submit lanza
+    QueueFull si no cabe otro); se conservan los últimos ``max_finished``
+    resultados durante ``result_ttl`` segundos.
+    """
+    def __init__(self, runner, concurrency=4, max_queued=100, max_finished=1000, result_ttl=600):
+        self.runner = runner
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.result_ttl = result_ttl
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}                 # id -> Job en cola o en ejecución
+        self._finished = OrderedDict()  # id -> Job terminado, del más antiguo al más nuevo
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.running = 0
+        for i in range(concurrency):
+            threading.Thread(target=self._work, name=f"pyra-job-{i}", daemon=True).start()
+
+    def submit(self, *args):
+        job = Job(args)
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.rejected += 1
+                raise QueueFull(f"La cola de ejecución está llena ({self.max_queued} trabajos)")
+            self._jobs[job.id] = job
+            self.submitted += 1
+        return job
+
+    def get(self, job_id):
+        """El trabajo con ese id, o None si no existe o ya caducó"""
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id) or self._finished.get(job_id)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                job.state = RUNNING
+                job.started = time.time()
+                self.running += 1
+            try:
+                result = self.runner(*job.args)
+            except Exception as e:
+                result = {"error": f"❌ Error inesperado: {e}"}
+            with self._lock:
+                job.result = result
+                job.state = DONE
+                job.finished = time.time()
+                self.running -= 1
+                del self._jobs[job.id]
+                self._finished[job.id] = job
+                self._expire()
+            job._done.set()
+
+    def _expire(self):
+        # Llamar con _lock tomado
+        finished = self._finished
+        while len(finished) > self.max_finished:
+            finished.popitem(last=False)
+        limit = time.time() - self.result_ttl
+        while finished:
+            job = next(iter(finished.values()))
+            if job.finished >= limit:
+                break
+            finished.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "max_queued": self.max_queued,
+                "queued": self._queue.qsize(),
+                "running": self.running,
+                "finished": len(self._finished),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,80 @@
+"""
+Análisis léxico compartido por el checker y el intérprete.
+
+lex divide el código en líneas y calcula una sola vez, para cada una, lo
+que necesitan los dos: el texto sin el comentario final, la indentación
+y una copia de la línea con el contenido de los textos tapado (con las
+mismas columnas), para contar paréntesis o buscar nombres sin confundirse
+con lo que hay entre comillas.
+"""
+
+import re
+from collections import namedtuple
+
+# Textos ("..." o '...', con escapes) y comentarios; el grupo 1 o 2 es la comilla de cierre
+TOKEN = re.compile(r'"(?:\\.|[^"\\])*(")?' r"|'(?:\\.|[^'\\])*(')?" r"|#.*")
+
+# number: número de línea (desde 1); raw: la línea tal cual; text: sin comentario
+# ni espacios en los extremos (vacío si la línea no tiene código); code: ``raw``
+# con el contenido de los textos y el comentario cambiados por espacios; indent:
+# espacios al inicio; width: indentación contando cada tabulación como 4
+# espacios; unclosed: columna de la comilla de un texto sin cerrar, o None
+Line = namedtuple("Line", "number raw text code indent width unclosed")
+
+
+def lex_line(raw, number=1):
+    """Analiza una sola línea"""
+    code = raw
+    comment = len(raw)
+    unclosed = None
+    if '"' in raw or "'" in raw or "#" in raw:
+        parts = []
+        last = 0
+        for match in TOKEN.finditer(raw):
+            start, end = match.span()
+            if raw[start] == "#":
+                comment = start
+                parts.append(raw[last:start])
+                parts.append(" " * (end - start))
+                last = end
+                break
+            closed = match.group(1) or match.group(2)
+            if closed is None and unclosed is None:
+                unclosed = start + 1
+            inner_end = end - 1 if closed else end
+            parts.append(raw[last:start + 1])
+            parts.append(" " * (inner_end - start - 1))
+            parts.append(raw[inner_end:end])
+            last = end
+        parts.append(raw[last:])
+        code = "".join(parts)
+
+    text = raw[:comment].strip()
+    indent = len(raw) - len(raw.lstrip(" "))
+    width = 0
+    if text:
+        expanded = raw.replace("\t", "    ")
+        width = len(expanded) - len(expanded.lstrip())
+    return Line(number, raw, text, code, indent, width, unclosed)
+
+
+def lex(source):
+    """Líneas de ``source`` (lista de Line), numeradas desde 1"""
+    return [lex_line(raw, number) for number, raw in enumerate(source.splitlines(), start=1)]
+
+
+def program_lines(lines):
+    """(indentación, texto, número de línea) de las líneas con código, para el Parser.
+
+    Como el intérprete ejecuta ``source.strip()``, las líneas se numeran
+    desde la primera que no está en blanco, y esa no tiene indentación.
+    """
+    first = 0
+    while first < len(lines) and not lines[first].raw.strip():
+        first += 1
+    result = []
+    for line in lines[first:]:
+        if line.text:
+            width = 0 if line.number == first + 1 else line.width
+            result.append((width, line.text, line.number - first))
+    return result
@@ -0,0 +1,182 @@
+"""
+Métricas del servidor en el formato de texto de Prometheus (GET /metrics).
+
+Cada hilo anota sus contadores e histogramas en su propio fragmento, sin
+tomar ningún lock; al leer las métricas se suman los fragmentos de todos
+los hilos. Los fragmentos de hilos que ya terminaron se acumulan en uno
+solo, así la lista no crece con cada hilo que atiende peticiones. Los
+valores que ya guarda otro objeto (p. ej. las estadísticas de una caché)
+se leen en el momento con un colector (Registry.collector).
+"""
+
+import threading
+import weakref
+from bisect import bisect_left
+
+# Límites de los histogramas
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+STATEMENT_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+BYTE_BUCKETS = (0, 64, 1024, 16 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024)
+
+
+class Registry:
+    """Conjunto de métricas que se exportan juntas"""
+    def __init__(self):
+        self._metrics = []            # en el orden en que se declararon
+        self._collectors = []
+        self._local = threading.local()
+        self._shards = []             # (referencia débil al hilo, fragmento)
+        self._retired = {}            # sumas de los hilos que terminaron
+        self._lock = threading.Lock()  # solo para dar de alta hilos y al leer
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(self, name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self._add(Gauge(self, name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=SECONDS_BUCKETS):
+        return self._add(Histogram(self, name, help, labels, buckets))
+
+    def collector(self, function):
+        """Registra ``function()``, que devuelve tuplas (nombre, tipo, ayuda, muestras)
+        con las muestras como pares (etiquetas, valor); se llama en cada lectura"""
+        self._collectors.append(function)
+        return function
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    # --- Fragmentos por hilo ---
+    def _shard(self):
+        """Fragmento del hilo actual: clave (nombre, etiquetas) -> valor"""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._retire_finished()
+                self._shards.append((weakref.ref(threading.current_thread()), shard))
+            return shard
+
+    def _retire_finished(self):
+        # Llamar con _lock tomado. Un hilo terminado ya no escribe en su fragmento.
+        alive = []
+        for thread_ref, shard in self._shards:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                alive.append((thread_ref, shard))
+            else:
+                _merge(self._retired, shard)
+        self._shards = alive
+
+    def totals(self):
+        """Suma de los fragmentos de todos los hilos"""
+        with self._lock:
+            self._retire_finished()
+            totals = _merge({}, self._retired)
+            for _, shard in self._shards:
+                # copy() es atómica: el hilo dueño puede seguir escribiendo
+                _merge(totals, shard.copy())
+        return totals
+
+    # --- Formato de texto de Prometheus ---
+    def render(self):
+        totals = self.totals()
+        by_metric = {}
+        for (name, labels), value in totals.items():
+            by_metric.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for labels, value in sorted(by_metric.get(metric.name, ()), key=lambda item: item[0]):
+                lines.extend(metric.samples(dict(zip(metric.labels, labels)), value))
+        for function in self._collectors:
+            for name, kind, help, samples in function():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is not None:
+                        lines.append(_sample(name, labels, value))
+        return "\n".join(lines) + "\n"
+
+
+def _merge(target, shard):
+    for key, value in shard.items():
+        if type(value) is list:
+            current = target.get(key)
+            if current is None:
+                target[key] = list(value)
+            else:
+                for i, amount in enumerate(value):
+                    current[i] += amount
+        else:
+            target[key] = target.get(key, 0) + value
+    return target
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _sample(name, labels, value):
+    if labels:
+        text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+        name = f"{name}{{{text}}}"
+    return f"{name} {value!r}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, registry, name, help, labels):
+        self._registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def inc(self, *labels, amount=1):
+        """Suma ``amount``; ``labels`` son los valores de las etiquetas, en orden"""
+        shard = self._registry._shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def samples(self, labels, value):
+        return [_sample(self.name, labels, value)]
+
+
+class Gauge(Counter):
+    """Valor que sube y baja (p. ej. peticiones en curso)"""
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Counter):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labels, buckets):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        shard = self._registry._shard()
+        key = (self.name, labels)
+        entry = shard.get(key)
+        if entry is None:
+            # Una cuenta por límite (no acumuladas), la de +Inf y la suma
+            entry = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def samples(self, labels, value):
+        lines = []
+        count = 0
+        for bound, amount in zip(self.buckets + ("+Inf",), value):
+            count += amount
+            lines.append(_sample(f"{self.name}_bucket", dict(labels, le=bound), count))
+        lines.append(_sample(f"{self.name}_sum", labels, float(value[-1])))
+        lines.append(_sample(f"{self.name}_count", labels, count))
+        return lines
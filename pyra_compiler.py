@@ -0,0 +1,509 @@
+"""
+Compilador de Pyra a Python.
+Traduce el árbol de sentencias de pyra_parser a un único módulo de Python
+(un objeto de código) que el intérprete ejecuta en modo "compiled", y
+prepara las expresiones del modo por árbol (ver plan_expression).
+
+Los nodos generados llevan como número de línea la línea Pyra de la que
+provienen, así que los errores se reportan con las mismas líneas que en el
+modo por árbol. El código generado usa estos nombres auxiliares, que el
+intérprete coloca en la capa de builtins:
+
+- ``_pyra_globals``: diccionario de variables globales
+- ``_pyra_functions``: capa de funciones (donde se registran las ``func``)
+- ``_pyra_print``, ``_pyra_iter``, ``_pyra_fail`` y ``_pyra_Return``
+- ``_pyra_memo``: envuelve las funciones declaradas con ``@memo``
+- ``_pyra_count``, ``_pyra_enter`` y ``_pyra_leave``: presupuesto de
+  ejecución (sentencias por bloque y profundidad de llamadas)
+- ``_pyra_line`` y ``_pyra_call``: solo con ``profile=True``, miden cada
+  sentencia y cada función (ver interpreter.Profiler)
+
+Los programas Pyra no pueden usar nombres con ese prefijo (ver
+pyra_parser.RESERVED_PREFIX), así que no pueden reemplazar los auxiliares.
+"""
+
+import ast
+import sys
+from pyra_parser import Func, If, While, For, Assign, Print, Expr, Return, Break, Continue, Invalid, RESERVED_PREFIX
+
+FILENAME = "<pyra>"
+
+# Construcciones de Python que no pueden aparecer en expresiones Pyra
+FORBIDDEN_NODES = (ast.Yield, ast.YieldFrom, ast.Await)
+
+
+def _forbidden(node):
+    """Nodos prohibidos, atributos que empiezan con '_' (p. ej. ``a._data``
+    o ``x.__class__``), que llevarían a los objetos internos del intérprete,
+    y nombres con el prefijo de los auxiliares (``_pyra_count := abs``)"""
+    kind = type(node)
+    if kind is ast.Name:
+        return node.id.startswith(RESERVED_PREFIX)
+    if kind is ast.arg:
+        return node.arg.startswith(RESERVED_PREFIX)
+    return isinstance(node, FORBIDDEN_NODES) or (kind is ast.Attribute and node.attr.startswith("_"))
+
+
+def _name(id, ctx=None):
+    return ast.Name(id=id, ctx=ctx or ast.Load())
+
+def _call(func_name, *args):
+    return ast.Call(func=_name(func_name), args=list(args), keywords=[])
+
+def _const(value):
+    return ast.Constant(value=value)
+
+def _subscript(value, key, ctx=None):
+    key = _const(key)
+    if sys.version_info < (3, 9):
+        key = ast.Index(value=key)
+    return ast.Subscript(value=value, slice=key, ctx=ctx or ast.Load())
+
+def _located(node, line_num):
+    node.lineno = node.end_lineno = line_num
+    node.col_offset = node.end_col_offset = 0
+    return node
+
+
+def _is_self_call(value, func):
+    """¿``value`` es una llamada de la func ``func`` a sí misma, con todos sus parámetros?"""
+    return (type(value) is ast.Call and not value.keywords
+            and type(value.func) is ast.Name and value.func.id == func.name
+            and len(value.args) == len(func.params)
+            and not any(type(arg) is ast.Starred for arg in value.args))
+
+
+class Compiler:
+    def __init__(self, max_iterations=100000, limit_depth=True, profile=False):
+        # max_iterations=None: los while no tienen límite de vueltas propio;
+        # limit_depth: cada función avisa al entrar y salir (_pyra_enter/_pyra_leave);
+        # profile: cada sentencia y cada función van dentro de un 'with' que las mide
+        self.max_iterations = max_iterations
+        self.limit_depth = limit_depth
+        self.profile = profile
+        self.hoisted = []      # FunctionDef de todas las func, al nivel del módulo
+        self.function_names = {}  # nombre en Python -> (nombre Pyra, nº de parámetros)
+        self.definitions = {}  # nombre Pyra -> cuántas 'func' lo definen
+        # func cuyas llamadas de cola a sí misma se vuelven un bucle (ver _tail_call);
+        # None dentro de los while y for, donde 'continue' no llegaría a ese bucle
+        self.tail_target = None
+        self.tail_calls = 0
+
+    def compile(self, program):
+        """Devuelve el objeto de código del programa completo"""
+        self._count_definitions(program)
+        body = self._block(program, in_func=False)
+        module = ast.Module(body=self.hoisted + body, type_ignores=[])
+        ast.fix_missing_locations(module)
+        return compile(module, FILENAME, "exec")
+
+    # --- Expresiones ---
+    def _expr(self, text, line_num):
+        """Expresión Pyra como nodo de Python; si es inválida, una llamada que falla"""
+        try:
+            tree = ast.parse(text, FILENAME, mode="eval")
+            for node in ast.walk(tree):
+                if _forbidden(node):
+                    raise SyntaxError(text)
+                if hasattr(node, "lineno"):
+                    node.lineno = node.end_lineno = line_num
+            return tree.body
+        except SyntaxError:
+            return _call("_pyra_fail", _const("Sintaxis inválida en expresión"), _const(line_num))
+
+    # --- Sentencias ---
+    def _block(self, body, in_func):
+        if not body:
+            return [ast.Pass()]
+        # Al entrar en el bloque se cuentan sus sentencias para el presupuesto
+        count = ast.Expr(value=_call("_pyra_count", _const(len(body))))
+        stmts = [_located(count, body[0].line_num)]
+        for node in body:
+            statement = self._statement(node, in_func)
+            if self.profile:
+                statement = [self._measured("_pyra_line", node.line_num, statement, node.line_num)]
+            stmts.extend(statement)
+        return stmts
+
+    def _measured(self, helper, key, body, line_num):
+        """``with helper(key): body``"""
+        item = ast.withitem(context_expr=_call(helper, _const(key)), optional_vars=None)
+        return _located(ast.With(items=[item], body=body), line_num)
+
+    def _statement(self, node, in_func):
+        line_num = node.line_num
+        kind = type(node)
+
+        if kind is Assign:
+            stmt = ast.Assign(targets=[_name(node.name, ast.Store())], value=self._expr(node.expr, line_num))
+        elif kind is Print:
+            stmt = ast.Expr(value=_call("_pyra_print", self._expr(node.expr, line_num)))
+        elif kind is Expr:
+            stmt = ast.Expr(value=self._expr(node.expr, line_num))
+        elif kind is Return:
+            value = self._expr(node.expr, line_num) if node.expr else _const(None)
+            if in_func and self._is_tail_call(value):
+                return self._tail_call(value, line_num)
+            if in_func:
+                stmt = ast.Return(value=value)
+            else:
+                # 'return' fuera de una función termina el programa
+                stmt = ast.Raise(exc=_call("_pyra_Return", value), cause=None)
+        elif kind is Break:
+            stmt = ast.Break()
+        elif kind is Continue:
+            stmt = ast.Continue()
+        elif kind is Invalid:
+            stmt = ast.Expr(value=_call("_pyra_fail", _const(node.message), _const(line_num)))
+        elif kind is If:
+            stmt = self._if(node, in_func)
+        elif kind is While:
+            return self._while(node, in_func)
+        elif kind is For:
+            stmt = ast.For(
+                target=_name(node.var, ast.Store()),
+                iter=_call("_pyra_iter", self._expr(node.iterable, line_num), _const(node.iterable), _const(line_num)),
+                body=self._loop_body(node.body, in_func),
+                orelse=[],
+            )
+        elif kind is Func:
+            stmt = self._func(node)
+        else:
+            raise TypeError(f"Nodo desconocido: {kind.__name__}")
+
+        return [_located(stmt, line_num)]
+
+    def _if(self, node, in_func):
+        orelse = self._block(node.else_body, in_func) if node.else_body else []
+        for condition, body, line_num in reversed(node.branches):
+            branch = ast.If(test=self._expr(condition, line_num), body=self._block(body, in_func), orelse=orelse)
+            orelse = [_located(branch, line_num)]
+        return orelse[0]
+
+    def _while(self, node, in_func):
+        # Igual que en el modo por árbol: como mucho max_iterations vueltas
+        line_num = node.line_num
+        check = ast.If(
+            test=ast.UnaryOp(op=ast.Not(), operand=self._expr(node.cond, line_num)),
+            body=[ast.Break()],
+            orelse=[],
+        )
+        if self.max_iterations is None:
+            loop = ast.While(test=_const(True), body=[_located(check, line_num)] + self._loop_body(node.body, in_func), orelse=[])
+            return [_located(loop, line_num)]
+
+        counter = f"_pyra_n{line_num}"
+        limit_message = f"Bucle while excedió el límite de {self.max_iterations:,} iteraciones (posible bucle infinito)"
+        guard = ast.If(
+            test=ast.Compare(left=_name(counter), ops=[ast.GtE()], comparators=[_const(self.max_iterations)]),
+            body=[ast.Expr(value=_call("_pyra_fail", _const(limit_message), _const(line_num), _const("max_loop_iterations")))],
+            orelse=[],
+        )
+        step = ast.AugAssign(target=_name(counter, ast.Store()), op=ast.Add(), value=_const(1))
+        loop = ast.While(
+            test=_const(True),
+            body=[_located(guard, line_num), _located(check, line_num), _located(step, line_num)]
+                 + self._loop_body(node.body, in_func),
+            orelse=[],
+        )
+        init = ast.Assign(targets=[_name(counter, ast.Store())], value=_const(0))
+        return [_located(init, line_num), _located(loop, line_num)]
+
+    def _func(self, node):
+        line_num = node.line_num
+        py_name = f"_pyra_f{line_num}_{node.name}"
+        self.function_names[py_name] = (node.name, len(node.params))
+
+        # Como en el modo por árbol, los locales empiezan con el valor global
+        # del mismo nombre (si existe) en lugar de fallar al leerse.
+        prologue = []
+        for name in sorted(self._assigned_names(node.body) - set(node.params)):
+            prologue.append(_located(ast.If(
+                test=ast.Compare(left=_const(name), ops=[ast.In()], comparators=[_name("_pyra_globals")]),
+                body=[ast.Assign(
+                    targets=[_name(name, ast.Store())],
+                    value=_subscript(_name("_pyra_globals"), name),
+                )],
+                orelse=[],
+            ), line_num))
+
+        # Como en el modo por árbol, 'return f(...)' a la misma función no apila
+        # otra llamada: se reasignan los parámetros y se vuelve al inicio
+        local_names = sorted(self._assigned_names(node.body) - set(node.params))
+        outer = self.tail_target, self.tail_calls
+        self.tail_target = (node, local_names) if self._loops(node, local_names) else None
+        self.tail_calls = 0
+        body = self._block(node.body, in_func=True)
+        if self.tail_calls:
+            done = _located(ast.Return(value=_const(None)), line_num)
+            body = [_located(ast.While(test=_const(True), body=body + [done], orelse=[]), line_num)]
+        self.tail_target, self.tail_calls = outer
+        body = prologue + body
+        if self.profile:
+            body = [self._measured("_pyra_call", node.name, body, line_num)]
+        if self.limit_depth:
+            enter = _located(ast.Expr(value=_call("_pyra_enter")), line_num)
+            leave = _located(ast.Expr(value=_call("_pyra_leave")), line_num)
+            body = [enter, _located(ast.Try(body=body, handlers=[], orelse=[], finalbody=[leave]), line_num)]
+
+        definition = ast.FunctionDef(
+            name=py_name,
+            args=ast.arguments(
+                posonlyargs=[], args=[ast.arg(arg=p) for p in node.params], vararg=None,
+                kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[],
+            ),
+            body=body,
+            decorator_list=[],
+            returns=None,
+        )
+        self.hoisted.append(_located(definition, line_num))
+
+        # En la línea de la definición, la función se registra en la capa de funciones
+        value = _name(py_name)
+        if node.memo:
+            value = _call("_pyra_memo", _const(node.name), value)
+        return ast.Assign(
+            targets=[_subscript(_name("_pyra_functions"), node.name, ast.Store())],
+            value=value,
+        )
+
+    def _loop_body(self, body, in_func):
+        target, self.tail_target = self.tail_target, None
+        try:
+            return self._block(body, in_func)
+        finally:
+            self.tail_target = target
+
+    def _loops(self, node, local_names):
+        """¿Las llamadas de cola de la func ``node`` a sí misma pueden volverse un bucle?"""
+        return (not node.memo and self.definitions.get(node.name) == 1
+                and node.name not in node.params and node.name not in local_names)
+
+    def _is_tail_call(self, value):
+        """¿``value`` es una llamada de la func actual a sí misma, con todos sus parámetros?"""
+        return self.tail_target is not None and _is_self_call(value, self.tail_target[0])
+
+    def looping_returns(self, program):
+        """Sentencias 'return f(...)' que compile convierte en un bucle dentro
+        de f (ver _tail_call); el modo por árbol solo reemplaza el marco de
+        la llamada en esas, así los dos modos cuentan igual la profundidad"""
+        self._count_definitions(program)
+        found = set()
+        self._find_looping_returns(program, None, found)
+        return found
+
+    def _find_looping_returns(self, body, func, found):
+        # func: la func cuyas llamadas de cola se vuelven un bucle, o None
+        for node in body:
+            kind = type(node)
+            if kind is Func:
+                local_names = self._assigned_names(node.body) - set(node.params)
+                self._find_looping_returns(node.body, node if self._loops(node, local_names) else None, found)
+            elif kind is Return:
+                if func is not None and node.expr:
+                    try:
+                        value = ast.parse(node.expr, FILENAME, mode="eval").body
+                    except SyntaxError:
+                        continue
+                    if _is_self_call(value, func):
+                        found.add(node)
+            elif kind in (For, While):
+                self._find_looping_returns(node.body, None, found)
+            elif kind is If:
+                for _, branch_body, _ in node.branches:
+                    self._find_looping_returns(branch_body, func, found)
+                if node.else_body:
+                    self._find_looping_returns(node.else_body, func, found)
+
+    def _tail_call(self, call, line_num):
+        """``return f(...)`` dentro de f: nuevos parámetros y locales como al entrar, y 'continue'"""
+        node, local_names = self.tail_target
+        self.tail_calls += 1
+        stmts = []
+        if node.params:
+            stmts.append(ast.Assign(
+                targets=[ast.Tuple(elts=[_name(p, ast.Store()) for p in node.params], ctx=ast.Store())],
+                value=ast.Tuple(elts=call.args, ctx=ast.Load()),
+            ))
+        for name in local_names:
+            # Valor global del mismo nombre, o sin valor como en una llamada nueva
+            forget = ast.Try(
+                body=[ast.Delete(targets=[_name(name, ast.Del())])],
+                handlers=[ast.ExceptHandler(type=None, name=None, body=[ast.Pass()])],
+                orelse=[], finalbody=[],
+            )
+            stmts.append(ast.If(
+                test=ast.Compare(left=_const(name), ops=[ast.In()], comparators=[_name("_pyra_globals")]),
+                body=[ast.Assign(targets=[_name(name, ast.Store())], value=_subscript(_name("_pyra_globals"), name))],
+                orelse=[forget],
+            ))
+        stmts.append(ast.Continue())
+        return [_located(stmt, line_num) for stmt in stmts]
+
+    def _count_definitions(self, body):
+        for node in body:
+            kind = type(node)
+            if kind is Func:
+                self.definitions[node.name] = self.definitions.get(node.name, 0) + 1
+                self._count_definitions(node.body)
+            elif kind in (For, While):
+                self._count_definitions(node.body)
+            elif kind is If:
+                for _, branch_body, _ in node.branches:
+                    self._count_definitions(branch_body)
+                if node.else_body:
+                    self._count_definitions(node.else_body)
+
+    def _assigned_names(self, body):
+        names = set()
+        for node in body:
+            kind = type(node)
+            if kind is Assign:
+                names.add(node.name)
+            elif kind is For:
+                names.add(node.var)
+                names |= self._assigned_names(node.body)
+            elif kind is While:
+                names |= self._assigned_names(node.body)
+            elif kind is If:
+                for _, branch_body, _ in node.branches:
+                    names |= self._assigned_names(branch_body)
+                if node.else_body:
+                    names |= self._assigned_names(node.else_body)
+        return names
+
+
+# --- Planes de expresiones (modo por árbol) ---
+class ExpressionPlan:
+    """Expresión lista para el ejecutor con pila explícita.
+
+    ``steps`` son las llamadas extraídas de la expresión, en orden de
+    evaluación: tuplas (es_llamada, código, temporal). El código de una
+    llamada produce ``(función, argumentos)`` para que el intérprete pueda
+    apilar un marco Pyra en lugar de recursar en Python; el de los demás
+    pasos produce un valor que debe fijarse antes de esas llamadas. Cada
+    resultado se guarda en la variable temporal y ``code`` calcula el valor
+    final. ``tail`` indica que la expresión completa es la última llamada.
+    """
+    __slots__ = ("code", "steps", "tail")
+
+    def __init__(self, code, steps=(), tail=False):
+        self.code = code
+        self.steps = steps
+        self.tail = tail
+
+
+def plan_expression(text, skip_names=frozenset()):
+    """Compila ``text`` extrayendo las llamadas a funciones por nombre.
+
+    Los nombres de ``skip_names`` (los builtins) se llaman directamente.
+    Lanza SyntaxError si la expresión no es válida.
+    """
+    tree = ast.parse(text, FILENAME, mode="eval")
+    for node in ast.walk(tree):
+        if _forbidden(node):
+            raise SyntaxError(text)
+
+    hoister = _CallHoister(skip_names)
+    body = hoister.visit(tree.body)
+    if not hoister.steps:
+        return ExpressionPlan(compile(tree, FILENAME, "eval"))
+
+    last_is_call, _, last_temp = hoister.steps[-1]
+    tail = last_is_call and isinstance(body, ast.Name) and body.id == last_temp
+    steps = tuple(
+        (is_call, compile(_expression(node), FILENAME, "eval"), temp)
+        for is_call, node, temp in hoister.steps
+    )
+    return ExpressionPlan(compile(_expression(body), FILENAME, "eval"), steps, tail)
+
+
+def _expression(node):
+    tree = ast.Expression(body=node)
+    ast.fix_missing_locations(tree)
+    return tree
+
+
+class _CallHoister:
+    """Extrae las llamadas f(...) que se evalúan siempre y de izquierda a derecha.
+
+    Las llamadas en posiciones condicionales (segundo operando de and/or,
+    ramas de un if ternario, comparaciones encadenadas, comprensiones,
+    lambdas) se dejan en la expresión y se ejecutan de forma síncrona.
+    """
+    def __init__(self, skip_names):
+        self.skip_names = skip_names
+        self.steps = []
+        self.counter = 0
+
+    def _temp(self):
+        name = f"_pyra_t{self.counter}"
+        self.counter += 1
+        return name
+
+    def visit(self, node):
+        kind = type(node)
+
+        if kind is ast.Call:
+            if not isinstance(node.func, ast.Name):
+                return node
+            values = self._visit_sequence(node.args + [k.value for k in node.keywords])
+            args = values[:len(node.args)]
+            for keyword, value in zip(node.keywords, values[len(node.args):]):
+                keyword.value = value
+            if node.keywords or node.func.id in self.skip_names:
+                node.args = args
+                return node
+            temp = self._temp()
+            call = ast.Tuple(elts=[_name(node.func.id), ast.Tuple(elts=args, ctx=ast.Load())], ctx=ast.Load())
+            self.steps.append((True, call, temp))
+            return _name(temp)
+
+        if kind is ast.BinOp:
+            node.left, node.right = self._visit_sequence([node.left, node.right])
+        elif kind is ast.UnaryOp:
+            node.operand = self.visit(node.operand)
+        elif kind is ast.BoolOp:
+            node.values[0] = self.visit(node.values[0])
+        elif kind is ast.IfExp:
+            node.test = self.visit(node.test)
+        elif kind is ast.Compare:
+            node.left, node.comparators[0] = self._visit_sequence([node.left, node.comparators[0]])
+        elif kind is ast.Subscript and sys.version_info >= (3, 9):
+            node.value, node.slice = self._visit_sequence([node.value, node.slice])
+        elif kind is ast.Attribute:
+            node.value = self.visit(node.value)
+        elif kind in (ast.Tuple, ast.List, ast.Set):
+            node.elts = self._visit_sequence(node.elts)
+        elif kind is ast.Starred:
+            node.value = self.visit(node.value)
+        return node
+
+    def _visit_sequence(self, nodes):
+        """Visita operandos que Python evalúa en orden.
+
+        Si un operando posterior contiene llamadas extraídas, los anteriores
+        (salvo nombres y constantes) se fijan antes en temporales para
+        conservar el orden de evaluación.
+        """
+        start = len(self.steps)
+        results = []
+        marks = []
+        for node in nodes:
+            results.append(self.visit(node))
+            marks.append(len(self.steps))
+
+        last_with_calls = -1
+        previous = start
+        for i, mark in enumerate(marks):
+            if mark > previous:
+                last_with_calls = i
+            previous = mark
+
+        for i in range(last_with_calls - 1, -1, -1):
+            if isinstance(results[i], (ast.Name, ast.Constant)):
+                continue
+            temp = self._temp()
+            self.steps.insert(marks[i], (False, results[i], temp))
+            results[i] = _name(temp)
+        return results
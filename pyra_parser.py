@@ -0,0 +1,299 @@
+"""
+Parser del lenguaje Pyra.
+Convierte las líneas tokenizadas por el intérprete en un árbol de sentencias,
+de modo que los cuerpos de if/while/for/func se descubren una sola vez por
+ejecución y no cada vez que se ejecutan.
+"""
+
+import keyword
+import re
+
+# --- Nodos del árbol ---
+class Node:
+    __slots__ = ("line_num",)
+
+class Func(Node):
+    """``memo`` indica que la función se declaró con ``@memo``"""
+    __slots__ = ("name", "params", "body", "memo")
+
+    def __init__(self, name, params, body, line_num, memo=False):
+        self.name = name
+        self.params = params
+        self.body = body
+        self.line_num = line_num
+        self.memo = memo
+
+class If(Node):
+    """Cadena if/elif/else: ``branches`` es una lista de (condición, cuerpo, línea)"""
+    __slots__ = ("branches", "else_body")
+
+    def __init__(self, branches, else_body, line_num):
+        self.branches = branches
+        self.else_body = else_body
+        self.line_num = line_num
+
+class While(Node):
+    __slots__ = ("cond", "body")
+
+    def __init__(self, cond, body, line_num):
+        self.cond = cond
+        self.body = body
+        self.line_num = line_num
+
+class For(Node):
+    __slots__ = ("var", "iterable", "body")
+
+    def __init__(self, var, iterable, body, line_num):
+        self.var = var
+        self.iterable = iterable
+        self.body = body
+        self.line_num = line_num
+
+class Assign(Node):
+    """``var nombre = valor`` (declare=True) o ``nombre = valor``"""
+    __slots__ = ("name", "expr", "declare")
+
+    def __init__(self, name, expr, declare, line_num):
+        self.name = name
+        self.expr = expr
+        self.declare = declare
+        self.line_num = line_num
+
+class Print(Node):
+    __slots__ = ("expr",)
+
+    def __init__(self, expr, line_num):
+        self.expr = expr
+        self.line_num = line_num
+
+class Expr(Node):
+    __slots__ = ("expr",)
+
+    def __init__(self, expr, line_num):
+        self.expr = expr
+        self.line_num = line_num
+
+class Return(Node):
+    __slots__ = ("expr",)
+
+    def __init__(self, expr, line_num):
+        self.expr = expr
+        self.line_num = line_num
+
+class Break(Node):
+    __slots__ = ()
+
+    def __init__(self, line_num):
+        self.line_num = line_num
+
+class Continue(Node):
+    __slots__ = ()
+
+    def __init__(self, line_num):
+        self.line_num = line_num
+
+class Invalid(Node):
+    """Sentencia mal formada: el error se reporta al llegar a ella en la ejecución"""
+    __slots__ = ("message",)
+
+    def __init__(self, message, line_num):
+        self.message = message
+        self.line_num = line_num
+
+
+FOR_PATTERN = re.compile(r'for\s+(\w+)\s+in\s+(.+):')
+# 'nombre = valor' (sin confundir con 'nombre == valor')
+ASSIGN_PATTERN = re.compile(r'\w+\s*=(?!=)')
+# Prefijo de los nombres auxiliares del código compilado (ver pyra_compiler)
+RESERVED_PREFIX = "_pyra"
+
+
+def is_valid_name(name):
+    """Nombre válido para variables, parámetros y funciones"""
+    return name.isidentifier() and not keyword.iskeyword(name) and not name.startswith(RESERVED_PREFIX)
+
+# --- Parser ---
+class Parser:
+    def __init__(self, lines):
+        # lines: lista de (indentación, línea, número de línea) de lexer.program_lines
+        self.lines = lines
+        self.loop_depth = 0
+
+    def parse(self):
+        return self._parse_block(0, len(self.lines))
+
+    def _parse_block(self, start, end):
+        nodes = []
+        i = start
+        while i < end:
+            node, i = self._parse_statement(i)
+            if node is not None:
+                nodes.append(node)
+        return nodes
+
+    def _body_end(self, index):
+        """Índice donde termina el cuerpo del encabezado en ``index``"""
+        lines = self.lines
+        header_indent = lines[index][0]
+        current = index + 1
+        if current < len(lines):
+            body_indent = lines[current][0]
+            while current < len(lines) and lines[current][0] >= body_indent and lines[current][0] > header_indent:
+                current += 1
+        return current
+
+    def _parse_statement(self, index):
+        indent, line, line_num = self.lines[index]
+
+        if line.startswith("@"):
+            return self._parse_decorator(index)
+        if line.startswith("func "):
+            return self._parse_func(index)
+        if line.startswith("if "):
+            return self._parse_if(index)
+        if line.startswith("while "):
+            return self._parse_while(index)
+        if line.startswith("for "):
+            return self._parse_for(index)
+        if line == "break" or line == "continue":
+            if not self.loop_depth:
+                return Invalid(f"'{line}' solo puede usarse dentro de un bucle", line_num), index + 1
+            return (Break if line == "break" else Continue)(line_num), index + 1
+        if line.startswith("else:") or line.startswith("elif "):
+            # else/elif sueltos se ignoran; su cuerpo se ejecuta como sentencias normales
+            return None, index + 1
+        if line.startswith("var "):
+            return self._parse_assignment(line[4:], True, line_num), index + 1
+        if line.startswith("print("):
+            return Print(line[6:-1], line_num), index + 1
+        if line == "return" or line.startswith("return "):
+            expr = line[len("return"):].strip()
+            return Return(expr or None, line_num), index + 1
+        if ASSIGN_PATTERN.match(line):
+            return self._parse_assignment(line, False, line_num), index + 1
+        return Expr(line, line_num), index + 1
+
+    def _parse_decorator(self, index):
+        indent, line, line_num = self.lines[index]
+        if line != "@memo":
+            return Invalid(f"Decorador desconocido: '{line}'", line_num), index + 1
+
+        following = index + 1
+        if following >= len(self.lines) or self.lines[following][0] != indent or not self.lines[following][1].startswith("func "):
+            return Invalid("'@memo' debe ir seguido de una definición de función", line_num), following
+
+        node, end = self._parse_func(following)
+        if isinstance(node, Func):
+            node.memo = True
+        return node, end
+
+    def _parse_func(self, index):
+        _, line, line_num = self.lines[index]
+        end = self._body_end(index)
+
+        try:
+            name = line[5:line.index("(")].strip()
+            args = line[line.index("(")+1:line.index(")")].strip()
+            params = [a.strip() for a in args.split(",") if a.strip()]
+        except ValueError:
+            return Invalid("Sintaxis de función inválida", line_num), end
+
+        if not is_valid_name(name) or not all(is_valid_name(p) for p in params) or len(set(params)) != len(params):
+            return Invalid("Sintaxis de función inválida", line_num), end
+
+        if end == index + 1:
+            return Invalid(f"Función '{name}' está vacía", line_num), end
+
+        # break/continue no cruzan el límite de una función
+        outer_loop_depth, self.loop_depth = self.loop_depth, 0
+        body = self._parse_block(index + 1, end)
+        self.loop_depth = outer_loop_depth
+        return Func(name, params, body, line_num), end
+
+    def _parse_if(self, index):
+        lines = self.lines
+        chain_indent, _, first_line_num = lines[index]
+        branches = []
+        else_body = None
+        error = None
+        current = index
+
+        while current < len(lines):
+            indent, line, line_num = lines[current]
+            if indent != chain_indent:
+                break
+
+            if current == index or line.startswith("elif "):
+                prefix = "if " if current == index else "elif "
+                condition = line[len(prefix):].rstrip(":").strip()
+                if not condition and error is None:
+                    error = Invalid(f"Falta condición después de '{prefix.strip()}'", line_num)
+                end = self._body_end(current)
+                branches.append((condition, self._parse_block(current + 1, end), line_num))
+                current = end
+            elif line == "else:":
+                end = self._body_end(current)
+                else_body = self._parse_block(current + 1, end)
+                current = end
+                break
+            else:
+                break
+
+        if error is not None:
+            return error, current
+        return If(branches, else_body, first_line_num), current
+
+    def _parse_while(self, index):
+        _, line, line_num = self.lines[index]
+        end = self._body_end(index)
+        condition = line[6:].rstrip(":").strip()
+
+        if not condition:
+            return Invalid("Falta condición en bucle while", line_num), end
+        if end == index + 1:
+            return Invalid("Bucle while vacío", line_num), end
+
+        return While(condition, self._parse_loop_body(index + 1, end), line_num), end
+
+    def _parse_for(self, index):
+        _, line, line_num = self.lines[index]
+        end = self._body_end(index)
+
+        match = FOR_PATTERN.match(line)
+        if not match:
+            return Invalid("Sintaxis de bucle for inválida (debe ser: for variable in iterable:)", line_num), end
+        if end == index + 1:
+            return Invalid("Bucle for vacío", line_num), end
+
+        var_name = match.group(1)
+        if not is_valid_name(var_name):
+            return Invalid(f"Nombre de variable inválido: '{var_name}'", line_num), end
+        iterable = match.group(2).strip()
+        return For(var_name, iterable, self._parse_loop_body(index + 1, end), line_num), end
+
+    def _parse_loop_body(self, start, end):
+        self.loop_depth += 1
+        body = self._parse_block(start, end)
+        self.loop_depth -= 1
+        return body
+
+    def _parse_assignment(self, text, declare, line_num):
+        if "=" not in text:
+            if declare:
+                return Invalid("Declaración inválida: falta '=' (debe ser 'var nombre = valor')", line_num)
+            return Invalid("Asignación inválida", line_num)
+
+        var_name, expr = text.split("=", 1)
+        var_name = var_name.strip()
+        expr = expr.strip()
+
+        if not var_name:
+            return Invalid("Falta nombre de variable", line_num)
+        if not is_valid_name(var_name):
+            return Invalid(f"Nombre de variable inválido: '{var_name}'", line_num)
+        if not expr:
+            if declare:
+                return Invalid("Falta valor en la declaración", line_num)
+            return Invalid("Falta valor en la asignación", line_num)
+
+        return Assign(var_name, expr, declare, line_num)
@@ -3,13 +3,23 @@ Servidor Flask mejorado para Mini IDE Pyra
 Mantiene la estructura de directorios original
 """
 
-from flask import Flask, request, jsonify, send_from_directory
-from interpreter import Interpreter
-from checker import Checker
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
+from interpreter import Interpreter, Budget, shared_expression_cache
+from checker import Checker, LintSession
+from lexer import lex
+from worker_pool import WorkerPool, iter_job, run_job
+from jobs import JobQueue, QueueFull
+from batch import run_batch
+from caching import LRUCache, ResultCache, INTERPRETER_VERSION, lint_cache_from_environment, lint_key
+from metrics import Registry, BYTE_BUCKETS, STATEMENT_BUCKETS
 import os
 import logging
 from functools import wraps
+import json
+import atexit
+import threading
 import time
+import uuid
 
 app = Flask(__name__, static_folder="static")
 
@@ -20,14 +30,156 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Caché simple para evitar procesar el mismo código repetidamente
-cache = {
-    'lint': {},
-    'last_cleanup': time.time()
-}
+# Caché de /lint para no analizar el mismo código repetidamente (LRU con caducidad)
+lint_cache = lint_cache_from_environment()
+# Documentos abiertos en el editor para /lint/session (se olvidan tras 30 minutos sin uso)
+LINT_SESSIONS = int(os.environ.get("PYRA_LINT_SESSIONS", 200))
+lint_sessions = LRUCache(max_entries=LINT_SESSIONS, ttl=1800)
 
 # Límite de tamaño de código (100KB)
 MAX_CODE_SIZE = 100 * 1024
+# Programas por petición a /run/batch
+MAX_BATCH_SIZE = 500
+
+# Presupuesto de ejecución de /run: valores por defecto y máximos que puede
+# pedir el cliente en "limits"
+DEFAULT_LIMITS = {
+    "max_statements": 1_000_000,
+    "max_seconds": 5,
+    "max_depth": 1000,
+    "max_loop_iterations": 100_000,
+    "max_output_bytes": 256 * 1024,
+    "max_output_lines": 10_000,
+    "max_memory_mb": 256,
+}
+MAX_LIMITS = {
+    "max_statements": 10_000_000,
+    "max_seconds": 30,
+    "max_depth": 10_000,
+    "max_loop_iterations": 1_000_000,
+    "max_output_bytes": 4 * 1024 * 1024,
+    "max_output_lines": 100_000,
+    "max_memory_mb": 1024,
+}
+
+# Pool de procesos que ejecuta /run (PYRA_WORKERS=0: en el hilo de la petición)
+POOL_SIZE = int(os.environ.get("PYRA_WORKERS", WorkerPool.default_size()))
+POOL_MAX_JOBS = int(os.environ.get("PYRA_WORKER_MAX_JOBS", 100))
+worker_pool = None
+worker_pool_lock = threading.Lock()
+
+def get_worker_pool():
+    """Crea el pool la primera vez que se necesita; None si está desactivado"""
+    global worker_pool
+    if POOL_SIZE <= 0:
+        return None
+    with worker_pool_lock:
+        if worker_pool is None:
+            worker_pool = WorkerPool(size=POOL_SIZE, max_jobs=POOL_MAX_JOBS)
+            atexit.register(worker_pool.shutdown)
+            logger.info(f"Pool de ejecución iniciado ({POOL_SIZE} procesos)")
+    return worker_pool
+
+def expression_cache_stats():
+    """Caché de expresiones de los procesos que ejecutan los programas (None
+    si el pool aún no arrancó)"""
+    if POOL_SIZE <= 0:
+        return shared_expression_cache.stats()
+    return worker_pool.stats()["expression_cache"] if worker_pool is not None else None
+
+# Resultados de /run ya calculados (None si está desactivada)
+result_cache = ResultCache.from_environment()
+
+# Cola de /run/submit: hilos que despachan trabajos y trabajos en espera
+JOB_CONCURRENCY = int(os.environ.get("PYRA_JOB_CONCURRENCY", max(POOL_SIZE, 1)))
+JOB_QUEUE_SIZE = int(os.environ.get("PYRA_JOB_QUEUE", 100))
+# Espera máxima de un long-poll en /run/status y /run/result (segundos)
+MAX_POLL_WAIT = 30
+job_queue = None
+
+# Métricas de GET /metrics (ver metrics.py)
+metrics = Registry()
+http_requests = metrics.counter("pyra_http_requests_total", "Peticiones atendidas", ("route", "method", "status"))
+http_seconds = metrics.histogram("pyra_http_request_duration_seconds", "Duración de las peticiones", ("route",))
+http_in_flight = metrics.gauge("pyra_http_requests_in_flight", "Peticiones en curso", ("route",))
+program_seconds = metrics.histogram("pyra_program_duration_seconds", "Tiempo de ejecución de los programas", ("mode",))
+program_statements = metrics.histogram("pyra_program_statements", "Sentencias ejecutadas por programa", ("mode",), STATEMENT_BUCKETS)
+program_output = metrics.histogram("pyra_program_output_bytes", "Bytes de salida por programa", ("mode",), BYTE_BUCKETS)
+program_errors = metrics.counter("pyra_program_errors_total", "Programas terminados con error, por categoría", ("category",))
+
+def observe_program(mode, seconds, statements, output_stats, error_category):
+    """Anota en las métricas un programa ejecutado"""
+    if seconds is not None:
+        program_seconds.observe(seconds, mode)
+    if statements is not None:
+        program_statements.observe(statements, mode)
+    if output_stats is not None:
+        program_output.observe(output_stats["bytes"], mode)
+    if error_category is not None:
+        program_errors.inc(error_category)
+
+@metrics.collector
+def cache_metrics():
+    """Estadísticas de las cachés, leídas en cada petición a /metrics"""
+    caches = [("lint", lint_cache.stats())]
+    if result_cache is not None:
+        caches.append(("result", result_cache.stats()))
+    expression = expression_cache_stats()
+    if expression is not None:
+        caches.append(("expression", dict(expression, entries=expression.get("size"))))
+    yield ("pyra_cache_hits_total", "counter", "Aciertos de la caché",
+           [({"cache": name}, stats["hits"]) for name, stats in caches])
+    yield ("pyra_cache_misses_total", "counter", "Fallos de la caché",
+           [({"cache": name}, stats["misses"]) for name, stats in caches])
+    yield ("pyra_cache_hit_ratio", "gauge", "Aciertos sobre consultas de la caché",
+           [({"cache": name}, stats["hit_ratio"]) for name, stats in caches])
+    yield ("pyra_cache_entries", "gauge", "Entradas guardadas en la caché",
+           [({"cache": name}, stats["entries"]) for name, stats in caches])
+    yield ("pyra_lint_sessions", "gauge", "Sesiones de lint abiertas", [({}, len(lint_sessions))])
+    if job_queue is not None:
+        stats = job_queue.stats()
+        yield ("pyra_jobs", "gauge", "Trabajos de /run/submit en cola y en ejecución",
+               [({"state": "queued"}, stats["queued"]), ({"state": "running"}, stats["running"])])
+
+def get_job_queue():
+    global job_queue
+    with worker_pool_lock:
+        if job_queue is None:
+            job_queue = JobQueue(execute_program, concurrency=JOB_CONCURRENCY, max_queued=JOB_QUEUE_SIZE)
+    return job_queue
+
+def parse_limits(limits):
+    """Construye el Budget de una petición; lanza ValueError si "limits" es inválido"""
+    if limits is None:
+        limits = {}
+    if not isinstance(limits, dict):
+        raise ValueError("'limits' debe ser un objeto")
+
+    values = dict(DEFAULT_LIMITS)
+    for name, value in limits.items():
+        if name == "abort_on_output_limit":
+            # Si se llega al límite de salida: detener el programa o recortar la salida
+            if not isinstance(value, bool):
+                raise ValueError(f"'{name}' debe ser true o false")
+            values[name] = value
+            continue
+        if name not in MAX_LIMITS:
+            raise ValueError(f"Límite desconocido: '{name}' (usa: {', '.join(Budget.LIMITS)})")
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            raise ValueError(f"'{name}' debe ser un número positivo")
+        if name != "max_seconds" and value != int(value):
+            raise ValueError(f"'{name}' debe ser un número entero")
+        if value > MAX_LIMITS[name]:
+            raise ValueError(f"'{name}' no puede superar {MAX_LIMITS[name]:,}")
+        values[name] = value if name == "max_seconds" else int(value)
+    return Budget(**values)
+
+def parse_run_options(data):
+    """Modo y Budget de una petición de ejecución; lanza ValueError si son inválidos"""
+    mode = data.get("mode", "tree")
+    if mode not in Interpreter.MODES:
+        raise ValueError(f"Modo inválido (usa uno de: {', '.join(Interpreter.MODES)})")
+    return mode, parse_limits(data.get("limits"))
 
 def validate_code_size(f):
     """Decorador para validar tamaño del código"""
@@ -46,14 +198,6 @@ def validate_code_size(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def cleanup_cache():
-    """Limpia el caché cada 5 minutos"""
-    current_time = time.time()
-    if current_time - cache['last_cleanup'] > 300:  # 5 minutos
-        cache['lint'].clear()
-        cache['last_cleanup'] = current_time
-        logger.info("Caché limpiado")
-
 # ==================== PÁGINAS ====================
 
 @app.route("/")
@@ -96,29 +240,281 @@ def run_code():
     if not code.strip():
         return jsonify({"output": "⚠️ No hay código para ejecutar"}), 200
     
-    logger.info(f"Ejecutando código ({len(code)} bytes)")
+    try:
+        mode, budget = parse_run_options(data)
+        profile = data.get("profile", False)
+        if not isinstance(profile, bool):
+            raise ValueError("'profile' debe ser true o false")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    logger.info(f"Ejecutando código ({len(code)} bytes, modo {mode}{', con perfil' if profile else ''})")
+    
+    return jsonify(execute_program(code, mode, budget, profile=profile))
+
+def execute_program(code, mode, budget, lines=None, profile=False):
+    """Respuesta de /run para un programa, reutilizando el resultado si ya se ejecutó.
+
+    "cache" indica "hit" (resultado guardado), "miss" (ejecutado y
+    guardado), "skip" (ejecutado, pero el resultado no se guarda) u "off".
+    ``lines`` es el resultado de lexer.lex(code), si ya se calculó. Con
+    ``profile`` el programa siempre se ejecuta (los tiempos no se guardan).
+    """
+    if result_cache is None:
+        return dict(run_program(code, mode, budget, lines, profile), cache="off")
+    if profile:
+        return dict(run_program(code, mode, budget, lines, profile), cache="skip")
+    
+    key = result_cache.key(code, mode, budget.as_dict())
+    cached = result_cache.get(key)
+    if cached is not None:
+        logger.debug("Usando resultado de ejecución desde caché")
+        return dict(cached, cache="hit")
     
-    interp = Interpreter()
+    response = run_program(code, mode, budget, lines)
+    stored = result_cache.store(key, response)
+    return dict(response, cache="miss" if stored else "skip")
+
+def run_program(code, mode, budget, lines=None, profile=False):
+    """Ejecuta un programa (en el pool, si está activo) y arma la respuesta de /run"""
     try:
-        result = interp.run(code)
+        pool = get_worker_pool()
+        if pool is not None:
+            # El trabajador es otro proceso: analiza el código de nuevo
+            job = pool.run(code, mode, budget, profile)
+        else:
+            job = run_job(code, mode, budget.as_dict(), lines, profile)
+        result = job["output"]
         
         # Si no hay salida, indicarlo
         if not result or not result.strip():
             result = "✓ Código ejecutado sin errores (sin salida)"
         
-        return jsonify({
+        response = {
             "success": True,
-            "output": result
-        })
+            "output": result,
+            "statements": job["statements"],
+            "limits": budget.as_dict(),
+            "limit_exceeded": job["limit_exceeded"],
+            "output_stats": job["output_stats"]
+        }
+        if job["limit_exceeded"]:
+            logger.warning(f"Ejecución detenida por el límite {job['limit_exceeded']}")
+        if job["memo"]:
+            response["memo"] = job["memo"]
+        if job["profile"]:
+            response["profile"] = job["profile"]
+        observe_program(mode, job["seconds"], job["statements"], job["output_stats"], job["error_category"])
+        
+        return response
     
     except Exception as e:
         logger.error(f"Error en ejecución: {e}")
         # IMPORTANTE: Devolver el error detallado al cliente
         error_msg = str(e)
-        return jsonify({
+        return {
             "success": False,
             "output": error_msg if error_msg else "Error desconocido al ejecutar el código"
-        }), 200  # Cambiado a 200 para que el cliente pueda leer el mensaje
+        }  # Con estado 200 para que el cliente pueda leer el mensaje
+
+def parse_batch_programs(programs):
+    """Valida la lista "programs" de /run/batch; lanza ValueError si es inválida"""
+    if not isinstance(programs, list) or not programs:
+        raise ValueError("'programs' debe ser una lista no vacía")
+    if len(programs) > MAX_BATCH_SIZE:
+        raise ValueError(f"Demasiados programas (máximo {MAX_BATCH_SIZE})")
+
+    parsed = []
+    for index, program in enumerate(programs):
+        if isinstance(program, str):
+            program = {"code": program}
+        if not isinstance(program, dict) or not isinstance(program.get("code"), str):
+            raise ValueError(f"Programa {index}: debe ser un texto o un objeto con 'code'")
+        if len(program["code"]) > MAX_CODE_SIZE:
+            raise ValueError(f"Programa {index}: código demasiado largo (máximo {MAX_CODE_SIZE} bytes)")
+        if "expected" in program and not isinstance(program["expected"], str):
+            raise ValueError(f"Programa {index}: 'expected' debe ser un texto")
+        parsed.append({key: program[key] for key in ("code", "expected", "id") if key in program})
+    return parsed
+
+@app.route("/run/batch", methods=["POST"])
+def run_code_batch():
+    """Ejecutar varios programas en paralelo (p. ej. para corregir entregas)
+
+    Recibe "programs" (textos u objetos con "code" y, opcionalmente,
+    "expected" e "id") y devuelve para cada uno su salida, estado, tiempo
+    y, si había salida esperada, si coincide. El tamaño de cada programa
+    se valida por separado (parse_batch_programs).
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No se recibió JSON válido"}), 400
+    
+    try:
+        programs = parse_batch_programs(data.get("programs"))
+        mode, budget = parse_run_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    logger.info(f"Ejecutando lote de {len(programs)} programas (modo {mode})")
+    
+    def observe(job):
+        observe_program(mode, job["seconds"], job["statements"], job["output_stats"], job["error_category"])
+    
+    results, summary = run_batch(programs, mode, budget, pool=get_worker_pool() or False, on_job=observe)
+    return jsonify({"success": True, "results": results, "summary": summary})
+
+# ==================== EJECUCIÓN ASÍNCRONA ====================
+
+@app.route("/run/submit", methods=["POST"])
+@validate_code_size
+def submit_code():
+    """Encolar una ejecución; devuelve el id del trabajo (202)"""
+    data = request.get_json()
+    code = data.get("code", "")
+    
+    if not code.strip():
+        return jsonify({"error": "No hay código para ejecutar"}), 400
+    
+    try:
+        mode, budget = parse_run_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        job = get_job_queue().submit(code, mode, budget)
+    except QueueFull as e:
+        logger.warning(str(e))
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    
+    logger.info(f"Trabajo {job.id} encolado ({len(code)} bytes, modo {mode})")
+    return jsonify(job.status()), 202
+
+def find_job(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return None, (jsonify({"error": "Trabajo no encontrado (o su resultado ya caducó)"}), 404)
+    return job, None
+
+def wait_seconds():
+    """Segundos de espera del long-poll (?wait=N), como mucho MAX_POLL_WAIT"""
+    try:
+        return min(max(float(request.args.get("wait", 0)), 0), MAX_POLL_WAIT)
+    except ValueError:
+        return 0
+
+@app.route("/run/status/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Estado de un trabajo: queued, running o done (?wait=N espera a que termine)"""
+    job, error = find_job(job_id)
+    if error:
+        return error
+    job.wait(wait_seconds())
+    return jsonify(job.status())
+
+@app.route("/run/result/<job_id>", methods=["GET"])
+def job_result(job_id):
+    """Resultado de un trabajo; 202 con el estado si todavía no terminó (?wait=N para esperar)"""
+    job, error = find_job(job_id)
+    if error:
+        return error
+    if not job.wait(wait_seconds()):
+        return jsonify(job.status()), 202
+    return jsonify(dict(job.result, job=job.status()))
+
+@app.route("/run/stream", methods=["POST"])
+@validate_code_size
+def run_code_stream():
+    """Ejecutar código enviando la salida a medida que se produce (Server-Sent Events)
+
+    Eventos: "output" con un fragmento de texto y, al final, "done" con
+    statements, limit_exceeded, error, output (estadísticas de la salida) y
+    cache (como en /run; con "hit" la salida llega en un solo fragmento).
+    Como /run, se ejecuta en el pool si está activo. Si el cliente se
+    desconecta, la ejecución se cancela.
+    """
+    data = request.get_json()
+    code = data.get("code", "")
+    
+    if not code.strip():
+        return jsonify({"error": "No hay código para ejecutar"}), 400
+    
+    try:
+        mode, budget = parse_run_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    logger.info(f"Ejecutando código en streaming ({len(code)} bytes, modo {mode})")
+    
+    def events():
+        for kind, value in stream_program(code, mode, budget):
+            yield f"event: {kind}\ndata: {json.dumps(value)}\n\n"
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def stream_program(code, mode, budget):
+    """Eventos (tipo, valor) de /run/stream, reutilizando el resultado si ya se ejecutó.
+
+    La caché es la de /run, con claves propias: guarda la salida completa y
+    el evento "done" en lugar de la respuesta de /run.
+    """
+    key = None
+    if result_cache is not None:
+        key = result_cache.key(code, mode, budget.as_dict(), stream=True)
+        cached = result_cache.get(key)
+        if cached is not None:
+            logger.debug("Usando resultado de ejecución desde caché")
+            if cached["output"]:
+                yield "output", cached["output"]
+            yield "done", dict(cached["done"], cache="hit")
+            return
+    
+    pool = get_worker_pool()
+    if pool is not None:
+        messages = pool.stream(code, mode, budget)
+    else:
+        messages = iter_job(code, mode, budget.as_dict())
+    parts = []
+    for kind, value in messages:
+        if kind == "output":
+            if key is not None:
+                parts.append(value)
+            yield kind, value
+            continue
+        
+        observe_program(mode, value["seconds"], value["statements"], value["output_stats"], value["error_category"])
+        if value["limit_exceeded"]:
+            logger.warning(f"Ejecución detenida por el límite {value['limit_exceeded']}")
+        done = {
+            "statements": value["statements"],
+            "limit_exceeded": value["limit_exceeded"],
+            "error": value["error"],
+            "error_category": value["error_category"],
+            "output": value["output_stats"],
+        }
+        cache = "off"
+        if key is not None:
+            entry = {
+                "success": True,
+                "statements": done["statements"],
+                "limit_exceeded": done["limit_exceeded"],
+                "output": "".join(parts),
+                "done": done,
+            }
+            cache = "miss" if result_cache.store(key, entry) else "skip"
+        yield "done", dict(done, cache=cache)
+
+def lint_result(errors):
+    return {
+        "success": True,
+        "errors": errors,
+        "error_count": len([e for e in errors if e.get('severity') == 'error']),
+        "warning_count": len([e for e in errors if e.get('severity') == 'warning'])
+    }
 
 @app.route("/lint", methods=["POST"])
 @validate_code_size
@@ -127,30 +523,22 @@ def lint_code():
     data = request.get_json()
     code = data.get("code", "")
     
-    # Limpiar caché periódicamente
-    cleanup_cache()
-    
     # Usar caché si el código no ha cambiado
-    code_hash = hash(code)
-    if code_hash in cache['lint']:
+    key = lint_key(code)
+    cached = lint_cache.get(key)
+    if cached is not None:
         logger.debug("Usando resultado de lint desde caché")
-        return jsonify(cache['lint'][code_hash])
+        return jsonify(cached)
     
     logger.info(f"Analizando código ({len(code)} bytes)")
     
     checker = Checker()
     try:
         errors = checker.check(code)
+        result = lint_result(errors)
         
-        result = {
-            "success": True,
-            "errors": errors,
-            "error_count": len([e for e in errors if e.get('severity') == 'error']),
-            "warning_count": len([e for e in errors if e.get('severity') == 'warning'])
-        }
-        
-        # Guardar en caché
-        cache['lint'][code_hash] = result
+        # Guardar en caché (el tamaño estimado es el del código más el de los diagnósticos)
+        lint_cache.put(key, result, len(code) + 200 * len(errors))
         
         return jsonify(result)
     
@@ -162,6 +550,106 @@ def lint_code():
             "error": str(e)
         }), 500
 
+@app.route("/lint/session", methods=["POST"])
+@validate_code_size
+def lint_session_open():
+    """Abrir un documento para lint incremental; devuelve su id y sus errores"""
+    data = request.get_json()
+    code = data.get("code", "")
+    session = LintSession(code, data.get("version", 0))
+    session_id = uuid.uuid4().hex
+    with session.lock:
+        result = lint_result(session.errors())
+    lint_sessions.put(session_id, session, session.size)
+    return jsonify({**result, "session": session_id, "version": session.version})
+
+@app.route("/lint/session/<session_id>", methods=["POST"])
+@validate_code_size
+def lint_session_edit(session_id):
+    """Aplicar ediciones a un documento abierto y devolver sus errores.
+
+    El cuerpo lleva "base_version" (versión a la que se aplican), "version"
+    (versión resultante) y "changes": rangos como los de Monaco
+    ({"range": {startLineNumber, startColumn, endLineNumber, endColumn},
+    "text"}), que se aplican en orden. Con "code" se reemplaza el documento
+    completo. Si la versión no coincide responde 409 con "resync": el
+    cliente debe enviar el documento completo.
+    """
+    data = request.get_json()
+    session = lint_sessions.get(session_id)
+    if session is None:
+        return jsonify({"success": False, "resync": True, "error": "Sesión de lint desconocida o caducada"}), 404
+    
+    with session.lock:
+        if "code" in data:
+            session.reset(data["code"], data.get("version", session.version))
+        else:
+            if data.get("base_version") != session.version:
+                return jsonify({
+                    "success": False,
+                    "resync": True,
+                    "version": session.version,
+                    "error": f"Versión desconocida (la sesión está en la versión {session.version})"
+                }), 409
+            try:
+                for change in data.get("changes", []):
+                    r = change["range"]
+                    session.apply_edit(r["startLineNumber"], r["startColumn"],
+                                       r["endLineNumber"], r["endColumn"], change.get("text", ""))
+            except (KeyError, TypeError, ValueError) as e:
+                # El documento pudo quedar a medio editar: el cliente debe reenviarlo
+                session.version = None
+                return jsonify({"success": False, "resync": True, "error": f"Edición inválida: {e}"}), 400
+            session.version = data.get("version", session.version)
+        
+        if session.size > MAX_CODE_SIZE:
+            session.version = None
+            return jsonify({
+                "success": False,
+                "resync": True,
+                "error": f"Código demasiado largo (máximo {MAX_CODE_SIZE} bytes)"
+            }), 413
+        result = lint_result(session.errors())
+        version = session.version
+    lint_sessions.put(session_id, session, session.size)
+    return jsonify({**result, "session": session_id, "version": version})
+
+@app.route("/check-run", methods=["POST"])
+@validate_code_size
+def check_and_run():
+    """Analizar el código y ejecutarlo solo si no tiene errores.
+
+    El checker y el intérprete comparten las líneas de lexer.lex solo si
+    el programa se ejecuta en este proceso (PYRA_WORKERS=0): con el pool,
+    el trabajador vuelve a dividir el código, porque enviarle las líneas ya
+    analizadas cuesta lo mismo que analizarlas de nuevo. Devuelve la respuesta de /lint en "lint" y, si no hubo
+    errores, la de /run en "run" (si no, "run" es null).
+    """
+    data = request.get_json()
+    code = data.get("code", "")
+    
+    if not code.strip():
+        return jsonify({"output": "⚠️ No hay código para ejecutar"}), 200
+    
+    try:
+        mode, budget = parse_run_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    lines = lex(code)
+    key = lint_key(code)
+    lint = lint_cache.get(key)
+    if lint is None:
+        errors = Checker().check_lines(lines)
+        lint = lint_result(errors)
+        lint_cache.put(key, lint, len(code) + 200 * len(errors))
+    
+    if lint["error_count"]:
+        return jsonify({"success": False, "lint": lint, "run": None})
+    
+    logger.info(f"Ejecutando código revisado ({len(code)} bytes, modo {mode})")
+    return jsonify({"success": True, "lint": lint, "run": execute_program(code, mode, budget, lines)})
+
 # ==================== ENDPOINTS ADICIONALES ====================
 
 @app.route("/health", methods=["GET"])
@@ -170,9 +658,22 @@ def health_check():
     return jsonify({
         "status": "ok",
         "version": "1.0",
-        "cache_size": len(cache['lint'])
+        "interpreter_version": INTERPRETER_VERSION,
+        "cache_size": len(lint_cache),
+        "lint_cache": lint_cache.stats(),
+        "lint_sessions": len(lint_sessions),
+        "limits": {"default": DEFAULT_LIMITS, "max": MAX_LIMITS},
+        "worker_pool": worker_pool.stats() if worker_pool is not None else None,
+        "result_cache": result_cache.stats() if result_cache is not None else None,
+        "expression_cache": expression_cache_stats(),
+        "jobs": job_queue.stats() if job_queue is not None else None
     })
 
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Métricas en el formato de texto de Prometheus"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/examples", methods=["GET"])
 def get_examples():
     """Obtener ejemplos de código"""
@@ -193,6 +694,16 @@ print(resultado)""",
         return fibonacci(n - 1) + fibonacci(n - 2)
 
 for i in range(10):
+    print(fibonacci(i))""",
+        
+        "fibonacci_memo": """@memo
+func fibonacci(n):
+    if n <= 1:
+        return n
+    else:
+        return fibonacci(n - 1) + fibonacci(n - 2)
+
+for i in range(50):
     print(fibonacci(i))""",
         
         "bucles": """for i in range(5):
@@ -243,6 +754,10 @@ def handle_exception(e):
 def log_request():
     """Log de todas las peticiones"""
     logger.info(f"{request.method} {request.path} - {request.remote_addr}")
+    # Métricas por ruta (la regla de Flask, no la URL: /run/status/<job_id>)
+    g.metrics_route = request.url_rule.rule if request.url_rule is not None else "desconocida"
+    g.metrics_started = time.perf_counter()
+    http_in_flight.inc(g.metrics_route)
 
 @app.after_request
 def add_headers(response):
@@ -250,8 +765,19 @@ def add_headers(response):
     response.headers['X-Content-Type-Options'] = 'nosniff'
     response.headers['X-Frame-Options'] = 'DENY'
     response.headers['X-XSS-Protection'] = '1; mode=block'
+    route = g.get("metrics_route")
+    if route is not None:
+        http_requests.inc(route, request.method, response.status_code)
+        http_seconds.observe(time.perf_counter() - g.metrics_started, route)
     return response
 
+@app.teardown_request
+def finish_request(error=None):
+    # Con stream_with_context esta función puede llamarse dos veces
+    route = g.pop("metrics_route", None)
+    if route is not None:
+        http_in_flight.dec(route)
+
 # ==================== INICIO DEL SERVIDOR ====================
 
 if __name__ == "__main__":
@@ -279,9 +805,15 @@ if __name__ == "__main__":
     print(f"\n💡 Endpoints disponibles:")
     print(f"   - GET  /            → IDE principal")
     print(f"   - GET  /manual      → Manual de usuario")
-    print(f"   - POST /run         → Ejecutar código")
+    print(f"   - POST /run         → Ejecutar código (\"profile\": true añade el perfil por línea)")
+    print(f"   - POST /run/stream  → Ejecutar código con salida en streaming")
+    print(f"   - POST /run/submit  → Encolar una ejecución (y GET /run/status/<id>, /run/result/<id>)")
+    print(f"   - POST /run/batch   → Ejecutar varios programas en paralelo")
     print(f"   - POST /lint        → Analizar código")
+    print(f"   - POST /lint/session → Analizar código de forma incremental (y POST /lint/session/<id>)")
+    print(f"   - POST /check-run   → Analizar el código y ejecutarlo si no tiene errores")
     print(f"   - GET  /health      → Estado del servidor")
+    print(f"   - GET  /metrics     → Métricas (formato de Prometheus)")
     print(f"   - GET  /examples    → Ejemplos de código")
     print("\n" + "="*50 + "\n")
     
@@ -295,12 +827,18 @@ if __name__ == "__main__":
         logger.error("❌ Error: static/index.html no existe")
         print("\n⚠️  Por favor, mueve index.html a la carpeta 'static/'\n")
     
+    # Arrancar los procesos de ejecución antes de la primera petición
+    # (con el recargador de debug, solo en el proceso que atiende peticiones)
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        get_worker_pool()
+    
     try:
         app.run(
             host="0.0.0.0", 
             port=port, 
             debug=debug,
-            use_reloader=debug
+            use_reloader=debug,
+            threaded=True  # cada intérprete escribe en su propia salida
         )
     except KeyboardInterrupt:
         print("\n\n👋 Servidor detenido por el usuario")
@@ -1,16 +1,18 @@
-from interpreter import Interpreter  # Asegúrate de que el archivo se llame interpreter.py
+from interpreter import Interpreter, Budget  # Asegúrate de que el archivo se llame interpreter.py
 
-def run_test(title, code, expected_output):
-    print(f"\n=== {title} ===")
-    interp = Interpreter()
-    result = interp.run(code).strip()
-    print("Salida:")
-    print(result)
-    if result == expected_output.strip():
-        print("✔ OK")
-    else:
-        print("❌ Esperado:")
-        print(expected_output.strip())
+def run_test(title, code, expected_output, **options):
+    # Cada prueba se ejecuta en todos los modos del intérprete
+    for mode in Interpreter.MODES:
+        print(f"\n=== {title} [{mode}] ===")
+        interp = Interpreter(mode=mode, **options)
+        result = interp.run(code).strip()
+        print("Salida:")
+        print(result)
+        if result == expected_output.strip():
+            print("✔ OK")
+        else:
+            print("❌ Esperado:")
+            print(expected_output.strip())
 
 
 # --- TEST 1: Variables numéricas y operaciones ---
@@ -137,3 +139,946 @@ César es mayor de edad
 El doble es 20
 """
 run_test("Uso combinado de todo", test8, expected8)
+
+
+# --- TEST 9: If consecutivos (no forman una cadena elif) ---
+test9 = """
+var x = 5
+if x > 1:
+    print("mayor que 1")
+if x > 3:
+    print("mayor que 3")
+"""
+expected9 = """
+mayor que 1
+mayor que 3
+"""
+run_test("If consecutivos", test9, expected9)
+
+
+# --- TEST 10: Errores con número de línea ---
+test10 = """
+func dividir(a, b):
+    return a / b
+
+print(dividir(4, 2))
+print(dividir(1, 0))
+"""
+expected10 = """
+2.0
+❌ Error en línea 2: División por cero
+"""
+run_test("Errores con número de línea", test10, expected10)
+
+
+# --- TEST 11: Bucles con break/continue dentro de funciones ---
+test11 = """
+func pares_hasta(n):
+    var total = 0
+    var i = 0
+    while True:
+        i = i + 1
+        if i > n:
+            break
+        if i % 2 == 1:
+            continue
+        total = total + i
+    return total
+
+print(pares_hasta(10))
+"""
+expected11 = """
+30
+"""
+run_test("Break y continue en funciones", test11, expected11)
+
+
+# --- TEST 12: Funciones memo ---
+test12 = """
+@memo
+func fibonacci(n):
+    if n <= 1:
+        return n
+    return fibonacci(n - 1) + fibonacci(n - 2)
+
+print(fibonacci(60))
+"""
+expected12 = """
+1548008755920
+"""
+run_test("Funciones memo", test12, expected12)
+
+
+# --- TEST 13: Presupuesto de ejecución ---
+test13 = """
+var i = 0
+while i >= 0:
+    i = i + 1
+"""
+expected13 = """
+❌ Error en línea 3: Límite de ejecución excedido (más de 500 sentencias)
+"""
+run_test("Límite de sentencias", test13, expected13, budget=Budget(max_statements=500))
+
+test14 = """
+func infinita(n):
+    return 1 + infinita(n + 1)
+
+print(infinita(0))
+"""
+expected14 = """
+❌ Error en línea 2: Límite de recursión excedido (máximo 100 llamadas anidadas)
+"""
+run_test("Límite de profundidad", test14, expected14, budget=Budget(max_depth=100))
+
+# Más llamadas anidadas que el límite de recursión de Python (1000)
+test14b = """
+func profundidad(n):
+    if n == 0:
+        return 0
+    return 1 + profundidad(n - 1)
+
+print(profundidad(5000))
+print(profundidad(7000))
+"""
+expected14b = """
+5000
+❌ Error en línea 4: Límite de recursión excedido (máximo 6000 llamadas anidadas)
+"""
+run_test("Recursión más profunda que la pila de Python", test14b, expected14b, budget=Budget(max_depth=6000))
+
+# 'return f(...)' no apila otra llamada: no cuenta para max_depth
+test14c = """
+var extra = 1
+func suma(n, total):
+    if n == 0:
+        return total + extra
+    var extra = 0
+    return suma(n - 1, total + n + extra)
+
+print(suma(100000, 0))
+"""
+expected14c = """
+5000050001
+"""
+run_test("Recursión de cola", test14c, expected14c, budget=Budget(max_depth=1000))
+
+# Los auxiliares del modo compilado (_pyra_count, _pyra_fail...) no se pueden reemplazar
+test14d = """
+var _pyra_count = abs
+"""
+expected14d = """
+❌ Error en línea 1: Nombre de variable inválido: '_pyra_count'
+"""
+run_test("Nombres reservados", test14d, expected14d, budget=Budget(max_statements=1000))
+
+test14e = """
+(_pyra_fail := lambda *a: 0)
+var i = 0
+while i < 3000000:
+    i = i + 1
+"""
+expected14e = """
+❌ Error en línea 1: Sintaxis inválida en expresión
+"""
+run_test("Nombres reservados en expresiones", test14e, expected14e, budget=Budget(max_statements=1000))
+
+# Los dos modos cuentan igual la profundidad: llamadas de cola entre funciones,
+# 'return' del programa y llamadas desde Python (sorted con key=)
+test14f = """
+func par(n):
+    print(n)
+    return impar(n + 1)
+
+func impar(n):
+    print(n)
+    return par(n + 1)
+
+func clave(x):
+    return x
+
+for i in range(4):
+    print(sorted([2, 1], key=clave))
+return par(1)
+"""
+expected14f = """
+[1, 2]
+[1, 2]
+[1, 2]
+[1, 2]
+1
+2
+3
+4
+5
+❌ Error en línea 3: Límite de recursión excedido (máximo 5 llamadas anidadas)
+"""
+run_test("Profundidad en el límite", test14f, expected14f, budget=Budget(max_depth=5))
+
+
+# --- TEST 15: Programas simultáneos en varios hilos ---
+import threading
+
+def run_concurrent(title, programs):
+    # Cada hilo usa su propio intérprete; la salida no debe mezclarse
+    print(f"\n=== {title} ===")
+    results = {}
+    def worker(index, code):
+        results[index] = Interpreter().run(code).strip()
+    threads = [threading.Thread(target=worker, args=(i, code)) for i, (code, _) in enumerate(programs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if all(results[i] == expected.strip() for i, (_, expected) in enumerate(programs)):
+        print("✔ OK")
+    else:
+        print("❌ Esperado:")
+        print([expected.strip() for _, expected in programs])
+        print([results[i] for i in range(len(programs))])
+
+run_concurrent("Hilos simultáneos", [
+    (f"for i in range(500):\n    print({n})", "\n".join([str(n)] * 500))
+    for n in range(8)
+])
+
+
+# --- TEST 16: Salida en streaming (run_iter) ---
+print("\n=== Streaming con run_iter ===")
+events = list(Interpreter().run_iter(test8))
+streamed = "".join(value for kind, value in events if kind == "output")
+if streamed.strip() == expected8.strip() and events[-1][0] == "done" and events[-1][1]["error"] is None:
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print(expected8.strip())
+    print(events)
+
+print("\n=== Streaming con un lector lento ===")
+import time
+from interpreter import StreamingSink
+# Con límite de salida, las últimas líneas llegan justo al terminar (finish)
+code16 = "for i in range(30):\n    print(i)\n"
+budget16 = Budget(max_output_lines=10)
+expected16 = Interpreter(budget=budget16).run(code16)
+lost16 = 0
+for _ in range(50):
+    parts16 = []
+    for kind, value in Interpreter(budget=budget16).run_iter(code16, poll_interval=0.001):
+        if kind == "output":
+            parts16.append(value)
+            time.sleep(0.002)
+    if "".join(parts16) != expected16:
+        lost16 += 1
+sink16 = StreamingSink()
+sink16.write("fin\n")
+sink16.finish()
+if not lost16 and sink16.take(0) == ("fin\n", True) and sink16.take(0) == ("", True):
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print(f"toda la salida en cada ejecución ({lost16} de 50 incompletas)")
+
+
+# --- TEST 17: Límite de salida (primeras y últimas líneas) ---
+test17 = """
+for i in range(10):
+    print(i)
+print("fin")
+"""
+expected17 = """
+0
+1
+... [7 líneas omitidas (14 bytes)] ...
+9
+fin
+"""
+run_test("Salida recortada", test17, expected17, budget=Budget(max_output_lines=4))
+
+expected17b = """
+0
+1
+2
+3
+❌ Error en línea 2: Límite de salida excedido (más de 4 líneas)
+"""
+run_test("Salida con límite estricto", test17, expected17b, budget=Budget(max_output_lines=4, abort_on_output_limit=True))
+
+
+# --- TEST 18: Lint incremental (LintSession) ---
+from checker import Checker, LintSession
+
+print("\n=== Lint incremental ===")
+session = LintSession(test8)
+session.apply_edit(1, 1, 1, 1, "@memo\n")           # decorador antes de una línea que no es func
+session.apply_edit(3, 1, 3, 1, "retun 1\n")         # return mal escrito fuera de la función
+session.apply_edit(5, 5, 5, 5, "whlie x:\n    ")    # bloque vacío dentro de otro bloque
+document = "\n".join(session.lines)
+expected18 = Checker().check(document)
+if session.errors() == expected18 and expected18:
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print(expected18)
+    print(session.errors())
+
+print("\n=== /lint en el servidor (fallo y acierto de caché) ===")
+import server
+client = server.app.test_client()
+code18 = "var x = 1\nwhlie x:\n    print(x)\n"
+first18 = client.post("/lint", json={"code": code18})
+second18 = client.post("/lint", json={"code": code18})
+if first18.status_code == second18.status_code == 200 and first18.get_json() == second18.get_json() and first18.get_json()["warning_count"]:
+    print("✔ OK")
+else:
+    print("❌ Esperado: 200 y el mismo resultado dos veces")
+    print(first18.status_code, first18.get_json())
+    print(second18.status_code, second18.get_json())
+
+
+# --- TEST 19: Checker en una sola pasada ---
+test19 = """
+if x:
+# el bloque de arriba no tiene cuerpo
+break
+@memo
+func f(n):
+    print(n)
+    retun n
+"""
+expected19 = [
+    (2, "Bloque vacio"),
+    (4, "'break' solo puede usarse dentro de un bucle"),
+    (7, "La funcion memo 'f' imprime: las llamadas guardadas en cache no volveran a imprimir"),
+    (8, "Posible error: ¿quisiste escribir 'return'?"),
+]
+print("\n=== Checker en una sola pasada ===")
+found19 = [(e["line"], e["message"]) for e in Checker().check(test19)]
+if found19 == expected19:
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print(expected19)
+    print(found19)
+
+
+# --- TEST 20: Sugerencias para nombres mal escritos ---
+test20 = """
+var resultado = 10
+whiel resultado > 0:
+    resultado = resultado - 1
+print(resutlado + lenn("resutlado"))
+"""
+expected20 = [
+    (3, "Posible error: ¿quisiste escribir 'while'?"),
+    (5, "Posible error: ¿quisiste escribir 'resultado'?"),
+    (5, "Posible error: ¿quisiste escribir 'len'?"),
+]
+print("\n=== Sugerencias de nombres ===")
+found20 = [(e["line"], e["message"]) for e in Checker().check(test20) if e["severity"] == "warning"]
+if found20 == expected20:
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print(expected20)
+    print(found20)
+
+print("\n=== Sin sugerencias para argumentos con nombre ni parámetros de lambda ===")
+test20b = """
+var numeros = [3, 1, 2]
+print(sorted(numeros, reverse=True))
+print(sorted(numeros, key=lambda valor: -valor))
+"""
+found20b = [(e["line"], e["message"]) for e in Checker().check(test20b) if e["severity"] == "warning"]
+if not found20b:
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print([])
+    print(found20b)
+
+print("\n=== Sugerencias en 100 KB de nombres distintos ===")
+def name20(n):
+    # Nombres de 6 letras distintos entre sí
+    letters = ""
+    n = n * 7919 + 100000
+    while n:
+        n, digit = divmod(n, 26)
+        letters += "abcdefghijklmnopqrstuvwxyz"[digit]
+    return letters
+lines20 = []
+while sum(map(len, lines20)) < 100 * 1024:
+    i = len(lines20)
+    lines20.append(f"var {name20(3 * i)} = {name20(3 * i + 1)} + {name20(3 * i + 2)}")
+doc20 = "\n".join(lines20)
+started20 = time.perf_counter()
+full20 = Checker().check(doc20)
+session20 = LintSession(doc20)
+session20.errors()
+session20.apply_edit(5, 1, 5, 1, f"var {name20(1)}x = 1\n")
+edited20 = session20.errors()
+seconds20 = time.perf_counter() - started20
+if seconds20 < 10 and edited20 == Checker().check("\n".join(session20.lines)):
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print("menos de 10 segundos y los mismos avisos que Checker.check")
+    print(f"{seconds20:.1f} segundos")
+
+print("\n=== Sugerencias con nombres largos de dos letras ===")
+# Pocos pares de letras distintos: el filtro de NameIndex no descarta nada
+def long_name20(n):
+    letters = "v"
+    for _ in range(999):
+        n = (n * 1103515245 + 12345) % 2 ** 31
+        letters += "ab"[n >> 30]
+    return letters
+lines20 = []
+expected20c = []
+for i in range(50):
+    name = long_name20(i)
+    typo = name[:500] + ("b" if name[500] == "a" else "a") + name[501:]
+    lines20 += [f"var {name} = 1", f"print({typo})"]
+    expected20c.append((2 * i + 2, f"Posible error: ¿quisiste escribir '{name}'?"))
+started20 = time.perf_counter()
+found20c = [(e["line"], e["message"]) for e in Checker().check("\n".join(lines20))]
+seconds20 = time.perf_counter() - started20
+if seconds20 < 10 and found20c == expected20c:
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print("menos de 10 segundos y una sugerencia por nombre")
+    print(f"{seconds20:.1f} segundos, {len(found20c)} avisos")
+
+
+# --- TEST 21: Textos y comentarios (lexer compartido) ---
+test21 = """
+var texto = "(hola) # no es comentario"
+if len(texto) > 0:  # comentario al final:
+    print(texto)  # fi
+print('it"s')
+"""
+expected21 = """
+(hola) # no es comentario
+it"s
+"""
+run_test("Textos y comentarios", test21, expected21)
+
+print("\n=== Checker con textos y comentarios ===")
+found21 = Checker().check(test21)
+if not found21:
+    print("✔ OK")
+else:
+    print("❌ Esperado: sin errores")
+    print(found21)
+
+
+# --- TEST 22: Perfil por línea y por función ---
+test22 = """
+func doble(n):
+    return n * 2
+
+var total = 0
+for i in range(4):
+    total = total + doble(i)
+print(total)
+print(sorted([3, 1, 2], key=doble))
+"""
+expected22 = """
+12
+[1, 2, 3]
+"""
+run_test("Ejecución con perfil", test22, expected22, profile=True)
+
+expected_hits22 = {1: 1, 2: 7, 4: 1, 5: 1, 6: 4, 7: 1, 8: 1}
+for mode in Interpreter.MODES:
+    print(f"\n=== Perfil por línea [{mode}] ===")
+    interp = Interpreter(mode=mode, profile=True)
+    interp.run(test22)
+    profile22 = interp.profile_stats()
+    hits22 = {line["line"]: line["hits"] for line in profile22["lines"]}
+    calls22 = {f["name"]: f["calls"] for f in profile22["functions"]}
+    if hits22 == expected_hits22 and calls22 == {"doble": 7} and Interpreter(mode=mode).profile_stats() is None:
+        print("✔ OK")
+    else:
+        print("❌ Esperado:")
+        print(expected_hits22, {"doble": 7})
+        print(hits22, calls22)
+
+
+# --- TEST 23: Categorías de error y métricas por hilo ---
+from metrics import Registry
+
+tests23 = [
+    ("print(1 / 0)", "zero_division"),
+    ("print(x)", "name"),
+    ("func f(a):\n    return a\nprint(f(1, 2))", "arity"),
+    ("print([1][3])", "index"),
+    ("var i = 0\nwhile True:\n    i = i + 1", "limit"),
+    ("print(1)", None),
+]
+for mode in Interpreter.MODES:
+    print(f"\n=== Categorías de error [{mode}] ===")
+    found23 = []
+    for code, _ in tests23:
+        interp = Interpreter(mode=mode)
+        interp.run(code)
+        found23.append(interp.error_category)
+    expected23 = [category for _, category in tests23]
+    if found23 == expected23:
+        print("✔ OK")
+    else:
+        print("❌ Esperado:")
+        print(expected23)
+        print(found23)
+
+print("\n=== Métricas desde varios hilos ===")
+registry23 = Registry()
+requests23 = registry23.counter("pyra_test_total", "Prueba", ("route",))
+seconds23 = registry23.histogram("pyra_test_seconds", "Prueba", ("route",), buckets=(0.5, 1))
+def count23():
+    for _ in range(1000):
+        requests23.inc("/run")
+        seconds23.observe(0.75, "/run")
+threads23 = [threading.Thread(target=count23) for _ in range(4)]
+for thread in threads23:
+    thread.start()
+for thread in threads23:
+    thread.join()
+rendered23 = registry23.render()
+expected_lines23 = [
+    'pyra_test_total{route="/run"} 4000',
+    'pyra_test_seconds_bucket{route="/run",le="0.5"} 0',
+    'pyra_test_seconds_bucket{route="/run",le="1"} 4000',
+    'pyra_test_seconds_count{route="/run"} 4000',
+]
+if all(line in rendered23.splitlines() for line in expected_lines23):
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print(expected_lines23)
+    print(rendered23)
+
+
+# --- TEST 24: Arrays numéricos (NumPy) ---
+import arrays
+
+test24 = """
+var a = array(range(10))
+var b = a * 2 + 1
+print(b)
+print(sum(b), min(b), max(b), b.mean())
+print(b[2:5], b[-1])
+print(a[a % 3 == 0])
+print((10 - a)[0], (a > 4).any(), (a > 4).all())
+print(sum([1, 2, 3]))
+"""
+expected24 = """
+array([1, 3, 5, 7, 9, 11, 13, 15, 17, 19])
+(100, 1, 19, 10.0)
+(array([5, 7, 9]), 19)
+array([0, 3, 6, 9])
+(10, True, False)
+6
+"""
+if arrays.AVAILABLE:
+    run_test("Arrays numéricos", test24, expected24)
+    run_test("Array dividido por cero", "print(array([1, 2]) / 0)", "❌ Error en línea 1: División por cero")
+    # Los enteros de Pyra no tienen límite: un array no da la vuelta en silencio
+    run_test("Array fuera de 64 bits", "print(array([2, 3]) ** 70)",
+             "❌ Error en línea 1: Valor inválido: operación fuera de rango en un array (el resultado no cabe en un entero de 64 bits)")
+    run_test("Array por un entero enorme", "print(array([1, 2]) * 10 ** 30)",
+             "❌ Error en línea 1: Valor inválido: los arrays solo admiten enteros de 64 bits")
+    run_test("Suma de un array sin desbordar", "print(sum(array([2 ** 62, 2 ** 62])), array([2 ** 61]) * 2)",
+             "(9223372036854775808, array([4611686018427387904]))")
+else:
+    run_test("Arrays sin NumPy", "print(array([1]))",
+             "❌ Error en línea 1: array(...) no está disponible: el servidor no tiene NumPy instalado")
+
+# Los atributos que empiezan con '_' (p. ej. los datos internos de un array) no se pueden usar
+test24b = """
+var a = [1, 2]
+print(a._data)
+"""
+run_test("Atributos privados", test24b, "❌ Error en línea 2: Sintaxis inválida en expresión")
+if arrays.AVAILABLE:
+    run_test("Datos internos de un array", "var a = array([1, 2])\nprint(a._data.repeat(3))",
+             "❌ Error en línea 2: Sintaxis inválida en expresión")
+
+
+# --- TEST 25: Pool de procesos ---
+import subprocess
+import sys
+
+def run_isolated(title, script, expected_output):
+    # Los procesos del pool vuelven a importar el módulo principal (este
+    # archivo): las pruebas con procesos se ejecutan con "python -c"
+    print(f"\n=== {title} ===")
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=120)
+    print("Salida:")
+    print(result.stdout.strip())
+    if result.stdout.strip() == expected_output.strip():
+        print("✔ OK")
+    else:
+        print("❌ Esperado:")
+        print(expected_output.strip())
+        print(result.stderr.strip()[-2000:])
+
+script25 = """
+from interpreter import Budget
+from worker_pool import WorkerPool
+pool = WorkerPool(size=1)
+print(pool.run("print(1 + 1)")["output"].strip())
+job = pool.run("var x = 10 ** (10 ** 8)", budget=Budget(max_seconds=0.5))
+print(job["limit_exceeded"], job["error"])
+job = pool.run("var l = []\\nwhile True:\\n    l.append('x' * 1000000)", budget=Budget(max_memory_mb=64))
+print(job["limit_exceeded"])
+events = list(pool.stream("print(1)\\nprint(2)"))
+print(repr("".join(value for kind, value in events if kind == "output")), events[-1][0])
+events = list(pool.stream("print(1)\\nvar x = 10 ** (10 ** 8)", budget=Budget(max_seconds=0.5)))
+print(events[-1][1]["limit_exceeded"])
+# Cerrar el stream antes del final mata al trabajador
+events = pool.stream("while True:\\n    print(1)", budget=Budget(max_loop_iterations=None))
+next(events)
+events.close()
+stats = pool.stats()
+print(stats["jobs"], stats["timeouts"], stats["idle"])
+print(pool.run("print(3)")["output"].strip())
+pool.shutdown()
+"""
+expected25 = """
+2
+max_seconds ❌ Error: Límite de tiempo excedido (0.5 segundos)
+max_memory_mb
+'1\\n2\\n' done
+max_seconds
+6 2 1
+3
+"""
+run_isolated("Pool de procesos (límites y streaming)", script25, expected25)
+
+# Un trabajo sin max_seconds no hereda el límite de CPU del anterior
+script25c = """
+from interpreter import Budget
+from worker_pool import WorkerPool
+pool = WorkerPool(size=1)
+print(pool.run("print(1)", budget=Budget(max_seconds=0.5))["output"].strip())
+job = pool.run("var t = 0\\nfor i in range(4000000):\\n    t = t + i\\nprint(t)")
+print(job["output"].strip(), job["limit_exceeded"])
+print(pool.stats()["timeouts"])
+pool.shutdown()
+"""
+expected25c = """
+1
+7999998000000 None
+0
+"""
+run_isolated("Pool de procesos (límite de CPU por trabajo)", script25c, expected25c)
+
+script25b = """
+import json
+import server
+client = server.app.test_client()
+def stream(code, limits=None):
+    text = client.post("/run/stream", json={"code": code, "limits": limits or {}}).get_data(as_text=True)
+    events = [block.split("\\n", 1) for block in text.strip().split("\\n\\n")]
+    output = "".join(json.loads(data[6:]) for kind, data in events if kind == "event: output")
+    return output, json.loads(events[-1][1][6:])
+for _ in range(2):
+    output, done = stream("for i in range(3):\\n    print(i)")
+    print(repr(output), done["statements"], done["cache"])
+output, done = stream("while True:\\n    var x = 1", {"max_seconds": 0.2, "max_loop_iterations": 1000000})
+print(done["limit_exceeded"], done["cache"])
+empty = client.post("/run/stream", json={"code": "  \\n"})
+print(empty.status_code, empty.get_json()["error"])
+"""
+expected25b = """
+'0\\n1\\n2\\n' 4 miss
+'0\\n1\\n2\\n' 4 hit
+max_seconds skip
+400 No hay código para ejecutar
+"""
+run_isolated("/run/stream en el pool y con caché", script25b, expected25b)
+
+
+# --- TEST 26: Caché de lint en SQLite ---
+print("\n=== Caché SQLite (límites de entradas y bytes) ===")
+import os
+import tempfile
+from caching import SQLiteCache
+with tempfile.TemporaryDirectory() as folder26:
+    cache26 = SQLiteCache(os.path.join(folder26, "lint.db"), max_entries=100, max_bytes=1000)
+    started26 = time.perf_counter()
+    for i in range(2000):
+        cache26.put(f"k{i}", {"n": i}, 5)
+    seconds26 = time.perf_counter() - started26
+    entries26 = len(cache26)
+    newest26 = cache26.get("k1999")
+    cache26.put("grande", {"n": -1}, 900)
+    stats26 = cache26.stats()
+    kept26 = cache26.get("k1999") is not None and cache26.get("k1000") is None
+if entries26 == 100 and newest26 == {"n": 1999} and stats26["bytes"] <= 1000 and kept26 and seconds26 < 30:
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print("100 entradas, como mucho 1000 bytes y las más usadas conservadas")
+    print(entries26, newest26, stats26, kept26, seconds26)
+
+print("\n=== Caché SQLite (aciertos sin escribir en el archivo) ===")
+with tempfile.TemporaryDirectory() as folder26:
+    cache26 = SQLiteCache(os.path.join(folder26, "lint.db"), max_entries=100, max_bytes=300)
+    for name in ("a", "b", "c"):
+        cache26.put(name, {"n": name}, 100)
+    changes26 = cache26._connect().total_changes
+    hit26 = cache26.get("a")
+    written26 = cache26._connect().total_changes - changes26
+    # Al desalojar se guarda antes el acierto de "a": sale "b", la menos usada
+    cache26.put("d", {"n": "d"}, 100)
+    kept26 = [name for name in ("a", "b", "c", "d") if cache26.get(name) is not None]
+if hit26 == {"n": "a"} and written26 == 0 and kept26 == ["a", "c", "d"]:
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print("0 escrituras al leer y ['a', 'c', 'd']")
+    print(written26, kept26)
+
+
+# --- TEST 27: /run/batch ---
+script27 = """
+import server
+client = server.app.test_client()
+programs = [{"code": f"for i in range({n}):\\n    var x = i * i\\nprint({n})", "expected": str(n), "id": n} for n in (3000, 10, 2000, 1)]
+programs.append({"code": "print(x)", "id": "error"})
+data = client.post("/run/batch", json={"programs": programs}).get_json()
+print([r["id"] for r in data["results"]], [r["status"] for r in data["results"]])
+print(data["summary"]["passed"], data["summary"]["failed"], data["summary"]["errors"])
+too_big = client.post("/run/batch", json={"programs": ["print(1)", "x" * (server.MAX_CODE_SIZE + 1)]})
+print(too_big.status_code, too_big.get_json()["error"])
+metrics = client.get("/metrics").get_data(as_text=True).splitlines()
+print([line for line in metrics if line.startswith(("pyra_program_statements_count", "pyra_program_errors_total{"))])
+"""
+expected27 = """
+[3000, 10, 2000, 1, 'error'] ['ok', 'ok', 'ok', 'ok', 'error']
+4 0 1
+400 Programa 1: código demasiado largo (máximo 102400 bytes)
+['pyra_program_statements_count{mode="tree"} 5', 'pyra_program_errors_total{category="name"} 1']
+"""
+run_isolated("/run/batch (orden, tamaño por programa y métricas)", script27, expected27)
+
+
+# --- TEST 28: Ejecución asíncrona (/run/submit) ---
+print("\n=== Cola de trabajos ===")
+from jobs import JobQueue, QueueFull
+release28 = threading.Event()
+def runner28(value):
+    release28.wait(5)
+    return {"value": value}
+queue28 = JobQueue(runner28, concurrency=1, max_queued=1)
+first28 = queue28.submit(1)
+time.sleep(0.1)  # el primero ya está en ejecución
+second28 = queue28.submit(2)
+try:
+    queue28.submit(3)
+    rejected28 = False
+except QueueFull:
+    rejected28 = True
+states28 = (first28.status()["state"], second28.status()["state"])
+release28.set()
+done28 = second28.wait(5) and first28.result == {"value": 1} and second28.result == {"value": 2}
+if rejected28 and states28 == ("running", "queued") and done28 and queue28.get(second28.id) is second28 and queue28.get("x") is None:
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print("rechazo con la cola llena, estados running/queued y ambos resultados")
+    print(rejected28, states28, done28)
+
+script28 = """
+import server
+client = server.app.test_client()
+submitted = client.post("/run/submit", json={"code": "print(6 * 7)"})
+job = submitted.get_json()
+print(submitted.status_code, job["state"] in ("queued", "running", "done"))
+status = client.get(f"/run/status/{job['id']}?wait=10").get_json()
+print(status["state"])
+result = client.get(f"/run/result/{job['id']}").get_json()
+print(repr(result["output"]), result["job"]["id"] == job["id"])
+print(client.get("/run/result/desconocido").status_code, client.post("/run/submit", json={"code": " "}).status_code)
+"""
+expected28 = """
+202 True
+done
+'42\\n' True
+404 400
+"""
+run_isolated("/run/submit, /run/status y /run/result", script28, expected28)
+
+
+# --- TEST 29: Ejecución por lotes (run_batch) ---
+print("\n=== Lote en este proceso ===")
+from batch import run_batch
+results29, summary29 = run_batch(
+    ["print(1)", {"code": "print(2)", "expected": "3", "id": "b"}, {"code": "print(1 / 0)", "expected": "x"}],
+    pool=False,
+)
+found29 = [(r["id"], r["status"], r.get("passed")) for r in results29]
+expected29 = [(0, "ok", None), ("b", "ok", False), (2, "error", False)]
+if found29 == expected29 and (summary29["total"], summary29["ok"], summary29["errors"], summary29["failed"]) == (3, 2, 1, 2):
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print(expected29)
+    print(found29, summary29)
+
+script29 = """
+from batch import run_batch
+from worker_pool import WorkerPool
+pool = WorkerPool(size=2)
+# El primero termina el último: los resultados siguen el orden de entrada
+programs = ["var t = 0\\nfor i in range(200000):\\n    t = t + i\\nprint(t)", "print(1)", "print(2)", "print(3)"]
+results, summary = run_batch(programs, budget=None, pool=pool)
+print([r["output"].strip() for r in results], summary["ok"])
+pool.shutdown()
+"""
+expected29b = """
+['19999900000', '1', '2', '3'] 4
+"""
+run_isolated("Lote en el pool (orden de los resultados)", script29, expected29b)
+
+
+# --- TEST 30: Caché de resultados de /run ---
+print("\n=== ResultCache (qué resultados se guardan) ===")
+from caching import ResultCache
+cache30 = ResultCache(max_entries=10)
+stored30 = [
+    cache30.store("a", {"success": True, "output": "1\n", "statements": 1, "limit_exceeded": None}),
+    cache30.store("b", {"success": True, "output": "", "statements": 9, "limit_exceeded": "max_statements"}),
+    cache30.store("c", {"success": True, "output": "", "statements": 9, "limit_exceeded": "max_seconds"}),
+    cache30.store("d", {"success": True, "output": "", "statements": None, "limit_exceeded": "max_memory_mb"}),
+    cache30.store("e", {"success": True, "output": "", "statements": None, "limit_exceeded": None}),
+    cache30.store("f", {"success": False, "output": "fallo"}),
+]
+keys30 = {cache30.key("print(1)", "tree", {"max_depth": 10}), cache30.key("print(1)", "compiled", {"max_depth": 10}),
+          cache30.key("print(1)", "tree", {"max_depth": 11}), cache30.key("print(1)", "tree", {"max_depth": 10}, stream=True)}
+if stored30 == [True, True, False, False, False, False] and cache30.get("a")["output"] == "1\n" and len(keys30) == 4:
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print([True, True, False, False, False, False], "y claves distintas por modo, límites y tipo")
+    print(stored30, len(keys30))
+
+script30 = """
+import server
+client = server.app.test_client()
+def run(code, limits=None, mode="tree"):
+    return client.post("/run", json={"code": code, "limits": limits or {}, "mode": mode}).get_json()
+first, second = run("print(6 * 7)"), run("print(6 * 7)")
+print(first["cache"], second["cache"], first["output"] == second["output"], run("print(6 * 7)", mode="compiled")["cache"])
+print(run("print(6 * 7)", {"max_statements": 50})["cache"])
+slow = {"max_seconds": 0.2, "max_loop_iterations": 1000000}
+print(run("while True:\\n    var x = 1", slow)["cache"], run("while True:\\n    var x = 1", slow)["cache"])
+print(run("var i = 0\\nwhile True:\\n    i = i + 1", {"max_statements": 100})["cache"])
+"""
+expected30 = """
+miss hit True miss
+miss
+skip skip
+miss
+"""
+run_isolated("/run con caché (acierto, fallo y límites que no se guardan)", script30, expected30)
+
+
+# --- TEST 31: /lint/session en el servidor ---
+print("\n=== /lint/session (abrir, editar y versiones) ===")
+opened31 = client.post("/lint/session", json={"code": "var x = 1\nprint(x)\n", "version": 1}).get_json()
+session31 = opened31["session"]
+edit31 = {"base_version": 1, "version": 2, "changes": [
+    {"range": {"startLineNumber": 2, "startColumn": 1, "endLineNumber": 2, "endColumn": 1}, "text": "whlie x:\n    print(x)\n"}
+]}
+edited31 = client.post(f"/lint/session/{session31}", json=edit31)
+stale31 = client.post(f"/lint/session/{session31}", json=dict(edit31, base_version=1, version=3))
+unknown31 = client.post("/lint/session/desconocida", json=edit31)
+full31 = client.post(f"/lint/session/{session31}", json={"code": "var x = 1\n", "version": 5}).get_json()
+results31 = (
+    opened31["warning_count"], edited31.status_code, edited31.get_json()["version"], edited31.get_json()["warning_count"],
+    stale31.status_code, stale31.get_json()["resync"], unknown31.status_code, full31["version"], full31["warning_count"],
+)
+if results31 == (0, 200, 2, 1, 409, True, 404, 5, 0):
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print((0, 200, 2, 1, 409, True, 404, 5, 0))
+    print(results31)
+
+
+# --- TEST 32: /check-run ---
+script32 = """
+import server
+client = server.app.test_client()
+bad = client.post("/check-run", json={"code": "print((1)\\n"}).get_json()
+print(bad["success"], bad["lint"]["error_count"] > 0, bad["run"])
+good = client.post("/check-run", json={"code": "var x = 2\\nprint(x * 21)\\n", "mode": "compiled"}).get_json()
+print(good["success"], good["lint"]["error_count"], repr(good["run"]["output"]), good["run"]["cache"])
+print(client.post("/check-run", json={"code": "print(1)", "mode": "otro"}).status_code)
+"""
+expected32 = """
+False True None
+True 0 '42\\n' miss
+400
+"""
+run_isolated("/check-run (solo se ejecuta sin errores)", script32, expected32)
+
+# Con el pool el trabajador analiza el código por su cuenta: mismas líneas que sin él
+script32b = """
+import os
+os.environ["PYRA_WORKERS"] = "1"
+os.environ["PYRA_RESULT_CACHE_ENTRIES"] = "0"
+import server
+from lexer import lex
+client = server.app.test_client()
+code = "\\n\\nvar x = 1\\n# nada\\nprint(x)\\nprint(x / 0)\\n"
+run = client.post("/check-run", json={"code": code}).get_json()["run"]
+print(repr(run["output"]), server.worker_pool.stats()["jobs"])
+print(run["output"] == server.run_job(code, "tree", None, lex(code))["output"])
+"""
+expected32b = """
+'1\\n❌ Error en línea 4: División por cero\\n' 1
+True
+"""
+run_isolated("/check-run en el pool", script32b, expected32b)
+
+
+# --- TEST 33: Caché de expresiones compartida por los trabajos ---
+from worker_pool import run_job
+
+print("\n=== Caché de expresiones entre ejecuciones ===")
+code33 = "var total33 = 0\nfor i in range(5):\n    total33 = total33 + i\nprint(total33)"
+first33 = run_job(code33)["expression_cache"]
+second33 = run_job(code33)["expression_cache"]
+# La segunda ejecución no compila ninguna expresión nueva
+if second33["misses"] == first33["misses"] and second33["hits"] > first33["hits"]:
+    print("✔ OK")
+else:
+    print("❌ Esperado:")
+    print("los mismos fallos y más aciertos en la segunda ejecución")
+    print(first33, second33)
+
+script33 = """
+import os
+os.environ["PYRA_WORKERS"] = "1"
+os.environ["PYRA_RESULT_CACHE_ENTRIES"] = "0"
+import server
+client = server.app.test_client()
+code = "var t = 0\\nfor i in range(5):\\n    t = t + i\\nprint(t)"
+for _ in range(2):
+    client.post("/run", json={"code": code})
+stats = client.get("/health").get_json()["expression_cache"]
+print(stats["misses"], stats["hits"], stats["hit_ratio"])
+metrics = client.get("/metrics").get_data(as_text=True).splitlines()
+print([line for line in metrics if line.startswith("pyra_cache_misses_total") and "expression" in line])
+"""
+# 4 expresiones distintas: la segunda ejecución solo tiene aciertos
+expected33 = """
+4 12 0.75
+['pyra_cache_misses_total{cache="expression"} 4']
+"""
+run_isolated("Caché de expresiones del pool en /health y /metrics", script33, expected33)
@@ -0,0 +1,343 @@
+"""
+Pool de procesos para ejecutar programas Pyra fuera del servidor.
+
+Cada trabajador es un proceso ya preparado (con el intérprete importado)
+que ejecuta un programa a la vez. Por cada trabajo se fijan límites del
+sistema operativo (CPU y memoria) y, si el programa no termina a tiempo,
+el proceso se mata y se reemplaza. Tras ``max_jobs`` trabajos el
+trabajador se recicla para que la memoria que acumule no crezca sin fin.
+"""
+
+import math
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: sin límites del sistema operativo
+    resource = None
+
+from interpreter import Interpreter, Budget, shared_expression_cache
+
+# Margen sobre max_seconds antes de matar el proceso (el intérprete suele
+# detenerse antes por sí mismo con BudgetExceeded)
+KILL_GRACE = 1.0
+# Tiempo máximo por trabajo si el presupuesto no fija max_seconds
+DEFAULT_TIMEOUT = 60.0
+
+
+def run_job(code, mode="tree", limits=None, lines=None, profile=False):
+    """Ejecuta un programa y devuelve el resultado como diccionario (sin procesos).
+
+    ``lines`` es el resultado de lexer.lex(code), si ya se calculó; con
+    ``profile`` el resultado incluye el perfil por línea y por función. Las
+    expresiones compiladas se guardan en la caché de todo el proceso
+    (interpreter.shared_expression_cache); "expression_cache" son sus
+    estadísticas después del trabajo.
+    """
+    budget = Budget(**limits) if limits else Budget()
+    interp = Interpreter(mode=mode, budget=budget, profile=profile, shared_cache=True)
+    started = time.perf_counter()
+    output = interp.run(code, lines)
+    return {
+        "output": output,
+        "seconds": time.perf_counter() - started,
+        "statements": interp.statements,
+        "limit_exceeded": interp.limit_exceeded,
+        "error": interp.error,
+        "error_category": interp.error_category,
+        "output_stats": interp.output.stats(),
+        "memo": interp.memo_stats(),
+        "profile": interp.profile_stats(),
+        "expression_cache": shared_expression_cache.stats(),
+    }
+
+
+def iter_job(code, mode="tree", limits=None):
+    """Como run_job, pero produce ("output", texto) a medida que el programa
+    escribe y al final ("done", resultado); en el resultado "output" es None
+    porque la salida ya se envió por partes"""
+    budget = Budget(**limits) if limits else Budget()
+    interp = Interpreter(mode=mode, budget=budget, shared_cache=True)
+    started = time.perf_counter()
+    for kind, value in interp.run_iter(code):
+        if kind == "output":
+            yield kind, value
+    yield "done", {
+        "output": None,
+        "seconds": time.perf_counter() - started,
+        "statements": interp.statements,
+        "limit_exceeded": interp.limit_exceeded,
+        "error": interp.error,
+        "error_category": interp.error_category,
+        "output_stats": interp.output.stats(),
+        "memo": interp.memo_stats(),
+        "profile": None,
+        "expression_cache": shared_expression_cache.stats(),
+    }
+
+
+def failed_job(message, limit=None):
+    """Resultado de un trabajo cuyo proceso no terminó normalmente"""
+    error = f"❌ Error: {message}"
+    return {
+        "output": error + "\n",
+        "seconds": None,
+        "statements": None,
+        "limit_exceeded": limit,
+        "error": error,
+        "error_category": "limit" if limit else "crash",
+        "output_stats": None,
+        "memo": {},
+        "profile": None,
+        "expression_cache": None,
+    }
+
+
+def _failed_events(result):
+    """Eventos de stream para un resultado de failed_job"""
+    yield "output", result["output"]
+    yield "done", dict(result, output=None)
+
+
+# --- Proceso trabajador ---
+def _address_space():
+    """Bytes de memoria virtual que ya usa el proceso (0 si no se puede saber)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+def _set_job_limits(limits):
+    if resource is None:
+        return
+    # RLIMIT_CPU cuenta el tiempo de CPU acumulado por el proceso; se fija
+    # en cada trabajo para no heredar el límite del trabajo anterior
+    seconds = limits.get("max_seconds") or DEFAULT_TIMEOUT
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(math.ceil(used + seconds + KILL_GRACE))
+    resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+
+    memory = limits.get("max_memory_mb")
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if memory:
+        soft = _address_space() + memory * 1024 * 1024
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    else:
+        soft = hard
+    resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+def _worker_main(conn):
+    # El servidor maneja Ctrl+C; el trabajador solo termina cuando se lo piden
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        code, mode, limits, profile, stream = job
+        _set_job_limits(limits)
+        if stream:
+            # La salida se envía por partes; el último mensaje es ("done", resultado)
+            for message in iter_job(code, mode, limits):
+                conn.send(message)
+            result = message[1]
+        else:
+            result = run_job(code, mode, limits, profile=profile)
+            conn.send(result)
+        if result["limit_exceeded"] == "max_memory_mb":
+            return  # tras un MemoryError el proceso se descarta
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        # Últimas estadísticas de la caché de expresiones del proceso (ver run_job)
+        self.expression_cache = {"hits": 0, "misses": 0}
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(0.5)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+# --- Pool ---
+class WorkerPool:
+    """Pool de ``size`` procesos (por defecto, uno por núcleo) seguro entre hilos.
+
+    ``run`` bloquea el hilo que llama hasta que haya un trabajador libre y
+    el programa termine.
+    """
+    def __init__(self, size=None, max_jobs=100):
+        self.size = size or self.default_size()
+        self.max_jobs = max_jobs
+        # forkserver: los trabajadores nacen de un proceso limpio que ya importó el intérprete
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        if "forkserver" in methods:
+            self._context.set_forkserver_preload(["interpreter", "worker_pool"])
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.jobs = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.recycled = 0
+        self.expression_hits = 0
+        self.expression_misses = 0
+        for _ in range(self.size):
+            self._idle.put(_Worker(self._context))
+
+    @staticmethod
+    def default_size():
+        return os.cpu_count() or 1
+
+    def run(self, code, mode="tree", budget=None, profile=False):
+        """Ejecuta ``code`` en un trabajador y devuelve el diccionario de run_job"""
+        budget = budget or Budget()
+        timeout = (budget.max_seconds or DEFAULT_TIMEOUT) + KILL_GRACE
+        worker = self._idle.get()
+        replace = False
+        try:
+            worker.conn.send((code, mode, budget.as_dict(), profile, False))
+            worker.jobs += 1
+            if worker.conn.poll(timeout):
+                result = worker.conn.recv()
+                self._count_expressions(worker, result)
+                if result["limit_exceeded"] == "max_memory_mb":
+                    # El trabajador termina solo después de un MemoryError
+                    replace = True
+                    worker.kill()
+            else:
+                replace = True
+                result = self._timed_out(worker, budget)
+        except (EOFError, OSError):
+            replace = True
+            result = self._crashed(worker, budget)
+        finally:
+            self._count("jobs")
+            self._release(worker, replace)
+        return result
+
+    def stream(self, code, mode="tree", budget=None):
+        """Como run, pero produce ("output", texto) a medida que el programa
+        escribe y al final ("done", resultado), como worker_pool.iter_job.
+
+        El trabajador envía la salida por su conexión con los mismos límites
+        que en run. Si se cierra el generador antes del final (el cliente se
+        desconectó), el trabajador se mata y se reemplaza.
+        """
+        budget = budget or Budget()
+        deadline = time.monotonic() + (budget.max_seconds or DEFAULT_TIMEOUT) + KILL_GRACE
+        worker = self._idle.get()
+        replace = True
+        try:
+            worker.conn.send((code, mode, budget.as_dict(), False, True))
+            worker.jobs += 1
+            while True:
+                if not worker.conn.poll(max(deadline - time.monotonic(), 0)):
+                    yield from _failed_events(self._timed_out(worker, budget))
+                    return
+                try:
+                    kind, value = worker.conn.recv()
+                except (EOFError, OSError):
+                    yield from _failed_events(self._crashed(worker, budget))
+                    return
+                if kind == "done":
+                    self._count_expressions(worker, value)
+                    # El trabajador termina solo después de un MemoryError
+                    replace = value["limit_exceeded"] == "max_memory_mb"
+                yield kind, value
+                if kind == "done":
+                    return
+        finally:
+            self._count("jobs")
+            if replace:
+                worker.kill()
+            self._release(worker, replace)
+
+    def _timed_out(self, worker, budget):
+        worker.kill()
+        self._count("timeouts")
+        return failed_job(f"Límite de tiempo excedido ({budget.max_seconds or DEFAULT_TIMEOUT:g} segundos)", "max_seconds")
+
+    def _crashed(self, worker, budget):
+        worker.kill()
+        if resource is not None and worker.process.exitcode == -signal.SIGXCPU:
+            self._count("timeouts")
+            return failed_job(f"Límite de tiempo excedido ({budget.max_seconds or DEFAULT_TIMEOUT:g} segundos)", "max_seconds")
+        self._count("crashes")
+        return failed_job("El proceso de ejecución terminó inesperadamente")
+
+    def _count_expressions(self, worker, result):
+        """Suma al pool lo que cambió la caché de expresiones del trabajador
+        (sus estadísticas son del proceso entero, desde que arrancó)"""
+        stats, previous = result["expression_cache"], worker.expression_cache
+        worker.expression_cache = stats
+        with self._lock:
+            self.expression_hits += stats["hits"] - previous["hits"]
+            self.expression_misses += stats["misses"] - previous["misses"]
+
+    def _release(self, worker, replace):
+        if not replace and (self._closed or worker.jobs >= self.max_jobs):
+            if not self._closed:
+                self._count("recycled")
+            worker.stop()
+            replace = True
+
+        if not self._closed:
+            self._idle.put(_Worker(self._context) if replace else worker)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        lookups = self.expression_hits + self.expression_misses
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "max_jobs": self.max_jobs,
+            "jobs": self.jobs,
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+            "recycled": self.recycled,
+            "expression_cache": {
+                "hits": self.expression_hits,
+                "misses": self.expression_misses,
+                "hit_ratio": round(self.expression_hits / lookups, 4) if lookups else None,
+            },
+        }
+
+    def shutdown(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                return
+